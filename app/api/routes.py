@@ -1,11 +1,13 @@
-from flask import jsonify, request
+from flask import current_app, jsonify, request
 from flask_login import login_required, current_user
 from werkzeug.security import check_password_hash
 from app.api import bp
 from app.models import User, Member, Contribution, Loan, Discussion, Activity, Notification
 from app import db
 import requests
-import base64
+from utils.mpesa import MpesaError
+from fixed_app import queue_stk_push
+from utils.pagination import paginate_request
 from datetime import datetime
 
 @bp.route('/login', methods=['POST'])
@@ -75,19 +77,21 @@ def api_contribute():
     phone = data.get('phone')
     description = data.get('description', '')
     
-    # Initiate M-Pesa STK Push
-    mpesa_response = initiate_stk_push(phone, amount, f'CONTRIB-{member.id}')
-    
-    if mpesa_response.get('ResponseCode') == '0':
-        return jsonify({
-            'success': True,
-            'message': 'Payment request sent to your phone'
-        })
-    else:
+    # The STK push is submitted in the background; poll /payments/<id> for the result
+    try:
+        payment = queue_stk_push(member.id, phone, amount, description)
+    except (TypeError, ValueError):
         return jsonify({
             'success': False,
-            'message': 'Payment request failed'
+            'message': 'A phone number and a positive amount are required'
         }), 400
+    
+    return jsonify({
+        'success': True,
+        'message': 'Payment request sent to your phone',
+        'payment_id': payment.id,
+        'status': payment.status
+    }), 202
 
 @bp.route('/loans', methods=['GET'])
 @login_required
@@ -96,8 +100,11 @@ def api_loans():
     if not member:
         return jsonify({'error': 'No member profile found'}), 404
     
-    loans = Loan.query.filter_by(member_id=member.id).order_by(Loan.date_applied.desc()).all()
+    page = paginate_request(Loan.query.filter_by(member_id=member.id), [Loan.date_applied, Loan.id], columns=[
+        Loan.id, Loan.amount, Loan.purpose, Loan.status, Loan.date_applied, Loan.due_date
+    ])
     return jsonify({
+        'next_cursor': page.next_cursor,
         'loans': [{
             'id': l.id,
             'amount': l.amount,
@@ -105,73 +112,49 @@ def api_loans():
             'status': l.status,
             'date_applied': l.date_applied.isoformat() if l.date_applied else None,
             'due_date': l.due_date.isoformat() if l.due_date else None
-        } for l in loans]
+        } for l in page.items]
     })
 
 @bp.route('/discussions', methods=['GET'])
 @login_required
 def api_discussions():
-    discussions = Discussion.query.order_by(Discussion.date.desc()).all()
+    page = paginate_request(
+        Discussion.query.outerjoin(User, Discussion.user_id == User.id),
+        [Discussion.date, Discussion.id],
+        columns=[Discussion.id, Discussion.title, Discussion.content, Discussion.date, User.username]
+    )
     return jsonify({
+        'next_cursor': page.next_cursor,
         'discussions': [{
             'id': d.id,
             'title': d.title,
             'content': d.content,
             'date': d.date.isoformat(),
-            'author': d.user.username
-        } for d in discussions]
+            'author': d.username
+        } for d in page.items]
     })
 
 @bp.route('/activities', methods=['GET'])
 @login_required
 def api_activities():
-    upcoming = Activity.query.filter(Activity.date >= datetime.utcnow()).order_by(Activity.date).all()
+    page = paginate_request(
+        Activity.query.filter(Activity.date >= datetime.utcnow()),
+        [Activity.date, Activity.id],
+        descending=False
+    )
     return jsonify({
+        'next_cursor': page.next_cursor,
         'activities': [{
             'id': a.id,
             'title': a.title,
             'description': a.description,
             'date': a.date.isoformat(),
             'type': a.type
-        } for a in upcoming]
+        } for a in page.items]
     })
 
 def initiate_stk_push(phone, amount, account_ref):
     try:
-        consumer_key = 'bfb279f9aa9bdbcf158e97dd71a467cd2e0c893059b10f78e6b72ada1ed2c919'
-        consumer_secret = 'b051e7d22f7e0fe81e71b1d1a0e8b9c2d5c0b1f8e6a9c8d7f4e3b2a1c9d8e7f6'
-        
-        api_url = 'https://sandbox.safaricom.co.ke/oauth/v1/generate?grant_type=client_credentials'
-        r = requests.get(api_url, auth=(consumer_key, consumer_secret))
-        access_token = r.json()['access_token']
-        
-        api_url = 'https://sandbox.safaricom.co.ke/mpesa/stkpush/v1/processrequest'
-        headers = {
-            'Authorization': f'Bearer {access_token}',
-            'Content-Type': 'application/json'
-        }
-        
-        timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-        shortcode = '174379'
-        passkey = 'bfb279f9aa9bdbcf158e97dd71a467cd2e0c893059b10f78e6b72ada1ed2c919b051e7d22f7e0fe81e71b1d1a0e8b9c2d5c0b1f8e6a9c8d7f4e3b2a1c9d8e7f6'
-        
-        password = base64.b64encode((shortcode + passkey + timestamp).encode()).decode('utf-8')
-        
-        payload = {
-            'BusinessShortCode': shortcode,
-            'Password': password,
-            'Timestamp': timestamp,
-            'TransactionType': 'CustomerPayBillOnline',
-            'Amount': int(amount),
-            'PartyA': phone,
-            'PartyB': shortcode,
-            'PhoneNumber': phone,
-            'CallBackURL': 'https://mydomain.com/path',
-            'AccountReference': account_ref,
-            'TransactionDesc': 'Chama Contribution'
-        }
-        
-        response = requests.post(api_url, json=payload, headers=headers)
-        return response.json()
-    except:
+        return current_app.extensions['mpesa'].stk_push(phone, amount, account_ref)
+    except (requests.RequestException, MpesaError, ValueError):
         return {'ResponseCode': '1', 'errorMessage': 'Service unavailable'}
\ No newline at end of file
@@ -0,0 +1,108 @@
+"""Compare batch default scoring with the original one-member-per-request prediction.
+
+Usage: python benchmarks/bench_default_prediction.py [--sizes 1000 10000 100000] [--legacy-sample 2000]
+
+Each size runs against a fresh SQLite database in a temporary directory. The
+original prediction lazily loaded a member's contributions and loans, so it is
+timed on a sample of members and extrapolated to the whole membership. The
+batch path is timed as the feature load, the vectorized scoring on its own,
+and a cached POST /api/ai/predict-default for every member.
+"""
+import random
+from datetime import datetime, timedelta
+
+from harness import bench_parser, timed, use_scratch_database
+
+
+def legacy_predict_default(db, Member, member_id):
+    """The per-member prediction /api/ai/predict-default/<id> made before batch scoring."""
+    member = db.session.get(Member, member_id)
+    contributions = member.contributions
+    if not contributions:
+        return 0.8, 'High'
+
+    total_contributions = sum(float(c.amount) for c in contributions)
+    total_loans = sum(float(l.amount) for l in member.loans)
+    risk_score = min(1.0, total_loans / total_contributions) if total_contributions else 1.0
+    risk_level = 'High' if risk_score > 0.7 else 'Medium' if risk_score > 0.4 else 'Low'
+    return risk_score, risk_level
+
+
+def seed(db, Member, Contribution, Loan, member_count, rebuild_member_balances):
+    rng = random.Random(7)
+    now = datetime.utcnow()
+    db.session.execute(db.delete(Loan))
+    db.session.execute(db.delete(Contribution))
+    db.session.execute(db.delete(Member))
+
+    db.session.execute(db.insert(Member), [{
+        'id': i,
+        'name': f'Member {i}',
+        'phone': f'07{i:08d}',
+        'join_date': now - timedelta(days=rng.randint(0, 900)),
+        'status': 'Active'
+    } for i in range(1, member_count + 1)])
+
+    db.session.execute(db.insert(Contribution), [{
+        'member_id': rng.randint(1, member_count),
+        'amount': float(rng.choice([500, 1000, 2000, 5000])),
+        'date': now - timedelta(days=rng.randint(0, 900))
+    } for _ in range(member_count * 5)])
+
+    db.session.execute(db.insert(Loan), [{
+        'member_id': rng.randint(1, member_count),
+        'amount': float(rng.randint(1, 50) * 1000),
+        'status': rng.choice(['Pending', 'Approved', 'Rejected'])
+    } for _ in range(member_count)])
+    db.session.commit()
+
+    # Core inserts bypass the ORM events that maintain the balance projection
+    rebuild_member_balances()
+
+
+def main():
+    parser = bench_parser(__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--legacy-sample', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    use_scratch_database()
+
+    from fixed_app import (
+        app, db, cache, Member, Contribution, Loan, rebuild_member_balances,
+        default_risk_features, score_default_risk
+    )
+
+    client = app.test_client()
+    client.post('/login', data={'username': 'admin', 'password': 'admin'})
+
+    print(f"{'members':>10} {'per-member (s)':>15} {'features (s)':>13} {'scoring (ms)':>13} "
+          f"{'batch API (s)':>14} {'speedup':>8}  match")
+    for size in args.sizes:
+        with app.app_context():
+            seed(db, Member, Contribution, Loan, size, rebuild_member_balances)
+            cache.clear()
+
+            sample = random.Random(size).sample(range(1, size + 1), min(size, args.legacy_sample))
+            legacy, legacy_time = timed(lambda: [legacy_predict_default(db, Member, i) for i in sample])
+            legacy_time *= size / len(sample)
+
+            (ids, features), feature_time = timed(default_risk_features)
+            (scores, levels), scoring_time = timed(lambda: score_default_risk(features), args.repeat)
+
+        # Requests run outside the benchmark's app context so each gets its own
+        client.post('/api/ai/predict-default', json={})
+        response, batch_time = timed(lambda: client.post('/api/ai/predict-default', json={}))
+        assert response.get_json()['count'] == size
+
+        rows = {member_id: i for i, member_id in enumerate(ids.tolist())}
+        match = all(
+            abs(scores[rows[i]] - score) < 1e-9 and levels[rows[i]] == level
+            for i, (score, level) in zip(sample, legacy)
+        )
+        print(f'{size:>10} {legacy_time:>15.2f} {feature_time:>13.3f} {scoring_time * 1000:>13.2f} '
+              f'{batch_time:>14.3f} {legacy_time / (feature_time + scoring_time):>7.1f}x  {match}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""Time bulk expense review and category rollup reads against per-expense approval and table scans.
+
+Usage: python benchmarks/bench_expense_review.py [--expenses 200000] [--batch 500] [--repeat 5]
+
+Expenses spread over two years are bulk inserted, most already approved. The
+run times approving a batch of pending expenses one ORM commit at a time, the
+way the old GET route did, next to one review_expenses() call for the same
+number of expenses, then reads approved totals per category for a year and
+for the current month from the rollups and by grouping the expense table.
+"""
+import random
+from datetime import datetime, timedelta
+
+from harness import bench_parser, timed, use_scratch_database
+
+CATEGORIES = ['rent', 'utilities', 'transport', 'meetings', 'stationery', 'bank charges', 'welfare', 'other']
+
+
+def seed(db, Expense, expense_count, pending_count):
+    rng = random.Random(11)
+    now = datetime.utcnow()
+    db.session.execute(db.insert(Expense.__table__), [{
+        'category': rng.choice(CATEGORIES),
+        'amount': rng.randint(100, 50000) * 100,
+        'description': f'Expense {i}',
+        'date': now - timedelta(seconds=rng.uniform(0, 730 * 86400)),
+        'status': 'Pending' if i < pending_count else rng.choice(['Approved'] * 9 + ['Rejected'])
+    } for i in range(expense_count)])
+    db.session.commit()
+
+
+def main():
+    parser = bench_parser(__doc__)
+    parser.add_argument('--expenses', type=int, default=200000)
+    parser.add_argument('--batch', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    use_scratch_database()
+
+    from fixed_app import (app, db, Expense, User, expense_category_totals, month_start, next_month,
+                           rebuild_expense_rollups, review_expenses)
+
+    with app.app_context():
+        seed(db, Expense, args.expenses, args.batch * 2)
+        _, rebuild_time = timed(lambda: rebuild_expense_rollups(), 1)
+        print(f'{args.expenses} expenses; full rollup rebuild {rebuild_time * 1000:.0f}ms')
+
+        reviewer_id = User.query.filter_by(username='admin').first().id
+        pending = [row[0] for row in db.session.query(Expense.id).filter(Expense.status == 'Pending').order_by(Expense.id)]
+        one_by_one, batch = pending[:args.batch], pending[args.batch:args.batch * 2]
+
+        def approve_each():
+            for expense_id in one_by_one:
+                expense = db.session.get(Expense, expense_id)
+                expense.status = 'Approved'
+                expense.approved_by = reviewer_id
+                db.session.commit()
+        _, each_time = timed(approve_each, 1)
+
+        def approve_batch():
+            result = review_expenses(batch, 'approve', reviewer_id)
+            db.session.commit()
+            return result
+        result, batch_time = timed(approve_batch, 1)
+        assert len(result['changed']) == len(batch)
+        print(f'approve {args.batch} expenses: one commit each {each_time * 1000:.0f}ms, '
+              f'one review_expenses() {batch_time * 1000:.0f}ms (with ledger blocks)')
+        assert rebuild_expense_rollups(verify_only=True) == []
+
+        now = datetime.utcnow()
+        ranges = [
+            ('last 12 whole months', month_start(now - timedelta(days=365)), month_start(now)),
+            ('month to date', month_start(now), next_month(now))
+        ]
+        for label, start, end in ranges:
+            rolled, rollup_time = timed(lambda: expense_category_totals(start, end), args.repeat)
+            scanned, scan_time = timed(lambda: db.session.query(
+                Expense.category, db.func.sum(Expense.amount), db.func.count()
+            ).filter(Expense.status == 'Approved', Expense.date >= start, Expense.date < end)
+                .group_by(Expense.category).all(), args.repeat)
+            assert {category: (total, count) for category, total, count in scanned} == \
+                {category: (entry['total'], entry['count']) for category, entry in rolled.items()}
+            print(f'approved by category, {label}: rollups {rollup_time * 1000:.2f}ms, '
+                  f'grouping expenses {scan_time * 1000:.1f}ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""Time goal progress reads, projections, rebuilds and the per-contribution update cost.
+
+Usage: python benchmarks/bench_goal_progress.py [--contributions 200000] [--goals 50] [--repeat 5]
+
+Contributions spread over two years are bulk inserted, split across the goal
+categories and general savings, and half the goals are linked to a category
+and date range. The run times reading the stored progress next to summing
+each goal's contributions on every view, the batched projections for all
+goals, a full rebuild, and the cost the goal update adds to inserting a
+contribution through the ORM.
+"""
+import random
+from datetime import datetime, timedelta
+
+from harness import bench_parser, timed, use_scratch_database
+
+CATEGORIES = [None, 'savings', 'investment', 'emergency', 'project', 'equipment', 'other']
+
+
+def seed(db, Goal, Contribution, Member, contribution_count, goal_count):
+    rng = random.Random(9)
+    now = datetime.utcnow()
+    member_id = db.session.query(Member.id).first()[0]
+    db.session.execute(db.insert(Contribution.__table__), [{
+        'member_id': member_id,
+        'amount': rng.randint(100, 5000) * 100,
+        'date': now - timedelta(seconds=rng.uniform(0, 730 * 86400)),
+        'category': rng.choice(CATEGORIES)
+    } for _ in range(contribution_count)])
+    db.session.execute(db.insert(Goal.__table__), [{
+        'title': f'Goal {i}',
+        'target_amount': rng.randint(100000, 5000000) * 100,
+        'current_amount': 0,
+        'target_date': now + timedelta(days=rng.randint(30, 720)),
+        'category': 'project',
+        'status': 'Active',
+        'created_date': now,
+        'progress_source': 'contributions' if i % 2 == 0 else 'manual',
+        'contribution_category': rng.choice(CATEGORIES),
+        'contributions_from': now - timedelta(days=rng.randint(30, 700)) if i % 4 == 0 else None
+    } for i in range(goal_count)])
+    db.session.commit()
+    return member_id
+
+
+def main():
+    parser = bench_parser(__doc__)
+    parser.add_argument('--contributions', type=int, default=200000)
+    parser.add_argument('--goals', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    use_scratch_database()
+
+    from sqlalchemy import event
+    from utils.money import Money
+    from fixed_app import (app, db, Goal, Contribution, Member, goal_contribution_total, goal_projections,
+                           rebuild_goal_progress, contribution_counted_for_goals)
+
+    with app.app_context():
+        member_id = seed(db, Goal, Contribution, Member, args.contributions, args.goals)
+        _, rebuild_time = timed(lambda: rebuild_goal_progress(), 1)
+        db.session.commit()
+        print(f'{args.contributions} contributions, {args.goals} goals; full rebuild {rebuild_time * 1000:.0f}ms')
+
+        goal = Goal.__table__
+        stored, read_time = timed(lambda: db.session.execute(
+            db.select(goal.c.id, goal.c.current_amount).order_by(goal.c.id)).all(), args.repeat)
+        summed, sum_time = timed(lambda: db.session.execute(
+            db.select(goal.c.id, db.case((goal.c.progress_source == 'contributions', goal_contribution_total(goal)),
+                                         else_=goal.c.current_amount)).order_by(goal.c.id)).all(), args.repeat)
+        assert [tuple(row) for row in stored] == [tuple(row) for row in summed]
+        print(f'goal progress per view: stored {read_time * 1000:.2f}ms, summed from contributions {sum_time * 1000:.0f}ms')
+
+        projections, projection_time = timed(goal_projections, args.repeat)
+        projected = sum(1 for projection in projections.values() if projection['projected_date'])
+        print(f'projections for all goals: {projection_time * 1000:.1f}ms ({projected} projected)')
+
+        def insert_contributions(count=200):
+            for i in range(count):
+                db.session.add(Contribution(member_id=member_id, amount=Money.parse(100), category=CATEGORIES[i % 7]))
+                db.session.commit()
+        _, with_goals = timed(insert_contributions, 1)
+        event.remove(Contribution, 'after_insert', contribution_counted_for_goals)
+        _, without_goals = timed(insert_contributions, 1)
+        event.listen(Contribution, 'after_insert', contribution_counted_for_goals)
+        print(f'insert + commit per contribution: {with_goals / 200 * 1000:.2f}ms with goal updates, '
+              f'{without_goals / 200 * 1000:.2f}ms without')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""Measure sensor reading ingestion and dashboard query latency.
+
+Usage: python benchmarks/bench_iot_ingest.py [--devices 200] [--days 3] [--interval 60] [--batch 2000]
+
+Each device reports three metrics (temperature, humidity, battery_level) every
+`interval` seconds for `days` days. The readings are posted to
+/api/iot/readings in batches, which stores them along with the minute and hour
+rollups, the latest values and the coalesced device updates. The run then times
+the dashboard's latest-values query and a 24 hour history read at each
+resolution, next to the same history aggregated from the raw readings.
+"""
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+from harness import bench_parser, timed, use_scratch_database
+
+METRICS = ('temperature', 'humidity', 'battery_level')
+
+
+def reading_batches(device_ids, start, end, interval, batch_size):
+    """Readings in time order across all devices, as request payloads of `batch_size` readings."""
+    rng = random.Random(5)
+    batch = []
+    timestamp = start
+    while timestamp < end:
+        for device_id in device_ids:
+            batch.append({
+                'device_id': device_id,
+                'timestamp': timestamp.isoformat(),
+                'values': {
+                    'temperature': round(rng.gauss(24, 3), 2),
+                    'humidity': round(rng.uniform(30, 80), 1),
+                    'battery_level': max(0, 100 - (timestamp - start).total_seconds() / 3600)
+                }
+            })
+            if len(batch) == batch_size:
+                yield {'readings': batch}
+                batch = []
+        timestamp += timedelta(seconds=interval)
+    if batch:
+        yield {'readings': batch}
+
+
+def main():
+    parser = bench_parser(__doc__)
+    parser.add_argument('--devices', type=int, default=200)
+    parser.add_argument('--days', type=float, default=3)
+    parser.add_argument('--interval', type=int, default=60)
+    parser.add_argument('--batch', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    use_scratch_database()
+    os.environ['IOT_INGEST_TOKEN'] = 'bench-token'
+    os.environ['IOT_MAX_BATCH'] = str(args.batch)
+
+    from fixed_app import app, db, IoTDevice, SensorReading, latest_sensor_values, sensor_history
+
+    device_ids = [f'SENSOR{i:05d}' for i in range(args.devices)]
+    with app.app_context():
+        db.session.execute(db.insert(IoTDevice), [{
+            'device_name': f'Sensor {i}', 'device_type': 'sensor', 'device_id': device_id, 'status': 'Active'
+        } for i, device_id in enumerate(device_ids)])
+        db.session.commit()
+
+    end = datetime.utcnow().replace(microsecond=0)
+    start = end - timedelta(days=args.days)
+    client = app.test_client()
+    headers = {'Authorization': 'Bearer bench-token'}
+    readings = 0
+    ingest_start = time.perf_counter()
+    for payload in reading_batches(device_ids, start, end, args.interval, args.batch):
+        response = client.post('/api/iot/readings', json=payload, headers=headers)
+        assert response.status_code == 202, response.get_json()
+        readings += response.get_json()['accepted']
+    elapsed = time.perf_counter() - ingest_start
+    print(f'ingested {readings} readings in {elapsed:.1f}s ({readings / elapsed:,.0f} readings/s)')
+
+    with app.app_context():
+        device_pk = db.session.query(IoTDevice.id).filter_by(device_id=device_ids[0]).scalar()
+        window_start = end - timedelta(hours=24)
+        _, latest_time = timed(latest_sensor_values, args.repeat)
+        print(f'latest values, all devices: {latest_time * 1000:.2f}ms')
+        for label, resolution in (('raw', None), ('minute', 60), ('hour', 3600)):
+            points, history_time = timed(
+                lambda: sensor_history(device_pk, 'temperature', window_start, end, resolution), args.repeat
+            )
+            print(f'24h history ({label}): {len(points)} points in {history_time * 1000:.2f}ms')
+
+        # What a dashboard would have to do without rollups: bucket the raw rows
+        minute = db.func.strftime('%Y-%m-%d %H:%M', SensorReading.recorded_at)
+        points, scan_time = timed(lambda: db.session.query(minute, db.func.avg(SensorReading.value)).filter(
+            SensorReading.device_id == device_pk,
+            SensorReading.metric == 'temperature',
+            SensorReading.recorded_at.between(window_start, end)
+        ).group_by(minute).all(), args.repeat)
+        print(f'24h per-minute average from raw readings: {len(points)} points in {scan_time * 1000:.2f}ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""Time loan approval with schedule generation, the nightly servicing pass and the portfolio-at-risk view.
+
+Usage: python benchmarks/bench_loan_servicing.py [--loans 100000] [--members 2000] [--repeat 5]
+
+Pending loans are bulk inserted and approved through transition_loans(),
+which writes their amortization schedules. Disbursement dates are then
+spread over the past year and repayments recorded for most loans, some of
+them short. The run times a full service_loans() pass, a second pass with
+nothing changed, and reading portfolio at risk from the snapshot next to
+grouping the loan table and recomputing it from installments and repayments.
+"""
+import random
+from datetime import datetime, timedelta
+
+from harness import bench_parser, timed, use_scratch_database
+
+
+def seed(db, Loan, Member, loan_count, member_count):
+    rng = random.Random(13)
+    now = datetime.utcnow()
+    db.session.execute(db.insert(Member.__table__), [
+        {'name': f'Member {i}', 'phone': f'07{i:08d}', 'join_date': now} for i in range(member_count)
+    ])
+    member_ids = [member_id for member_id, in db.session.query(Member.id)]
+    db.session.execute(db.insert(Loan.__table__), [{
+        'amount': rng.randint(50, 2000) * 10000,
+        'member_id': rng.choice(member_ids),
+        'date_applied': now - timedelta(days=400),
+        'status': 'Pending',
+        'interest_rate': rng.choice([8.0, 10.0, 12.0, 15.0]),
+        'term_months': rng.choice([3, 6, 12, 24]),
+        'amount_repaid': 0,
+        'arrears': 0,
+        'days_past_due': 0
+    } for _ in range(loan_count)])
+    db.session.commit()
+    return rng
+
+
+def main():
+    parser = bench_parser(__doc__)
+    parser.add_argument('--loans', type=int, default=100000)
+    parser.add_argument('--members', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    use_scratch_database()
+
+    from utils.money import Money
+    from fixed_app import (app, db, Loan, LoanInstallment, LoanRepayment, Member, LOAN_ARREARS_BUCKETS,
+                           portfolio_at_risk, rebuild_member_balances, schedule_loans, service_loans, transition_loans)
+
+    with app.app_context():
+        rng = seed(db, Loan, Member, args.loans, args.members)
+        rebuild_member_balances()
+        loan_ids = [loan_id for loan_id, in db.session.query(Loan.id).filter(Loan.status == 'Pending').order_by(Loan.id)]
+        _, approve_time = timed(lambda: transition_loans(loan_ids, 'Approved'), 1)
+        db.session.commit()
+        print(f'approve {args.loans} loans with schedules: {approve_time:.1f}s '
+              f'({LoanInstallment.query.count()} installments)')
+
+        # Disburse over the past year and repay most loans, some of them short
+        today = datetime.utcnow()
+        loans = db.session.query(Loan.id, Loan.amount, Loan.interest_rate, Loan.term_months).all()
+        schedule_loans([(loan_id, amount, rate, term, today - timedelta(days=rng.randint(0, 365)))
+                        for loan_id, amount, rate, term in loans])
+        db.session.commit()
+        due = dict(db.session.query(
+            LoanInstallment.loan_id, db.type_coerce(db.func.sum(LoanInstallment.principal + LoanInstallment.interest), db.BigInteger)
+        ).filter(LoanInstallment.due_date <= today.date()).group_by(LoanInstallment.loan_id).all())
+        db.session.execute(db.insert(LoanRepayment.__table__), [
+            {'loan_id': loan_id, 'amount': Money(int(due[loan_id] * rng.choice([1, 1, 1, 0.9, 0.5]))), 'paid_at': today}
+            for loan_id, *_ in loans if due.get(loan_id) and rng.random() < 0.9
+        ])
+        db.session.commit()
+
+        summary, first_time = timed(lambda: service_loans(), 1)
+        db.session.commit()
+        print(f"service_loans(): {first_time:.2f}s for {summary['loans']} loans "
+              f"({summary['updated']} updated, {summary['repaid']} repaid)")
+        summary, second_time = timed(lambda: service_loans(), 1)
+        db.session.commit()
+        print(f"service_loans() with nothing changed: {second_time:.2f}s ({summary['updated']} updated)")
+
+        portfolio, snapshot_time = timed(portfolio_at_risk, args.repeat)
+        starts = [start for _, start in LOAN_ARREARS_BUCKETS]
+        bucket = db.case(*[(Loan.days_past_due >= start, i) for i, start in reversed(list(enumerate(starts)))], else_=0)
+        grouped, grouped_time = timed(lambda: db.session.query(
+            bucket, db.func.count(), db.func.sum(Loan.outstanding_balance)
+        ).filter(Loan.status == 'Approved').group_by(bucket).all(), args.repeat)
+        assert {LOAN_ARREARS_BUCKETS[i][0]: count for i, count, _ in grouped} == \
+            {row['bucket']: row['loans'] for row in portfolio['buckets'] if row['loans']}
+        _, recompute_time = timed(lambda: service_loans(as_of=datetime.utcnow().date() + timedelta(days=1)), 1)
+        db.session.rollback()
+        print(f"portfolio at risk (PAR{portfolio['par_days']} {portfolio['par']}%): snapshot {snapshot_time * 1000:.2f}ms, "
+              f'grouping loans {grouped_time * 1000:.0f}ms, recomputing positions {recompute_time:.2f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""Compare peak memory and time of the streaming statement builder with generate_member_statement().
+
+Usage: python benchmarks/bench_member_statement.py [--rows 10000 100000] [--chunk-size 5000]
+
+Each size seeds a single long-standing member in a scratch SQLite database.
+Peak memory is the Python heap high-water mark reported by tracemalloc.
+"""
+import os
+import random
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from harness import bench_parser, use_scratch_database
+
+
+def seed(db, Member, Contribution, Loan, row_count):
+    rng = random.Random(7)
+    now = datetime.utcnow()
+    db.session.execute(db.delete(Loan))
+    db.session.execute(db.delete(Contribution))
+    db.session.execute(db.delete(Member))
+    db.session.execute(db.insert(Member), [{'id': 1, 'name': 'Long Standing', 'phone': '0700000001'}])
+    db.session.execute(db.insert(Contribution), [{
+        'member_id': 1,
+        'amount': float(rng.choice([500, 1000, 2000])),
+        'date': now - timedelta(minutes=i)
+    } for i in range(row_count)])
+    db.session.execute(db.insert(Loan), [{
+        'member_id': 1,
+        'amount': float(rng.randint(1, 50) * 1000),
+        'date_applied': now - timedelta(days=i)
+    } for i in range(row_count // 20)])
+    db.session.commit()
+
+
+def measure(fn, *args, **kwargs):
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / (1024 * 1024)
+
+
+def main():
+    parser = bench_parser(__doc__)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    args = parser.parse_args()
+
+    workdir = use_scratch_database()
+
+    from fixed_app import app, db, Member, Contribution, Loan
+    from utils.reporting import generate_member_statement, stream_member_statement
+
+    print(f"{'rows':>8} {'builder':>18} {'time (s)':>9} {'peak (MiB)':>11}")
+    with app.app_context():
+        for row_count in args.rows:
+            seed(db, Member, Contribution, Loan, row_count)
+
+            db.session.expunge_all()
+            elapsed, peak = measure(generate_member_statement, 1)
+            print(f'{row_count:>8} {"legacy xlsx":>18} {elapsed:>9.2f} {peak:>11.1f}')
+
+            for fmt in ('csv', 'xlsx', 'parquet'):
+                db.session.expunge_all()
+                output = os.path.join(workdir, f'statement.{fmt}')
+                elapsed, peak = measure(stream_member_statement, 1, output, fmt=fmt, chunk_size=args.chunk_size)
+                print(f'{row_count:>8} {"streaming " + fmt:>18} {elapsed:>9.2f} {peak:>11.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""Compare the pooled M-Pesa client with the original per-call token + POST.
+
+Usage: python benchmarks/bench_mpesa_client.py [--pushes 200] [--latency 0.02] [--threads 8]
+
+Everything runs against a local stub of the Daraja OAuth and STK push
+endpoints, so no request leaves the machine.
+"""
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from harness import bench_parser
+
+from utils.mpesa import MpesaClient
+
+
+class StubDaraja(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    latency = 0.02
+    counts = {'token': 0, 'push': 0}
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, body):
+        time.sleep(self.latency)
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        with self.lock:
+            self.counts['token'] += 1
+        self._reply({'access_token': 'stub-token', 'expires_in': '3599'})
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        with self.lock:
+            self.counts['push'] += 1
+        self._reply({'ResponseCode': '0', 'CheckoutRequestID': 'ws_CO_stub'})
+
+
+def legacy_stk_push(base_url, phone, amount, account_ref):
+    """What each call site did before: fresh token, fresh connection, no timeout."""
+    r = requests.get(f'{base_url}/oauth/v1/generate?grant_type=client_credentials', auth=('key', 'secret'))
+    access_token = r.json()['access_token']
+    response = requests.post(
+        f'{base_url}/mpesa/stkpush/v1/processrequest',
+        json={'Amount': int(amount), 'PhoneNumber': phone, 'AccountReference': account_ref},
+        headers={'Authorization': f'Bearer {access_token}'}
+    )
+    return response.json()
+
+
+def run_threads(fn, pushes, threads):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        results = list(pool.map(lambda i: fn('254700000000', 100, f'CONTRIB-{i}'), range(pushes)))
+    assert all(r['ResponseCode'] == '0' for r in results)
+    return time.perf_counter() - start
+
+
+async def run_async(client, pushes):
+    async_client = client.async_client()
+    start = time.perf_counter()
+    results = await asyncio.gather(*(
+        async_client.stk_push('254700000000', 100, f'CONTRIB-{i}') for i in range(pushes)
+    ))
+    elapsed = time.perf_counter() - start
+    await async_client.close()
+    assert all(r['ResponseCode'] == '0' for r in results)
+    return elapsed
+
+
+def main():
+    parser = bench_parser(__doc__)
+    parser.add_argument('--pushes', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.02, help='stub response delay in seconds')
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    StubDaraja.latency = args.latency
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubDaraja)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_address[1]}'
+
+    def measure(label, run):
+        StubDaraja.counts.update(token=0, push=0)
+        elapsed = run()
+        print(f"{label:<20} {elapsed:>9.3f} {args.pushes / elapsed:>10.1f} {StubDaraja.counts['token']:>8}")
+
+    client = MpesaClient('key', 'secret', '174379', 'passkey', 'http://127.0.0.1/callback',
+                         base_url=base_url, pool_size=args.threads)
+
+    print(f"{'client':<20} {'time (s)':>9} {'pushes/s':>10} {'tokens':>8}")
+    measure('legacy', lambda: run_threads(lambda *a: legacy_stk_push(base_url, *a), args.pushes, args.threads))
+    measure('pooled', lambda: run_threads(client.stk_push, args.pushes, args.threads))
+    client.tokens.clear()
+    measure('pooled asyncio', lambda: asyncio.run(run_async(client, args.pushes)))
+
+    client.close()
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""Time the portfolio summary and the per-period return history on a large valuation history.
+
+Usage: python benchmarks/bench_portfolio.py [--investments 2000] [--months 60] [--repeat 5]
+
+Investments are bought at random months over the span and revalued about
+twice a month afterwards. The run times loading every active investment and
+summing in Python (what /investments used to do), the SQL-aggregated summary
+uncached and cached, and the monthly value/ROI/time-weighted return history
+computed from every valuation.
+"""
+import random
+from datetime import datetime, timedelta
+
+from harness import bench_parser, timed, use_scratch_database
+
+TYPES = ['stocks', 'bonds', 'real_estate', 'business', 'mutual_funds']
+
+
+def seed(db, Investment, InvestmentValuation, investment_count, months):
+    rng = random.Random(3)
+    now = datetime.utcnow()
+    start = now - timedelta(days=30 * months)
+    investments, valuations = [], []
+    for i in range(investment_count):
+        purchased = start + timedelta(days=rng.uniform(0, 30 * months))
+        invested = rng.randint(10000, 5000000) * 100
+        value = invested
+        investments.append({
+            'id': i + 1, 'name': f'Holding {i}', 'type': rng.choice(TYPES), 'amount_invested': invested,
+            'purchase_date': purchased, 'status': 'Active', 'created_by': 1
+        })
+        valued_at = purchased
+        while valued_at < now:
+            valuations.append({'investment_id': i + 1, 'valued_at': valued_at, 'value': value})
+            investments[-1]['current_value'] = value
+            valued_at += timedelta(days=rng.uniform(5, 25))
+            value = max(0, int(value * rng.gauss(1.005, 0.03)))
+    db.session.execute(db.delete(InvestmentValuation))
+    db.session.execute(db.delete(Investment))
+    db.session.execute(db.insert(Investment.__table__), investments)
+    for i in range(0, len(valuations), 50000):
+        db.session.execute(db.insert(InvestmentValuation.__table__), valuations[i:i + 50000])
+    db.session.commit()
+    return len(valuations)
+
+
+def legacy_summary(Investment):
+    investments = Investment.query.filter_by(status='Active').all()
+    total_invested = sum(float(i.amount_invested) for i in investments)
+    total_current = sum(float(i.current_value) for i in investments)
+    return total_invested, total_current
+
+
+def main():
+    parser = bench_parser(__doc__)
+    parser.add_argument('--investments', type=int, default=2000)
+    parser.add_argument('--months', type=int, default=60)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    use_scratch_database()
+
+    from fixed_app import (app, db, cache, Investment, InvestmentValuation, calculate_portfolio_performance,
+                           portfolio_performance_history)
+
+    with app.app_context():
+        valuations = seed(db, Investment, InvestmentValuation, args.investments, args.months)
+        print(f'{args.investments} investments, {valuations} valuations')
+
+        (invested, current), legacy_time = timed(lambda: legacy_summary(Investment), args.repeat)
+        print(f'load all and sum in Python: {legacy_time * 1000:.1f}ms')
+
+        def uncached():
+            cache.invalidate('portfolio:summary')
+            return calculate_portfolio_performance()
+        summary, sql_time = timed(uncached, args.repeat)
+        assert abs(float(summary['total_invested']) - invested) < 0.01
+        assert abs(float(summary['current_value']) - current) < 0.01
+        print(f'SQL summary by type: {sql_time * 1000:.1f}ms')
+        _, cached_time = timed(calculate_portfolio_performance, args.repeat)
+        print(f'cached summary: {cached_time * 1000:.3f}ms')
+
+        history, history_time = timed(portfolio_performance_history, args.repeat)
+        assert abs(history['value'][-1] - current) < 1
+        print(f"monthly history ({len(history['period_start'])} periods): {history_time * 1000:.1f}ms, "
+              f"time-weighted return {history['time_weighted_return'][-1] * 100:.1f}%")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""Compare the grouped-query risk engine with the original per-member loop.
+
+Usage: python benchmarks/bench_risk_analysis.py [--sizes 1000 10000 100000]
+
+Each size runs against a fresh SQLite database in a temporary directory, so the
+application database is never touched.
+"""
+import random
+from datetime import datetime, timedelta
+
+from harness import bench_parser, timed, use_scratch_database
+
+
+def legacy_calculate_risk_analysis(Member):
+    """The per-member loop calculate_risk_analysis() used before the grouped query."""
+    members = Member.query.all()
+    predictions = []
+    high_risk = medium_risk = low_risk = 0
+
+    for member in members:
+        total_contributions = sum(c.amount for c in member.contributions)
+        contribution_count = len(member.contributions)
+        loan_count = len(member.loans)
+        pending_loans = len([l for l in member.loans if l.status == 'Pending'])
+        rejected_loans = len([l for l in member.loans if l.status == 'Rejected'])
+
+        risk_score = 0
+        risk_factors = []
+        if total_contributions < 5000:
+            risk_score += 30
+            risk_factors.append('Low contribution history')
+        elif total_contributions < 15000:
+            risk_score += 15
+            risk_factors.append('Moderate contributions')
+        if rejected_loans > 0:
+            risk_score += 25
+            risk_factors.append('Previous loan rejections')
+        if pending_loans > 1:
+            risk_score += 20
+            risk_factors.append('Multiple pending loans')
+        if contribution_count < 3:
+            risk_score += 20
+            risk_factors.append('Low activity')
+        days_since_join = (datetime.utcnow() - member.join_date).days
+        if days_since_join < 30:
+            risk_score += 15
+            risk_factors.append('New member')
+
+        if risk_score >= 60:
+            risk_level, risk_color = 'High Risk', 'danger'
+            high_risk += 1
+        elif risk_score >= 30:
+            risk_level, risk_color = 'Medium Risk', 'warning'
+            medium_risk += 1
+        else:
+            risk_level, risk_color = 'Low Risk', 'success'
+            low_risk += 1
+
+        predictions.append({
+            'member': member,
+            'risk_score': min(risk_score, 100),
+            'risk_level': risk_level,
+            'risk_color': risk_color,
+            'risk_factors': risk_factors or ['Good standing'],
+            'total_contributions': total_contributions,
+            'loan_count': loan_count
+        })
+
+    predictions.sort(key=lambda x: x['risk_score'], reverse=True)
+    return {
+        'summary': {
+            'high_risk': high_risk,
+            'medium_risk': medium_risk,
+            'low_risk': low_risk,
+            'total_analyzed': len(members)
+        },
+        'predictions': predictions
+    }
+
+
+def seed(db, Member, Contribution, Loan, member_count, rebuild_member_balances):
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    db.session.execute(db.delete(Loan))
+    db.session.execute(db.delete(Contribution))
+    db.session.execute(db.delete(Member))
+
+    db.session.execute(db.insert(Member), [{
+        'id': i,
+        'name': f'Member {i}',
+        'phone': f'07{i:08d}',
+        'join_date': now - timedelta(days=rng.randint(0, 900)),
+        'status': 'Active'
+    } for i in range(1, member_count + 1)])
+
+    db.session.execute(db.insert(Contribution), [{
+        'member_id': rng.randint(1, member_count),
+        'amount': float(rng.choice([500, 1000, 2000, 5000])),
+        'date': now - timedelta(days=rng.randint(0, 900))
+    } for _ in range(member_count * 5)])
+
+    db.session.execute(db.insert(Loan), [{
+        'member_id': rng.randint(1, member_count),
+        'amount': float(rng.randint(1, 50) * 1000),
+        'status': rng.choice(['Pending', 'Approved', 'Rejected'])
+    } for _ in range(member_count)])
+    db.session.commit()
+
+    # Core inserts bypass the ORM events that maintain the balance projection
+    rebuild_member_balances()
+
+
+def summarize(result):
+    return result['summary'], sorted(
+        (p['member'].id, p['risk_score'], p['risk_level'], tuple(p['risk_factors'])) for p in result['predictions']
+    )
+
+
+def main():
+    parser = bench_parser(__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    args = parser.parse_args()
+
+    use_scratch_database()
+
+    from fixed_app import app, db, Member, Contribution, Loan, calculate_risk_analysis, rebuild_member_balances
+
+    print(f"{'members':>10} {'loop (s)':>10} {'grouped (s)':>12} {'speedup':>8}  match")
+    with app.app_context():
+        for size in args.sizes:
+            seed(db, Member, Contribution, Loan, size, rebuild_member_balances)
+
+            db.session.expunge_all()
+            legacy, legacy_time = timed(lambda: legacy_calculate_risk_analysis(Member))
+            db.session.expunge_all()
+            grouped, grouped_time = timed(calculate_risk_analysis)
+
+            match = summarize(legacy) == summarize(grouped)
+            print(f'{size:>10} {legacy_time:>10.3f} {grouped_time:>12.3f} {legacy_time / grouped_time:>7.1f}x  {match}')
+
+
+if __name__ == '__main__':
+    main()
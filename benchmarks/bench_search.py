@@ -0,0 +1,113 @@
+"""Compare full-text search with a LIKE scan over a large discussion corpus.
+
+Usage: python benchmarks/bench_search.py [--messages 1000000] [--repeat 5]
+
+Messages are drawn from a Zipf-distributed vocabulary, bulk inserted into a
+scratch SQLite database, and the index is then rebuilt in SQL, so the rebuild
+time is the cost of indexing an existing corpus. Each query is timed as the
+first page of ranked results next to the first page of newest-first
+LIKE '%term%' matches over message content, which is what a search without an
+index has to do. The LIKE scan can stop as soon as it has a page, so it is only
+competitive for words that occur in a large share of messages.
+"""
+import itertools
+import random
+import time
+from datetime import datetime, timedelta
+
+from harness import bench_parser, timed, use_scratch_database
+
+VOCABULARY_SIZE = 20000
+SYLLABLES = ['ka', 'ma', 'ta', 'ri', 'ndu', 'gi', 'wa', 'se', 'mbo', 'ku', 'li', 'no', 'zi', 'ye', 'chu', 'pe']
+# Domain words placed at fixed frequency ranks, from very common to rare
+RANKED_WORDS = {
+    3: 'meeting', 12: 'harambee', 40: 'school', 55: 'fees', 150: 'treasurer', 400: 'audit',
+    900: 'deadline', 1500: 'report', 6000: 'borehole', 15000: 'greenhouse'
+}
+QUERIES = ['meeting', 'harambee', 'school fees', 'treas', 'audit report', 'borehole', 'greenhouse', 'solar panel']
+
+CHUNK = 50000
+
+
+def build_vocabulary(rng):
+    words = set(RANKED_WORDS.values())
+    vocabulary = []
+    for rank in range(VOCABULARY_SIZE):
+        word = RANKED_WORDS.get(rank)
+        while word is None or (word in words and rank not in RANKED_WORDS):
+            word = ''.join(rng.choices(SYLLABLES, k=rng.randint(2, 4)))
+        words.add(word)
+        vocabulary.append(word)
+    weights = [1 / (rank + 1) for rank in range(VOCABULARY_SIZE)]
+    return vocabulary, list(itertools.accumulate(weights))
+
+
+def random_sentence(rng, vocabulary):
+    words, cumulative_weights = vocabulary
+    return ' '.join(rng.choices(words, cum_weights=cumulative_weights, k=rng.randint(6, 18)))
+
+
+def seed(db, Discussion, Message, message_count):
+    rng = random.Random(11)
+    vocabulary = build_vocabulary(rng)
+    now = datetime.utcnow()
+    discussion_count = max(1, message_count // 500)
+    db.session.execute(db.insert(Discussion), [{
+        'title': f'Thread {i}: ' + random_sentence(rng, vocabulary)[:60],
+        'content': random_sentence(rng, vocabulary),
+        'user_id': 1,
+        'date': now - timedelta(days=i)
+    } for i in range(discussion_count)])
+    first_discussion = db.session.query(db.func.min(Discussion.id)).scalar()
+    for start in range(0, message_count, CHUNK):
+        db.session.execute(db.insert(Message), [{
+            'content': random_sentence(rng, vocabulary),
+            'user_id': 1,
+            'discussion_id': first_discussion + rng.randrange(discussion_count),
+            'timestamp': now - timedelta(seconds=i)
+        } for i in range(start, min(start + CHUNK, message_count))])
+    db.session.commit()
+
+
+def like_scan(db, Message, text, limit):
+    query = db.session.query(Message.id, Message.content)
+    for term in text.split():
+        query = query.filter(Message.content.like(f'%{term}%'))
+    return query.order_by(Message.id.desc()).limit(limit).all()
+
+
+def main():
+    parser = bench_parser(__doc__)
+    parser.add_argument('--messages', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--per-page', type=int, default=20)
+    args = parser.parse_args()
+
+    use_scratch_database()
+
+    from fixed_app import app, db, Discussion, Message, SEARCH_KINDS, ensure_search_index, search_backend
+
+    with app.app_context():
+        start = time.perf_counter()
+        seed(db, Discussion, Message, args.messages)
+        print(f'seeded {args.messages} messages in {time.perf_counter() - start:.1f}s')
+
+        start = time.perf_counter()
+        ensure_search_index(rebuild=True)
+        print(f'rebuilt search index in {time.perf_counter() - start:.1f}s')
+
+        print(f"{'query':>14} {'matches':>8} {'LIKE scan (ms)':>15} {'FTS (ms)':>10} {'speedup':>8}")
+        for text in QUERIES:
+            matches = db.session.execute(db.text(
+                f"SELECT count(*) FROM {search_backend.table_name} WHERE {search_backend.table_name} MATCH :query"
+            ), {'query': ' '.join(f'"{term}"*' for term in text.split())}).scalar()
+            _, like_time = timed(lambda: like_scan(db, Message, text, args.per_page + 1), args.repeat)
+            _, fts_time = timed(lambda: search_backend.search(
+                db.session.connection(), text, list(SEARCH_KINDS), args.per_page + 1
+            ), args.repeat)
+            print(f'{text:>14} {matches:>8} {like_time * 1000:>15.1f} {fts_time * 1000:>10.1f} '
+                  f'{like_time / fts_time:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -0,0 +1,123 @@
+"""Measure smart contract throughput over a backlog of pending loans.
+
+Usage: python benchmarks/bench_smart_contracts.py [--loans 10000] [--members 2000]
+
+Compares the original rescan loop (per-loan lazy contribution sums and one
+ledger lookup per approval) with the compiled batch executor, each on a
+freshly seeded scratch database.
+"""
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+from harness import bench_parser, use_scratch_database
+
+
+def legacy_execute_smart_contracts(db, SmartContract, Loan, Blockchain):
+    """The full-rescan loop execute_smart_contracts() used before compiled contracts."""
+    import hashlib
+
+    def create_blockchain_transaction(transaction_type, amount, member_id, data):
+        last_block = Blockchain.query.order_by(Blockchain.id.desc()).first()
+        previous_hash = last_block.block_hash if last_block else '0' * 64
+        transaction_data = {
+            'type': transaction_type,
+            'amount': float(amount),
+            'member_id': member_id,
+            'timestamp': datetime.utcnow().isoformat(),
+            'data': data
+        }
+        block_string = json.dumps(transaction_data, sort_keys=True) + previous_hash
+        block = Blockchain(
+            block_hash=hashlib.sha256(block_string.encode()).hexdigest(),
+            previous_hash=previous_hash,
+            transaction_data=json.dumps(transaction_data),
+            transaction_type=transaction_type,
+            amount=amount,
+            member_id=member_id
+        )
+        db.session.add(block)
+        return block
+
+    approved = 0
+    for contract in SmartContract.query.filter_by(status='Active', auto_execute=True).all():
+        conditions = json.loads(contract.conditions)
+        if contract.contract_type == 'loan' and 'auto_approve_limit' in conditions:
+            for loan in Loan.query.filter_by(status='Pending').all():
+                if loan.amount <= conditions['auto_approve_limit']:
+                    member_contributions = sum(c.amount for c in loan.member.contributions)
+                    if member_contributions >= loan.amount * 2:
+                        loan.status = 'Approved'
+                        contract.executed_date = datetime.utcnow()
+                        create_blockchain_transaction('loan_approval', loan.amount, loan.member_id, {
+                            'loan_id': loan.id,
+                            'auto_approved': True,
+                            'contract_id': contract.id
+                        })
+                        approved += 1
+    return approved
+
+
+def seed(fixed_app, loan_count, member_count):
+    db = fixed_app.db
+    rng = random.Random(3)
+    now = datetime.utcnow()
+    for model in (fixed_app.Blockchain, fixed_app.LedgerHead, fixed_app.Loan, fixed_app.Contribution, fixed_app.Member):
+        db.session.execute(db.delete(model))
+    db.session.execute(db.insert(fixed_app.Member), [
+        {'id': i, 'name': f'Member {i}', 'phone': f'07{i:08d}'} for i in range(1, member_count + 1)
+    ])
+    db.session.execute(db.insert(fixed_app.Contribution), [{
+        'member_id': rng.randint(1, member_count),
+        'amount': float(rng.choice([1000, 2000, 5000])),
+        'date': now - timedelta(days=rng.randint(0, 365))
+    } for _ in range(member_count * 10)])
+    db.session.execute(db.insert(fixed_app.Loan), [{
+        'member_id': rng.randint(1, member_count),
+        'amount': float(rng.randint(1, 20) * 1000),
+        'status': 'Pending'
+    } for _ in range(loan_count)])
+    db.session.commit()
+    # Core inserts bypass the ORM events that maintain the balance projection
+    fixed_app.rebuild_member_balances()
+    fixed_app.lock_ledger_head()
+    db.session.commit()
+    db.session.expunge_all()
+
+
+def main():
+    parser = bench_parser(__doc__)
+    parser.add_argument('--loans', type=int, default=10000)
+    parser.add_argument('--members', type=int, default=2000)
+    args = parser.parse_args()
+
+    use_scratch_database()
+
+    import fixed_app
+    db = fixed_app.db
+
+    with fixed_app.app.app_context():
+        seed(fixed_app, args.loans, args.members)
+        start = time.perf_counter()
+        legacy_approved = legacy_execute_smart_contracts(db, fixed_app.SmartContract, fixed_app.Loan, fixed_app.Blockchain)
+        db.session.commit()
+        legacy_time = time.perf_counter() - start
+
+        seed(fixed_app, args.loans, args.members)
+        start = time.perf_counter()
+        approved = len(fixed_app.execute_smart_contracts())
+        db.session.commit()
+        batch_time = time.perf_counter() - start
+
+        drift = fixed_app.rebuild_member_balances(verify_only=True)
+        ledger = fixed_app.verify_ledger(full=True)
+
+    print(f'{args.loans} pending loans, {args.members} members')
+    print(f'  rescan loop: {legacy_approved:>6} approved in {legacy_time:7.2f}s ({args.loans / legacy_time:9.0f} loans/s)')
+    print(f'  batch:       {approved:>6} approved in {batch_time:7.2f}s ({args.loans / batch_time:9.0f} loans/s)')
+    print(f'  balance drift after batch: {len(drift)}, ledger valid: {ledger["valid"]}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""Load test /contribute against a fake M-Pesa server at increasing upstream latency.
+
+Usage: python benchmarks/bench_stk_pipeline.py [--requests 200] [--threads 8] [--latencies 0.05 0.5 2]
+
+For each latency the inline STK push (what /contribute used to do inside the
+request) is timed next to the queued /contribute request. Callbacks, including
+a duplicate of each, are then posted for every submitted payment, and the run
+checks that exactly one Contribution was reconciled per payment.
+"""
+import itertools
+import json
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer
+
+from bench_mpesa_client import StubDaraja
+from harness import bench_parser, use_scratch_database
+
+
+class FakeMpesa(StubDaraja):
+    checkout_ids = itertools.count(1)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        checkout_id = f'ws_CO_{next(self.checkout_ids)}'
+        self._reply({
+            'MerchantRequestID': f'mr-{checkout_id}',
+            'CheckoutRequestID': checkout_id,
+            'ResponseCode': '0',
+            'ResponseDescription': 'Success. Request accepted for processing'
+        })
+
+
+def callback_body(checkout_id, amount, receipt):
+    return {'Body': {'stkCallback': {
+        'MerchantRequestID': f'mr-{checkout_id}',
+        'CheckoutRequestID': checkout_id,
+        'ResultCode': 0,
+        'ResultDesc': 'The service request is processed successfully.',
+        'CallbackMetadata': {'Item': [
+            {'Name': 'Amount', 'Value': amount},
+            {'Name': 'MpesaReceiptNumber', 'Value': receipt},
+            {'Name': 'PhoneNumber', 'Value': 254700000000}
+        ]}
+    }}}
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1], samples[-1]
+
+
+def wait_for(condition, timeout=120):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise TimeoutError('pipeline did not settle')
+        time.sleep(0.05)
+
+
+def main():
+    parser = bench_parser(__doc__)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--latencies', type=float, nargs='+', default=[0.05, 0.5, 2.0])
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeMpesa)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    use_scratch_database()
+    os.environ['MPESA_BASE_URL'] = f'http://127.0.0.1:{server.server_address[1]}'
+    os.environ.setdefault('PAYMENT_BATCH_SECONDS', '0.5')
+
+    from werkzeug.security import generate_password_hash
+    from fixed_app import app, db, User, Member, Contribution, PendingPayment, initiate_stk_push
+
+    with app.app_context():
+        user = User(username='bench', password=generate_password_hash('bench'))
+        db.session.add(user)
+        db.session.flush()
+        member = Member(name='Bench Member', phone='0700000000', user_id=user.id)
+        db.session.add(member)
+        db.session.commit()
+
+    local = threading.local()
+
+    def client():
+        if not hasattr(local, 'client'):
+            local.client = app.test_client()
+            local.client.post('/login', data={'username': 'bench', 'password': 'bench'})
+        return local.client
+
+    def inline_push(i):
+        start = time.perf_counter()
+        initiate_stk_push('254700000000', 100, f'CONTRIB-{i}')
+        return time.perf_counter() - start
+
+    def queued_push(i):
+        http = client()
+        start = time.perf_counter()
+        response = http.post('/contribute', data={'amount': '100', 'phone': '254700000000'})
+        assert response.status_code == 302
+        return time.perf_counter() - start
+
+    def run(fn):
+        with ThreadPoolExecutor(args.threads) as pool:
+            return percentiles(list(pool.map(fn, range(args.requests))))
+
+    def count(query):
+        with app.app_context():
+            return query()
+
+    print(f"{'upstream (s)':>12} {'inline p50/p95/max (ms)':>26} {'queued p50/p95/max (ms)':>26}  reconciled")
+    for latency in args.latencies:
+        FakeMpesa.latency = latency
+        inline = run(inline_push)
+        queued = run(queued_push)
+
+        wait_for(lambda: count(lambda: PendingPayment.query.filter_by(status='Submitted').count()) == args.requests)
+        with app.app_context():
+            submitted = PendingPayment.query.filter_by(status='Submitted').all()
+            callbacks = [callback_body(p.checkout_request_id, float(p.amount), f'R{p.id:09d}') for p in submitted]
+            before = Contribution.query.count()
+        callback_client = app.test_client()
+        for body in callbacks + callbacks:
+            callback_client.post('/mpesa_callback', data=json.dumps(body), content_type='application/json')
+        wait_for(lambda: count(lambda: PendingPayment.query.filter_by(status='Paid').count()) == 0)
+        created = count(lambda: Contribution.query.count()) - before
+
+        fmt = lambda stats: '/'.join(f'{value * 1000:.0f}' for value in stats)
+        print(f'{latency:>12.2f} {fmt(inline):>26} {fmt(queued):>26}  {created == args.requests}')
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,31 @@
+"""Setup shared by the benchmark scripts: the repo on sys.path, argument parsing, a scratch database and timing."""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def bench_parser(doc):
+    """Argument parser described by the first line of a benchmark's docstring."""
+    return argparse.ArgumentParser(description=doc.splitlines()[0])
+
+
+def use_scratch_database():
+    """Point DATABASE_URL at a new SQLite file and return its directory; call before importing fixed_app."""
+    workdir = tempfile.mkdtemp(prefix='chama-bench-')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+    return workdir
+
+
+def timed(fn, repeat=1):
+    """(result of the last call, median seconds) over `repeat` calls of fn()."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - start)
+    return result, statistics.median(samples)
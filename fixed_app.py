@@ -1,16 +1,34 @@
-from flask import Flask, render_template, redirect, url_for, flash, request, abort
+from flask import Flask, render_template, redirect, url_for, flash, request, abort, jsonify, Response, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_sqlalchemy import SQLAlchemy
+from flask_migrate import Migrate
+from sqlalchemy import event
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
+from itsdangerous import BadSignature, URLSafeSerializer
+import click
 import os
 import secrets
 import string
+import time
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 from functools import wraps
 import requests
-import base64
 import json
+import numpy as np
+from utils.cache import TTLCache
+from utils.presence import MemoryPresenceStore, PresenceTracker, RedisPresenceStore
+from utils.messaging import MemoryMessageBroker, RedisMessageBroker, format_sse
+from utils.ledger import GENESIS_HASH, compute_block_hash, merkle_proof, merkle_root, verify_merkle_proof
+from utils.mpesa import MpesaClient, MpesaError, MpesaUnconfirmed
+from utils.payments import PaymentWorkers, parse_stk_callback
+from utils.jobs import PeriodicJob
+from utils.pagination import paginate_request
+from utils.search import render_snippet, search_backend_for
+from utils.loans import amortization_schedules, loan_positions
+from utils.timeseries import ROLLUP_RESOLUTIONS, day_number, history_resolution, parse_readings, rollup_deltas
+from utils.money import CENTS_PER_UNIT, Money, MoneyType, json_default
 
 # Load environment variables
 load_dotenv()
@@ -18,13 +36,53 @@ load_dotenv()
 # Create Flask app
 app = Flask(__name__, template_folder='templates')
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-key-for-testing')
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///chama.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///chama.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+class MoneyJSONProvider(DefaultJSONProvider):
+    """jsonify() Money amounts as plain numbers."""
+    
+    @staticmethod
+    def default(o):
+        try:
+            return json_default(o)
+        except TypeError:
+            return DefaultJSONProvider.default(o)
+
+app.json = MoneyJSONProvider(app)
+
 # Initialize extensions
 db = SQLAlchemy(app)
+
+def include_in_migrations(name, type_, parent_names):
+    # Full-text search tables are created and rebuilt by the search backend, not by migrations
+    return not (type_ == 'table' and name.startswith('search_'))
+
+migrate = Migrate(app, db, render_as_batch=True, include_name=include_in_migrations)
 login_manager = LoginManager(app)
 login_manager.login_view = 'login'
+cache = TTLCache()
+
+# Presence: heartbeats stay in the store and last_seen is flushed in batches
+if os.getenv('PRESENCE_REDIS_URL'):
+    presence_store = RedisPresenceStore.from_url(os.getenv('PRESENCE_REDIS_URL'))
+else:
+    presence_store = MemoryPresenceStore()
+presence = PresenceTracker(
+    presence_store,
+    window=int(os.getenv('PRESENCE_WINDOW_SECONDS', 300)),
+    flush_interval=int(os.getenv('PRESENCE_FLUSH_SECONDS', 60))
+)
+
+# New discussion messages are pushed to open streams through the broker
+if os.getenv('MESSAGES_REDIS_URL'):
+    message_broker = RedisMessageBroker.from_url(os.getenv('MESSAGES_REDIS_URL'))
+else:
+    message_broker = MemoryMessageBroker()
+
+# One pooled M-Pesa client per process; payment.MpesaGateway and the API blueprint use it too
+mpesa = MpesaClient.from_env()
+app.extensions['mpesa'] = mpesa
 
 # Define models
 class User(db.Model, UserMixin):
@@ -32,13 +90,8 @@ class User(db.Model, UserMixin):
     username = db.Column(db.String(80), unique=True, nullable=False)
     password = db.Column(db.String(200), nullable=False)
     is_admin = db.Column(db.Boolean, default=False)
-    last_seen = db.Column(db.DateTime, default=datetime.utcnow)
-    is_online = db.Column(db.Boolean, default=False)
+    last_seen = db.Column(db.DateTime, default=datetime.utcnow)  # flushed from the presence store
     members = db.relationship('Member', backref='user', lazy=True)
-    
-    def update_last_seen(self):
-        self.last_seen = datetime.utcnow()
-        self.is_online = True
 
 class Member(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -48,24 +101,97 @@ class Member(db.Model):
     join_date = db.Column(db.DateTime, default=datetime.utcnow)
     status = db.Column(db.String(20), default='Active')
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    
+    __table_args__ = (
+        db.Index('ix_member_user_id', 'user_id'),
+        db.Index('ix_member_join_date', 'join_date')
+    )
 
 class Contribution(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    amount = db.Column(db.Float, nullable=False)
+    amount = db.Column(MoneyType, nullable=False)
     date = db.Column(db.DateTime, default=datetime.utcnow)
     member_id = db.Column(db.Integer, db.ForeignKey('member.id'))
     description = db.Column(db.String(200))
+    category = db.Column(db.String(50))  # goal category the money is meant for; None for general savings
     member = db.relationship('Member', backref='contributions')
+    
+    __table_args__ = (
+        db.Index('ix_contribution_member_date', 'member_id', 'date'),
+        db.Index('ix_contribution_date', 'date'),
+        db.Index('ix_contribution_category_date', 'category', 'date')
+    )
 
 class Loan(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    amount = db.Column(db.Float, nullable=False)
+    amount = db.Column(MoneyType, nullable=False)
     purpose = db.Column(db.String(200))
     date_applied = db.Column(db.DateTime, default=datetime.utcnow)
     due_date = db.Column(db.DateTime)
     status = db.Column(db.String(20), default='Pending')
     member_id = db.Column(db.Integer, db.ForeignKey('member.id'))
     member = db.relationship('Member', backref='loans')
+    interest_rate = db.Column(db.Float, default=10.0)  # annual percentage, reducing balance
+    term_months = db.Column(db.Integer)
+    status_changed_at = db.Column(db.DateTime)
+    # Set when the loan is approved and its schedule generated
+    disbursed_at = db.Column(db.DateTime)
+    total_payable = db.Column(MoneyType)
+    # Position written by service_loans(); serviced_at is when it last changed
+    amount_repaid = db.Column(MoneyType, default=0)
+    principal_repaid = db.Column(MoneyType, default=0)  # part of amount_repaid that went to principal
+    outstanding_balance = db.Column(MoneyType)
+    arrears = db.Column(MoneyType, default=0)
+    days_past_due = db.Column(db.Integer, default=0)
+    next_due_date = db.Column(db.Date)
+    serviced_at = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        db.Index('ix_loan_member_date_applied', 'member_id', 'date_applied'),
+        db.Index('ix_loan_status_member', 'status', 'member_id'),
+        db.Index('ix_loan_date_applied', 'date_applied'),
+        db.Index('ix_loan_status_days_past_due', 'status', 'days_past_due')
+    )
+
+class LoanInstallment(db.Model):
+    loan_id = db.Column(db.Integer, db.ForeignKey('loan.id'), primary_key=True)
+    number = db.Column(db.Integer, primary_key=True)
+    due_date = db.Column(db.Date, nullable=False)
+    principal = db.Column(MoneyType, nullable=False)
+    interest = db.Column(MoneyType, nullable=False)
+
+class LoanRepayment(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    loan_id = db.Column(db.Integer, db.ForeignKey('loan.id'), nullable=False)
+    amount = db.Column(MoneyType, nullable=False)
+    paid_at = db.Column(db.DateTime, default=datetime.utcnow)
+    reference = db.Column(db.String(50))
+    recorded_by = db.Column(db.Integer, db.ForeignKey('user.id'))
+    
+    __table_args__ = (
+        db.Index('ix_loan_repayment_loan', 'loan_id', 'paid_at'),
+    )
+
+class LoanStatusChange(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    loan_id = db.Column(db.Integer, db.ForeignKey('loan.id'), nullable=False)
+    from_status = db.Column(db.String(20))
+    to_status = db.Column(db.String(20), nullable=False)
+    changed_at = db.Column(db.DateTime, default=datetime.utcnow)
+    changed_by = db.Column(db.Integer, db.ForeignKey('user.id'))  # None for contracts and servicing
+    
+    __table_args__ = (
+        db.Index('ix_loan_status_change_loan', 'loan_id', 'changed_at'),
+        db.Index('ix_loan_status_change_status', 'to_status', 'changed_at'),
+    )
+
+class LoanPortfolioSnapshot(db.Model):
+    # Active loans per arrears bucket, written by each full service_loans() run
+    as_of = db.Column(db.Date, primary_key=True)
+    bucket = db.Column(db.String(20), primary_key=True)
+    loans = db.Column(db.Integer, nullable=False, default=0)
+    outstanding = db.Column(MoneyType, nullable=False, default=0)
+    arrears = db.Column(MoneyType, nullable=False, default=0)
 
 class Discussion(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -74,6 +200,10 @@ class Discussion(db.Model):
     date = db.Column(db.DateTime, default=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
     user = db.relationship('User', backref='discussions')
+    
+    __table_args__ = (
+        db.Index('ix_discussion_date', 'date'),
+    )
 
 class Message(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -83,6 +213,11 @@ class Message(db.Model):
     discussion_id = db.Column(db.Integer, db.ForeignKey('discussion.id'))
     user = db.relationship('User', backref='messages')
     discussion = db.relationship('Discussion', backref='messages')
+    
+    __table_args__ = (
+        db.Index('ix_message_discussion_timestamp', 'discussion_id', 'timestamp'),
+        db.Index('ix_message_discussion_id', 'discussion_id', 'id')
+    )
 
 class Notification(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -92,6 +227,25 @@ class Notification(db.Model):
     is_read = db.Column(db.Boolean, default=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
     user = db.relationship('User', backref='notifications')
+    
+    __table_args__ = (
+        db.Index('ix_notification_user_read', 'user_id', 'is_read'),
+        db.Index('ix_notification_user_date', 'user_id', 'date')
+    )
+
+class Broadcast(db.Model):
+    # One row per message sent to every member; reads are tracked by BroadcastMarker
+    id = db.Column(db.Integer, primary_key=True)
+    title = db.Column(db.String(100), nullable=False)
+    message = db.Column(db.Text, nullable=False)
+    date = db.Column(db.DateTime, default=datetime.utcnow)
+    created_by = db.Column(db.Integer, db.ForeignKey('user.id'))
+
+class BroadcastMarker(db.Model):
+    # Broadcasts with id <= read_through_id are read, <= cleared_through_id are hidden
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    read_through_id = db.Column(db.Integer, nullable=False, default=0)
+    cleared_through_id = db.Column(db.Integer, nullable=False, default=0)
 
 class Activity(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -101,40 +255,75 @@ class Activity(db.Model):
     type = db.Column(db.String(50), default='meeting')
     created_by = db.Column(db.Integer, db.ForeignKey('user.id'))
     user = db.relationship('User', backref='activities')
+    
+    __table_args__ = (
+        db.Index('ix_activity_date', 'date'),
+    )
 
 class Investment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     type = db.Column(db.String(50), nullable=False)  # stocks, bonds, real_estate, business
-    amount_invested = db.Column(db.Float, nullable=False)
-    current_value = db.Column(db.Float, default=0)
+    amount_invested = db.Column(MoneyType, nullable=False)
+    current_value = db.Column(MoneyType, default=0)
     purchase_date = db.Column(db.DateTime, default=datetime.utcnow)
     description = db.Column(db.Text)
     status = db.Column(db.String(20), default='Active')
     created_by = db.Column(db.Integer, db.ForeignKey('user.id'))
+    
+    __table_args__ = (
+        db.Index('ix_investment_purchase_date', 'purchase_date'),
+        db.Index('ix_investment_status', 'status', 'type'),
+    )
+
+class InvestmentValuation(db.Model):
+    # One row per revaluation; Investment.current_value mirrors the latest one
+    id = db.Column(db.Integer, primary_key=True)
+    investment_id = db.Column(db.Integer, db.ForeignKey('investment.id'), nullable=False)
+    valued_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    value = db.Column(MoneyType, nullable=False)
+    note = db.Column(db.String(200))
+    recorded_by = db.Column(db.Integer, db.ForeignKey('user.id'))
+    
+    __table_args__ = (
+        db.Index('ix_investment_valuation_investment', 'investment_id', 'valued_at'),
+    )
 
 class Expense(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     category = db.Column(db.String(50), nullable=False)
-    amount = db.Column(db.Float, nullable=False)
+    amount = db.Column(MoneyType, nullable=False)
     description = db.Column(db.String(200), nullable=False)
     date = db.Column(db.DateTime, default=datetime.utcnow)
     receipt_url = db.Column(db.String(200))
     approved_by = db.Column(db.Integer, db.ForeignKey('user.id'))
     status = db.Column(db.String(20), default='Pending')
     created_by = db.Column(db.Integer, db.ForeignKey('user.id'))
+    
+    __table_args__ = (
+        db.Index('ix_expense_created_by_date', 'created_by', 'date'),
+        db.Index('ix_expense_status_date', 'status', 'date'),
+        db.Index('ix_expense_date', 'date')
+    )
 
 class Goal(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text)
-    target_amount = db.Column(db.Float, nullable=False)
-    current_amount = db.Column(db.Float, default=0)
+    target_amount = db.Column(MoneyType, nullable=False)
+    current_amount = db.Column(MoneyType, default=0)
     target_date = db.Column(db.DateTime, nullable=False)
     category = db.Column(db.String(50), nullable=False)
     status = db.Column(db.String(20), default='Active')
     created_by = db.Column(db.Integer, db.ForeignKey('user.id'))
     created_date = db.Column(db.DateTime, default=datetime.utcnow)
+    # 'manual' goals keep a typed-in current_amount; 'contributions' goals sum the
+    # contributions in their category (any when None) from contributions_from
+    # up to, not including, contributions_until
+    progress_source = db.Column(db.String(20), default='manual')
+    contribution_category = db.Column(db.String(50))
+    contributions_from = db.Column(db.DateTime)
+    contributions_until = db.Column(db.DateTime)
 
 class Meeting(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -144,9 +333,23 @@ class Meeting(db.Model):
     location = db.Column(db.String(200))
     meeting_link = db.Column(db.String(300))
     minutes = db.Column(db.Text)
-    attendees = db.Column(db.Text)  # JSON string of attendee IDs
     status = db.Column(db.String(20), default='Scheduled')
     created_by = db.Column(db.Integer, db.ForeignKey('user.id'))
+    attendees = db.relationship('Member', secondary='meeting_attendance', lazy=True, order_by='Member.name')
+    
+    __table_args__ = (
+        db.Index('ix_meeting_date', 'date'),
+    )
+
+class MeetingAttendance(db.Model):
+    meeting_id = db.Column(db.Integer, db.ForeignKey('meeting.id'), primary_key=True)
+    member_id = db.Column(db.Integer, db.ForeignKey('member.id'), primary_key=True)
+    recorded_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_meeting_attendance_member', 'member_id', 'meeting_id'),
+        db.Index('ix_meeting_attendance_recorded_at', 'recorded_at'),
+    )
 
 class Report(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -158,6 +361,56 @@ class Report(db.Model):
     period_start = db.Column(db.DateTime)
     period_end = db.Column(db.DateTime)
     generated_by = db.Column(db.Integer, db.ForeignKey('user.id'))
+    member_id = db.Column(db.Integer, db.ForeignKey('member.id'))  # set for member statements
+    
+    __table_args__ = (
+        db.Index('ix_report_type_member_generated', 'type', 'member_id', 'generated_date'),
+        db.Index('ix_report_generated_date', 'generated_date')
+    )
+
+class FinancialRollup(db.Model):
+    month = db.Column(db.Date, primary_key=True)  # first day of a closed month
+    contributions_total = db.Column(MoneyType, default=0)
+    contributions_count = db.Column(db.Integer, default=0)
+    loans_total = db.Column(MoneyType, default=0)
+    loans_count = db.Column(db.Integer, default=0)
+    expenses_total = db.Column(MoneyType, default=0)  # approved expenses only
+    expenses_count = db.Column(db.Integer, default=0)
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class ExpenseRollup(db.Model):
+    # Approved expenses per month and category, kept current as expenses are reviewed
+    month = db.Column(db.Date, primary_key=True)  # first day of the month
+    category = db.Column(db.String(50), primary_key=True)
+    total = db.Column(MoneyType, nullable=False, default=0)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class ReportRun(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    report_type = db.Column(db.String(50), default='member_statement')
+    period_start = db.Column(db.DateTime)
+    period_end = db.Column(db.DateTime)
+    status = db.Column(db.String(20), default='Running')  # Running, Completed, Failed
+    total_members = db.Column(db.Integer, default=0)
+    skipped_members = db.Column(db.Integer, default=0)
+    shard_count = db.Column(db.Integer, default=0)
+    completed_shards = db.Column(db.Integer, default=0)
+    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+    shards = db.relationship('ReportShard', backref='run', lazy=True, order_by='ReportShard.shard_index')
+
+class ReportShard(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    run_id = db.Column(db.Integer, db.ForeignKey('report_run.id'), nullable=False)
+    shard_index = db.Column(db.Integer, nullable=False)
+    member_count = db.Column(db.Integer, default=0)
+    reports_written = db.Column(db.Integer, default=0)
+    status = db.Column(db.String(20), default='Queued')  # Queued, Running, Completed, Failed
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    duration_seconds = db.Column(db.Float)
+    error = db.Column(db.Text)
 
 class Blockchain(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -167,9 +420,30 @@ class Blockchain(db.Model):
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     nonce = db.Column(db.Integer, default=0)
     transaction_type = db.Column(db.String(50))  # contribution, loan, expense
-    amount = db.Column(db.Float)
+    amount = db.Column(MoneyType)
     member_id = db.Column(db.Integer, db.ForeignKey('member.id'))
 
+class LedgerHead(db.Model):
+    id = db.Column(db.Integer, primary_key=True)  # single row, id 1
+    last_block_id = db.Column(db.Integer, default=0)
+    last_hash = db.Column(db.String(64), nullable=False)
+    block_count = db.Column(db.Integer, default=0)
+
+class LedgerCheckpoint(db.Model):
+    id = db.Column(db.Integer, primary_key=True)  # single row, id 1
+    block_id = db.Column(db.Integer, nullable=False)
+    block_hash = db.Column(db.String(64), nullable=False)
+    blocks_verified = db.Column(db.Integer, default=0)
+    verified_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class LedgerMerkleRoot(db.Model):
+    segment = db.Column(db.Integer, primary_key=True)
+    first_block_id = db.Column(db.Integer, nullable=False)
+    last_block_id = db.Column(db.Integer, nullable=False)
+    block_count = db.Column(db.Integer, nullable=False)
+    root = db.Column(db.String(64), nullable=False)
+    sealed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
 class AIInsight(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     insight_type = db.Column(db.String(50), nullable=False)  # prediction, recommendation, alert
@@ -180,6 +454,28 @@ class AIInsight(db.Model):
     generated_date = db.Column(db.DateTime, default=datetime.utcnow)
     status = db.Column(db.String(20), default='Active')
     priority = db.Column(db.String(20), default='Medium')
+    
+    __table_args__ = (
+        db.Index('ix_ai_insight_title_generated', 'title', 'generated_date'),
+        db.Index('ix_ai_insight_status_generated', 'status', 'generated_date')
+    )
+
+class InsightRun(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    source_state = db.Column(db.String(255), nullable=False)  # fingerprint of the data the insights were computed from
+    status = db.Column(db.String(20), default='Running')  # Running, Completed, Failed
+    insights_generated = db.Column(db.Integer, default=0)
+    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+    duration_seconds = db.Column(db.Float)
+    error = db.Column(db.Text)
+    
+    __table_args__ = (
+        db.Index('ix_insight_run_status', 'status', 'id'),
+        # At most one Running row: refresh_ai_insights claims a run by inserting it
+        db.Index('uq_insight_run_running', 'status', unique=True,
+                 sqlite_where=db.text("status = 'Running'"), postgresql_where=db.text("status = 'Running'")),
+    )
 
 class Biometric(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -195,13 +491,21 @@ class SmartContract(db.Model):
     contract_name = db.Column(db.String(100), nullable=False)
     contract_type = db.Column(db.String(50), nullable=False)  # loan, investment, savings
     conditions = db.Column(db.Text, nullable=False)  # JSON
-    parties = db.Column(db.Text)  # JSON of member IDs
     status = db.Column(db.String(20), default='Active')
     created_date = db.Column(db.DateTime, default=datetime.utcnow)
     executed_date = db.Column(db.DateTime)
-    amount = db.Column(db.Float)
+    amount = db.Column(MoneyType)
     auto_execute = db.Column(db.Boolean, default=True)
     created_by = db.Column(db.Integer, db.ForeignKey('user.id'))
+    parties = db.relationship('Member', secondary='contract_party', lazy=True, order_by='Member.name')
+
+class ContractParty(db.Model):
+    contract_id = db.Column(db.Integer, db.ForeignKey('smart_contract.id'), primary_key=True)
+    member_id = db.Column(db.Integer, db.ForeignKey('member.id'), primary_key=True)
+    
+    __table_args__ = (
+        db.Index('ix_contract_party_member', 'member_id', 'contract_id'),
+    )
 
 class IoTDevice(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -211,19 +515,60 @@ class IoTDevice(db.Model):
     location = db.Column(db.String(200))
     status = db.Column(db.String(20), default='Active')
     last_ping = db.Column(db.DateTime)
-    data = db.Column(db.Text)  # JSON sensor data
+    data = db.Column(db.Text)  # JSON device configuration; readings go to SensorReading
     battery_level = db.Column(db.Integer)
 
+class SensorReading(db.Model):
+    # Keyed by device, then day, so each device-day of readings is one contiguous
+    # range that history reads seek into and retention deletes as a whole
+    device_id = db.Column(db.Integer, db.ForeignKey('io_t_device.id'), primary_key=True)
+    day = db.Column(db.Integer, primary_key=True)  # days since the epoch
+    metric = db.Column(db.String(50), primary_key=True)
+    recorded_at = db.Column(db.DateTime, primary_key=True)
+    value = db.Column(db.Float, nullable=False)
+    
+    __table_args__ = {'sqlite_with_rowid': False}
+
+class SensorRollup(db.Model):
+    device_id = db.Column(db.Integer, db.ForeignKey('io_t_device.id'), primary_key=True)
+    metric = db.Column(db.String(50), primary_key=True)
+    resolution = db.Column(db.Integer, primary_key=True)  # bucket width in seconds
+    bucket_start = db.Column(db.DateTime, primary_key=True)
+    count = db.Column(db.Integer, nullable=False)
+    total = db.Column(db.Float, nullable=False)
+    minimum = db.Column(db.Float, nullable=False)
+    maximum = db.Column(db.Float, nullable=False)
+    
+    __table_args__ = {'sqlite_with_rowid': False}
+
+class SensorLatest(db.Model):
+    device_id = db.Column(db.Integer, db.ForeignKey('io_t_device.id'), primary_key=True)
+    metric = db.Column(db.String(50), primary_key=True)
+    recorded_at = db.Column(db.DateTime, nullable=False)
+    value = db.Column(db.Float, nullable=False)
+
 class VirtualReality(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     session_name = db.Column(db.String(100), nullable=False)
     session_type = db.Column(db.String(50), nullable=False)  # meeting, training, presentation
     vr_room_id = db.Column(db.String(100), unique=True)
-    participants = db.Column(db.Text)  # JSON of member IDs
     start_time = db.Column(db.DateTime, nullable=False)
     end_time = db.Column(db.DateTime)
     recording_url = db.Column(db.String(300))
     status = db.Column(db.String(20), default='Scheduled')
+    participants = db.relationship('Member', secondary='virtual_reality_participant', lazy=True, order_by='Member.name')
+    
+    __table_args__ = (
+        db.Index('ix_virtual_reality_start_time', 'start_time'),
+    )
+
+class VirtualRealityParticipant(db.Model):
+    session_id = db.Column(db.Integer, db.ForeignKey('virtual_reality.id'), primary_key=True)
+    member_id = db.Column(db.Integer, db.ForeignKey('member.id'), primary_key=True)
+    
+    __table_args__ = (
+        db.Index('ix_virtual_reality_participant_member', 'member_id', 'session_id'),
+    )
 
 class CryptoWallet(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -236,17 +581,618 @@ class CryptoWallet(db.Model):
     created_date = db.Column(db.DateTime, default=datetime.utcnow)
     is_active = db.Column(db.Boolean, default=True)
 
+class MemberBalance(db.Model):
+    member_id = db.Column(db.Integer, db.ForeignKey('member.id'), primary_key=True)
+    contribution_total = db.Column(MoneyType, default=0)
+    contribution_count = db.Column(db.Integer, default=0)
+    loan_total = db.Column(MoneyType, default=0)
+    loan_count = db.Column(db.Integer, default=0)
+    outstanding_principal = db.Column(MoneyType, default=0)  # approved loan amounts less principal repaid
+    pending_loans = db.Column(db.Integer, default=0)
+    approved_loans = db.Column(db.Integer, default=0)
+    rejected_loans = db.Column(db.Integer, default=0)
+    repaid_loans = db.Column(db.Integer, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_member_balance_updated_at', 'updated_at'),
+    )
+
+class PendingPayment(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    member_id = db.Column(db.Integer, db.ForeignKey('member.id'))
+    phone = db.Column(db.String(20), nullable=False)
+    amount = db.Column(MoneyType, nullable=False)
+    description = db.Column(db.String(200))
+    category = db.Column(db.String(50))
+    status = db.Column(db.String(20), default='Queued', index=True)  # Queued, Submitting, Submitted, Unknown, Paid, Completed, Failed
+    attempts = db.Column(db.Integer, default=0)
+    checkout_request_id = db.Column(db.String(100), unique=True)
+    merchant_request_id = db.Column(db.String(100))
+    result_code = db.Column(db.Integer)
+    result_desc = db.Column(db.String(255))
+    receipt = db.Column(db.String(50), unique=True)
+    paid_amount = db.Column(MoneyType)
+    contribution_id = db.Column(db.Integer, db.ForeignKey('contribution.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    submitted_at = db.Column(db.DateTime)
+    completed_at = db.Column(db.DateTime)
+
+# Member balance projection
+# Contribution and Loan writes adjust MemberBalance from mapper events, so the
+# projection is updated on the same connection and commits with the change.
+LOAN_STATUS_COLUMNS = {
+    'Pending': 'pending_loans',
+    'Approved': 'approved_loans',
+    'Rejected': 'rejected_loans',
+    'Repaid': 'repaid_loans'
+}
+BALANCE_COLUMNS = [
+    'contribution_total', 'contribution_count', 'loan_total', 'loan_count', 'outstanding_principal',
+    'pending_loans', 'approved_loans', 'rejected_loans', 'repaid_loans'
+]
+
+def empty_member_balance(member_id):
+    return MemberBalance(member_id=member_id, **{column: 0 for column in BALANCE_COLUMNS})
+
+def get_member_balance(member_id):
+    """O(1) lookup of a member's totals; members without activity get an all-zero balance."""
+    return db.session.get(MemberBalance, member_id) or empty_member_balance(member_id)
+
+def contribution_balance_deltas(amount, sign):
+    return {'contribution_total': sign * (amount or 0), 'contribution_count': sign}
+
+def loan_balance_deltas(amount, status, sign, principal_repaid=None):
+    deltas = {'loan_total': sign * (amount or 0), 'loan_count': sign}
+    if status in LOAN_STATUS_COLUMNS:
+        deltas[LOAN_STATUS_COLUMNS[status]] = sign
+    if status == 'Approved':
+        deltas['outstanding_principal'] = sign * ((amount or 0) - (principal_repaid or 0))
+    return deltas
+
+def apply_balance_deltas(connection, member_id, deltas, touch=False):
+    """Add deltas to a member's balance row; `touch` moves updated_at even when every delta is zero."""
+    deltas = {column: delta for column, delta in deltas.items() if delta}
+    if member_id is None or not (deltas or touch):
+        return
+    
+    table = MemberBalance.__table__
+    now = datetime.utcnow()
+    # A single upsert, so concurrent first writes for a member cannot both try to insert its row
+    statement = dialect_insert(table).values(member_id=member_id, updated_at=now, **deltas)
+    connection.execute(statement.on_conflict_do_update(
+        index_elements=[table.c.member_id],
+        set_=dict({column: table.c[column] + delta for column, delta in deltas.items()}, updated_at=now)
+    ))
+
+def has_column_changes(target):
+    """True if a flushed update changed any column.
+    
+    Edits that move no total, such as a contribution's date, must still move
+    MemberBalance.updated_at, which the member data version is built on.
+    """
+    state = db.inspect(target)
+    return any(state.attrs[column.key].history.has_changes() for column in state.mapper.column_attrs)
+
+def previous_value(target, attribute):
+    history = db.inspect(target).attrs[attribute].history
+    return history.deleted[0] if history.deleted else getattr(target, attribute)
+
+def merge_deltas(*delta_sets):
+    merged = {}
+    for deltas in delta_sets:
+        for column, delta in deltas.items():
+            merged[column] = merged.get(column, 0) + delta
+    return merged
+
+def track_previous_value(target, value, oldvalue, initiator):
+    return value
+
+# Load the old value on assignment so the update handlers can reverse it
+for tracked_attribute in (Contribution.amount, Contribution.member_id, Contribution.category, Contribution.date,
+                          Loan.amount, Loan.status, Loan.member_id, Loan.principal_repaid):
+    event.listen(tracked_attribute, 'set', track_previous_value, active_history=True)
+
+@event.listens_for(Contribution, 'after_insert')
+def contribution_inserted(mapper, connection, target):
+    apply_balance_deltas(connection, target.member_id, contribution_balance_deltas(target.amount, 1))
+
+@event.listens_for(Contribution, 'after_update')
+def contribution_updated(mapper, connection, target):
+    old_member_id = previous_value(target, 'member_id')
+    removed = contribution_balance_deltas(previous_value(target, 'amount'), -1)
+    added = contribution_balance_deltas(target.amount, 1)
+    if old_member_id == target.member_id:
+        apply_balance_deltas(connection, target.member_id, merge_deltas(removed, added),
+                             touch=has_column_changes(target))
+    else:
+        apply_balance_deltas(connection, old_member_id, removed)
+        apply_balance_deltas(connection, target.member_id, added)
+
+@event.listens_for(Contribution, 'after_delete')
+def contribution_deleted(mapper, connection, target):
+    apply_balance_deltas(connection, target.member_id, contribution_balance_deltas(target.amount, -1))
+
+@event.listens_for(Loan, 'after_insert')
+def loan_inserted(mapper, connection, target):
+    apply_balance_deltas(connection, target.member_id,
+                         loan_balance_deltas(target.amount, target.status, 1, target.principal_repaid))
+
+@event.listens_for(Loan, 'after_update')
+def loan_updated(mapper, connection, target):
+    old_member_id = previous_value(target, 'member_id')
+    removed = loan_balance_deltas(previous_value(target, 'amount'), previous_value(target, 'status'), -1,
+                                  previous_value(target, 'principal_repaid'))
+    added = loan_balance_deltas(target.amount, target.status, 1, target.principal_repaid)
+    if old_member_id == target.member_id:
+        apply_balance_deltas(connection, target.member_id, merge_deltas(removed, added),
+                             touch=has_column_changes(target))
+    else:
+        apply_balance_deltas(connection, old_member_id, removed)
+        apply_balance_deltas(connection, target.member_id, added)
+
+@event.listens_for(Loan, 'after_delete')
+def loan_deleted(mapper, connection, target):
+    apply_balance_deltas(connection, target.member_id,
+                         loan_balance_deltas(target.amount, target.status, -1, target.principal_repaid))
+
+@event.listens_for(Member, 'after_delete')
+def member_deleted(mapper, connection, target):
+    for model in (MemberBalance, MeetingAttendance, ContractParty, VirtualRealityParticipant):
+        table = model.__table__
+        connection.execute(table.delete().where(table.c.member_id == target.id))
+
+def compute_member_balances():
+    """Recompute every member's balance from the raw Contribution and Loan rows."""
+    balances = {}
+    
+    contribution_rows = db.session.query(
+        Contribution.member_id,
+        db.func.sum(Contribution.amount),
+        db.func.count(Contribution.id)
+    ).join(Member, Member.id == Contribution.member_id).group_by(Contribution.member_id)
+    for member_id, total, count in contribution_rows:
+        balance = balances.setdefault(member_id, dict.fromkeys(BALANCE_COLUMNS, 0))
+        balance['contribution_total'] = total or 0
+        balance['contribution_count'] = count
+    
+    loan_rows = db.session.query(
+        Loan.member_id,
+        Loan.status,
+        db.func.sum(Loan.amount),
+        db.func.count(Loan.id)
+    ).join(Member, Member.id == Loan.member_id).group_by(Loan.member_id, Loan.status)
+    for member_id, status, total, count in loan_rows:
+        balance = balances.setdefault(member_id, dict.fromkeys(BALANCE_COLUMNS, 0))
+        balance['loan_total'] += total or 0
+        balance['loan_count'] += count
+        if status in LOAN_STATUS_COLUMNS:
+            balance[LOAN_STATUS_COLUMNS[status]] += count
+        if status == 'Approved':
+            balance['outstanding_principal'] += total or 0
+    
+    # Principal repaid comes from the schedules and repayments themselves, not the stored loan positions
+    loan_table = Loan.__table__
+    loans, _, positions = read_loan_positions(
+        [loan_table.c.status == 'Approved', loan_table.c.member_id.in_(db.select(Member.id))],
+        datetime.utcnow().date(), loan_table.c.member_id
+    )
+    for (_, member_id), principal_repaid in zip(loans, positions['principal_repaid'].tolist()):
+        balances[member_id]['outstanding_principal'] -= Money(principal_repaid)
+    
+    return balances
+
+def find_balance_drift(expected):
+    """Compare stored balances with freshly computed ones; returns (member_id, column, stored, expected)."""
+    drift = []
+    stored = {balance.member_id: balance for balance in MemberBalance.query.all()}
+    for member_id in sorted(set(stored) | set(expected)):
+        balance = stored.get(member_id)
+        values = expected.get(member_id, dict.fromkeys(BALANCE_COLUMNS, 0))
+        for column in BALANCE_COLUMNS:
+            stored_value = getattr(balance, column) or 0 if balance else 0
+            if stored_value != values[column]:
+                drift.append((member_id, column, stored_value, values[column]))
+    return drift
+
+def rebuild_member_balances(verify_only=False):
+    """Recompute the MemberBalance projection from scratch and return any drift found."""
+    expected = compute_member_balances()
+    drift = find_balance_drift(expected)
+    
+    if not verify_only:
+        now = datetime.utcnow()
+        db.session.execute(db.delete(MemberBalance))
+        if expected:
+            db.session.execute(db.insert(MemberBalance), [
+                dict(values, member_id=member_id, updated_at=now) for member_id, values in expected.items()
+            ])
+        db.session.commit()
+    
+    return drift
+
+@app.cli.command('rebuild-balances')
+@click.option('--verify-only', is_flag=True, help='Report drift without rewriting the projection.')
+def rebuild_balances_command(verify_only):
+    """Rebuild the member balance projection and report drift."""
+    drift = rebuild_member_balances(verify_only=verify_only)
+    for member_id, column, stored_value, expected_value in drift:
+        click.echo(f'member {member_id}: {column} stored={stored_value} expected={expected_value}')
+    
+    action = 'Verified' if verify_only else 'Rebuilt'
+    click.echo(f'{action} member balances: {len(drift)} drifted value(s).')
+    if verify_only and drift:
+        raise SystemExit(1)
+
+# Goal progress
+# Goals linked to contributions get current_amount adjusted from the same
+# Contribution mapper events as the balances; rebuild_goal_progress()
+# recomputes it from scratch in one UPDATE.
+CONTRIBUTION_CATEGORIES = ('savings', 'investment', 'emergency', 'project', 'equipment', 'other')
+GOAL_RATE_WINDOW_DAYS = 90
+
+def goal_counts_contribution(goal, category, date):
+    """SQL condition that a linked goal counts a contribution with this category and date (values or columns)."""
+    return db.and_(
+        goal.c.progress_source == 'contributions',
+        db.or_(goal.c.contribution_category.is_(None), goal.c.contribution_category == category),
+        db.or_(goal.c.contributions_from.is_(None), goal.c.contributions_from <= date),
+        db.or_(goal.c.contributions_until.is_(None), goal.c.contributions_until > date)
+    )
+
+def apply_goal_progress(connection, category, date, amount):
+    if not amount or date is None:
+        return
+    table = Goal.__table__
+    connection.execute(table.update().where(goal_counts_contribution(table, category, date)).values(
+        current_amount=db.func.coalesce(table.c.current_amount, 0) + amount
+    ))
+
+@event.listens_for(Contribution, 'after_insert')
+def contribution_counted_for_goals(mapper, connection, target):
+    apply_goal_progress(connection, target.category, target.date, target.amount)
+
+@event.listens_for(Contribution, 'after_update')
+def contribution_recounted_for_goals(mapper, connection, target):
+    old_amount = previous_value(target, 'amount')
+    apply_goal_progress(connection, previous_value(target, 'category'), previous_value(target, 'date'),
+                        -old_amount if old_amount else None)
+    apply_goal_progress(connection, target.category, target.date, target.amount)
+
+@event.listens_for(Contribution, 'after_delete')
+def contribution_uncounted_for_goals(mapper, connection, target):
+    apply_goal_progress(connection, target.category, target.date, -target.amount if target.amount else None)
+
+def goal_contribution_total(goal):
+    """Correlated SUM of the contributions a goal counts."""
+    contribution = Contribution.__table__
+    return db.select(db.func.coalesce(db.func.sum(contribution.c.amount), 0)).where(
+        goal_counts_contribution(goal, contribution.c.category, contribution.c.date)
+    ).correlate(goal).scalar_subquery()
+
+def rebuild_goal_progress(goal_ids=None, verify_only=False):
+    """Recompute current_amount of linked goals from contributions; returns (goal id, stored, expected) drift."""
+    table = Goal.__table__
+    condition = table.c.progress_source == 'contributions'
+    if goal_ids is not None:
+        condition = db.and_(condition, table.c.id.in_(goal_ids))
+    expected = goal_contribution_total(table)
+    drift = db.session.execute(
+        db.select(table.c.id, table.c.current_amount, expected)
+        .where(condition, db.func.coalesce(table.c.current_amount, 0) != expected).order_by(table.c.id)
+    ).all()
+    if not verify_only:
+        db.session.execute(table.update().where(condition).values(current_amount=goal_contribution_total(table)))
+    return [tuple(row) for row in drift]
+
+def goal_projections(now=None):
+    """{goal id: projection} for every goal, from each linked goal's contribution rate over the last GOAL_RATE_WINDOW_DAYS.
+    
+    Recent contributions are summed once per category and day, and every goal
+    takes the buckets it counts, so the cost does not grow with the number of
+    goals; date bounds apply at day granularity here. The window is shortened
+    for goals that started counting more recently. A projection has the rate
+    per day, the projected completion date (None when nothing was contributed
+    in the window) and whether that is on or before the target date. Manual
+    goals have no rate and no projection.
+    """
+    now = now or datetime.utcnow()
+    cents = lambda column: db.type_coerce(column, db.BigInteger)
+    goals = db.session.execute(db.select(
+        Goal.id, cents(Goal.target_amount), cents(db.func.coalesce(Goal.current_amount, 0)),
+        Goal.progress_source == 'contributions', Goal.contribution_category,
+        Goal.target_date, Goal.contributions_from, Goal.contributions_until
+    ).order_by(Goal.id)).all()
+    if not goals:
+        return {}
+    day = db.func.date(Contribution.date)
+    buckets = db.session.execute(
+        db.select(Contribution.category, day, cents(db.func.sum(Contribution.amount)))
+        .where(Contribution.date >= now - timedelta(days=GOAL_RATE_WINDOW_DAYS))
+        .group_by(Contribution.category, day)
+    ).all()
+    
+    codes = {category: code for code, category in enumerate(CONTRIBUTION_CATEGORIES)}
+    ids, target, current, linked = np.array([row[:4] for row in goals], dtype=np.int64).T
+    linked = linked.astype(bool)
+    # -1 counts every category; contributions without a known category get -2
+    goal_category = np.array([codes.get(row[4], -1) for row in goals])
+    target_dates = np.array([row[5] for row in goals], dtype='datetime64[us]')
+    counted_from = np.array([row[6] for row in goals], dtype='datetime64[us]')
+    counted_until = np.array([row[7] for row in goals], dtype='datetime64[us]')
+    bucket_category = np.array([codes.get(row[0], -2) for row in buckets], dtype=np.int64)
+    bucket_day = np.array([row[1] for row in buckets], dtype='datetime64[D]')
+    bucket_total = np.array([row[2] for row in buckets], dtype=np.float64) / CENTS_PER_UNIT
+    
+    from_day = np.where(np.isnat(counted_from), np.datetime64('0001-01-01'), counted_from.astype('datetime64[D]'))
+    until_day = np.where(np.isnat(counted_until), np.datetime64('9999-12-31'), counted_until.astype('datetime64[D]'))
+    counts = (
+        ((goal_category[:, None] == -1) | (goal_category[:, None] == bucket_category[None, :]))
+        & (from_day[:, None] <= bucket_day[None, :]) & (bucket_day[None, :] < until_day[:, None])
+    )
+    recent = counts.astype(np.float64) @ bucket_total
+    
+    now64 = np.datetime64(now, 'us')
+    window_days = np.clip((now64 - counted_from) / np.timedelta64(1, 'D'), 1, GOAL_RATE_WINDOW_DAYS)
+    window_days = np.where(np.isnan(window_days), GOAL_RATE_WINDOW_DAYS, window_days)
+    rate = np.where(linked, recent / window_days, np.nan)
+    remaining = np.maximum(target - current, 0) / CENTS_PER_UNIT
+    with np.errstate(divide='ignore', invalid='ignore'):
+        days = np.where(remaining == 0, 0, remaining / rate)
+    projectable = linked & np.isfinite(days)
+    projected = now64 + np.where(projectable, days * 86400e6, 0).astype('timedelta64[us]')
+    on_track = projectable & (projected <= target_dates)
+    return {
+        goal_id: {
+            'rate_per_day': round(float(goal_rate), 2) if is_linked else None,
+            'projected_date': projected_date.astype(datetime) if can_project else None,
+            'on_track': bool(goal_on_track) if can_project else None
+        }
+        for goal_id, goal_rate, is_linked, projected_date, can_project, goal_on_track
+        in zip(ids.tolist(), rate, linked, projected, projectable, on_track)
+    }
+
+@app.cli.command('rebuild-goal-progress')
+@click.option('--verify-only', is_flag=True, help='Report drift without rewriting current amounts.')
+def rebuild_goal_progress_command(verify_only):
+    """Recompute linked goals' current amounts from contributions and report drift."""
+    drift = rebuild_goal_progress(verify_only=verify_only)
+    db.session.commit()
+    for goal_id, stored_value, expected_value in drift:
+        click.echo(f'goal {goal_id}: current_amount stored={stored_value} expected={expected_value}')
+    
+    action = 'Verified' if verify_only else 'Rebuilt'
+    click.echo(f'{action} goal progress: {len(drift)} drifted goal(s).')
+    if verify_only and drift:
+        raise SystemExit(1)
+
 # User loader for Flask-Login
 @login_manager.user_loader
 def load_user(user_id):
     return db.session.get(User, int(user_id))
 
+# Dashboard cache
+# Shared parts are the same for every user and only expire; per-user and
+# per-member parts are also dropped when a transaction changing the underlying
+# rows commits. Dropping them at flush time would let a request served before
+# the commit cache the old rows again.
+SHARED_CACHE_TTL = 30
+USER_CACHE_TTL = 60
+
+def invalidate_on_commit(*keys, prefix=None):
+    """Drop cache keys (and keys under `prefix`) once the current transaction commits; a rollback discards them."""
+    pending = db.session.info.setdefault('cache_invalidations', {'keys': set(), 'prefixes': set()})
+    pending['keys'].update(keys)
+    if prefix:
+        pending['prefixes'].add(prefix)
+
+@event.listens_for(db.session, 'after_commit')
+def apply_cache_invalidations(session):
+    pending = session.info.pop('cache_invalidations', None)
+    if pending:
+        cache.invalidate(*pending['keys'])
+        for prefix in pending['prefixes']:
+            cache.invalidate_prefix(prefix)
+
+@event.listens_for(db.session, 'after_rollback')
+def discard_cache_invalidations(session):
+    session.info.pop('cache_invalidations', None)
+
+def shared_dashboard_data():
+    def load():
+        upcoming_activities = db.session.query(
+            Activity.id, Activity.title, Activity.description, Activity.date, Activity.type
+        ).filter(Activity.date >= datetime.utcnow()).order_by(Activity.date).limit(5).all()
+        discussions = db.session.query(
+            Discussion.id, Discussion.title, Discussion.date
+        ).order_by(Discussion.date.desc()).limit(3).all()
+        return {
+            'upcoming_activities': upcoming_activities,
+            'discussions': discussions,
+            'discussion_count': Discussion.query.count()
+        }
+    return cache.get_or_set('shared:dashboard', SHARED_CACHE_TTL, load)
+
+def user_dashboard_data(user_id):
+    def load():
+        member = db.session.query(
+            Member.id, Member.name, Member.phone, Member.email, Member.join_date, Member.status, Member.user_id
+        ).filter_by(user_id=user_id).order_by(Member.id).first()
+        notifications = notification_feed(user_id, unread_only=True).limit(3).all()
+        return {
+            'member': member,
+            'notifications': notifications,
+            'unread_notifications_count': unread_notification_count(user_id)
+        }
+    return cache.get_or_set(f'dashboard:user:{user_id}', USER_CACHE_TTL, load)
+
+def member_dashboard_data(member_id):
+    def load():
+        contributions = db.session.query(
+            Contribution.id, Contribution.amount, Contribution.date, Contribution.description
+        ).filter_by(member_id=member_id).order_by(Contribution.date.desc()).limit(5).all()
+        loans = db.session.query(
+            Loan.id, Loan.amount, Loan.purpose, Loan.status, Loan.date_applied, Loan.due_date
+        ).filter_by(member_id=member_id).order_by(Loan.date_applied.desc()).limit(3).all()
+        return {
+            'contributions': contributions,
+            'loans': loans,
+            'total_contributions': get_member_balance(member_id).contribution_total
+        }
+    return cache.get_or_set(f'dashboard:member:{member_id}', USER_CACHE_TTL, load)
+
+def assemble_user_dashboard(user):
+    """Build the user dashboard context from the cached shared, per-user and per-member parts."""
+    context = dict(shared_dashboard_data())
+    context.update(user_dashboard_data(user.id))
+    member = context['member']
+    context.update(member_dashboard_data(member.id) if member else {'contributions': [], 'loans': [], 'total_contributions': 0})
+    
+    online_user_ids = presence.online_user_ids() - {user.id}
+    context['online_members'] = Member.query.filter(Member.user_id.in_(online_user_ids)).all() if online_user_ids else []
+    return context
+
+def invalidate_member_dashboard(member_id):
+    invalidate_on_commit(f'dashboard:member:{member_id}')
+
+def invalidate_user_dashboard(user_id):
+    invalidate_on_commit(f'dashboard:user:{user_id}')
+
+@event.listens_for(Contribution, 'after_insert')
+@event.listens_for(Contribution, 'after_update')
+@event.listens_for(Contribution, 'after_delete')
+@event.listens_for(Loan, 'after_insert')
+@event.listens_for(Loan, 'after_update')
+@event.listens_for(Loan, 'after_delete')
+def member_activity_changed(mapper, connection, target):
+    invalidate_member_dashboard(target.member_id)
+    invalidate_member_dashboard(previous_value(target, 'member_id'))
+
+@event.listens_for(Notification, 'after_insert')
+@event.listens_for(Notification, 'after_update')
+@event.listens_for(Notification, 'after_delete')
+def notification_changed(mapper, connection, target):
+    invalidate_user_dashboard(target.user_id)
+
+@event.listens_for(Member, 'after_insert')
+@event.listens_for(Member, 'after_update')
+@event.listens_for(Member, 'after_delete')
+def member_changed(mapper, connection, target):
+    invalidate_user_dashboard(target.user_id)
+    invalidate_user_dashboard(previous_value(target, 'user_id'))
+    invalidate_member_dashboard(target.id)
+
+@event.listens_for(Discussion, 'after_insert')
+@event.listens_for(Discussion, 'after_delete')
+@event.listens_for(Activity, 'after_insert')
+@event.listens_for(Activity, 'after_update')
+@event.listens_for(Activity, 'after_delete')
+def shared_dashboard_changed(mapper, connection, target):
+    invalidate_on_commit('shared:dashboard')
+
+# Presence tracking
+def write_last_seen(last_seen_by_user):
+    """Persist a batch of heartbeats with one executemany on its own connection."""
+    user_table = User.__table__
+    with db.engine.begin() as connection:
+        connection.execute(
+            user_table.update().where(user_table.c.id == db.bindparam('user_id')).values(last_seen=db.bindparam('seen')),
+            [{'user_id': user_id, 'seen': seen} for user_id, seen in last_seen_by_user.items()]
+        )
+
+@app.before_request
+def record_presence():
+    if current_user.is_authenticated:
+        presence.heartbeat(current_user.id)
+
+@app.after_request
+def flush_presence(response):
+    if presence.flush_due():
+        presence.flush(write_last_seen)
+    return response
+
+@app.cli.command('flush-presence')
+def flush_presence_command():
+    """Write buffered presence heartbeats to User.last_seen."""
+    click.echo(f'Flushed last_seen for {presence.flush(write_last_seen)} user(s).')
+
+# Notifications
+# Personal notifications are one row per user. A broadcast to every member is a
+# single Broadcast row; each user's BroadcastMarker records how far they have
+# read and cleared, so sending one costs O(1) rows whatever the member count.
+def broadcast_marker(user_id):
+    """(read_through_id, cleared_through_id) for a user, or None for admins, who get no broadcasts."""
+    row = db.session.query(
+        User.is_admin,
+        db.func.coalesce(BroadcastMarker.read_through_id, 0),
+        db.func.coalesce(BroadcastMarker.cleared_through_id, 0)
+    ).outerjoin(BroadcastMarker, BroadcastMarker.user_id == User.id).filter(User.id == user_id).first()
+    if row is None or row[0]:
+        return None
+    return row[1], row[2]
+
+def notification_feed(user_id, unread_only=False):
+    """Personal notifications and visible broadcasts as one (id, title, message, date, is_read) query, newest first."""
+    personal = db.select(
+        Notification.id, Notification.title, Notification.message, Notification.date, Notification.is_read
+    ).where(Notification.user_id == user_id)
+    if unread_only:
+        personal = personal.where(Notification.is_read == False)
+    
+    marker = broadcast_marker(user_id)
+    if marker is None:
+        feed = personal.subquery()
+    else:
+        read_through, cleared_through = marker
+        broadcasts = db.select(
+            Broadcast.id, Broadcast.title, Broadcast.message, Broadcast.date,
+            (Broadcast.id <= read_through).label('is_read')
+        ).where(Broadcast.id > (read_through if unread_only else cleared_through))
+        feed = db.union_all(personal, broadcasts).subquery()
+    return db.session.query(feed).order_by(feed.c.date.desc())
+
+def unread_notification_count(user_id):
+    count = Notification.query.filter_by(user_id=user_id, is_read=False).count()
+    marker = broadcast_marker(user_id)
+    if marker is not None:
+        count += db.session.query(db.func.count(Broadcast.id)).filter(Broadcast.id > marker[0]).scalar()
+    return count
+
+def latest_broadcast_id(connection=None):
+    statement = db.select(db.func.coalesce(db.func.max(Broadcast.id), 0))
+    return (connection or db.session).execute(statement).scalar()
+
+def advance_broadcast_marker(user_id, cleared=False):
+    """Mark every broadcast sent so far as read (and hidden, if `cleared`) for one user."""
+    latest = latest_broadcast_id()
+    values = {'read_through_id': latest}
+    if cleared:
+        values['cleared_through_id'] = latest
+    marker_table = BroadcastMarker.__table__
+    result = db.session.execute(marker_table.update().where(marker_table.c.user_id == user_id).values(**values))
+    if result.rowcount == 0:
+        db.session.execute(marker_table.insert().values(
+            user_id=user_id, read_through_id=latest, cleared_through_id=values.get('cleared_through_id', 0)
+        ))
+
+@event.listens_for(User, 'after_insert')
+def start_broadcast_marker(mapper, connection, target):
+    # Like a per-user insert, a broadcast only reaches users who existed when it was sent
+    latest = latest_broadcast_id(connection)
+    connection.execute(BroadcastMarker.__table__.insert().values(
+        user_id=target.id, read_through_id=latest, cleared_through_id=latest
+    ))
+
+@event.listens_for(Broadcast, 'after_insert')
+def broadcast_sent(mapper, connection, target):
+    invalidate_on_commit(prefix='dashboard:user:')
+
 # Context processor for unread notifications and discussion count
 @app.context_processor
 def inject_counts():
     if current_user.is_authenticated:
-        unread_count = Notification.query.filter_by(user_id=current_user.id, is_read=False).count()
-        discussion_count = Discussion.query.count()
+        unread_count = user_dashboard_data(current_user.id)['unread_notifications_count']
+        discussion_count = shared_dashboard_data()['discussion_count']
         return dict(unread_notifications_count=unread_count, discussion_count=discussion_count)
     return dict(unread_notifications_count=0, discussion_count=0)
 
@@ -260,76 +1206,83 @@ def admin_required(f):
     return decorated_function
 
 # AI Risk Analysis Function
-def calculate_risk_analysis():
-    members = Member.query.all()
-    predictions = []
-    high_risk = medium_risk = low_risk = 0
-    
-    for member in members:
-        # Calculate member metrics
-        total_contributions = sum(c.amount for c in member.contributions)
-        contribution_count = len(member.contributions)
-        loan_count = len(member.loans)
-        pending_loans = len([l for l in member.loans if l.status == 'Pending'])
-        rejected_loans = len([l for l in member.loans if l.status == 'Rejected'])
-        
-        # Calculate risk score (0-100)
-        risk_score = 0
-        risk_factors = []
-        
+def member_risk_aggregates():
+    """Fetch every member with their contribution and loan aggregates in one query."""
+    return db.session.query(
+        Member,
+        db.func.coalesce(MemberBalance.contribution_total, 0),
+        db.func.coalesce(MemberBalance.contribution_count, 0),
+        db.func.coalesce(MemberBalance.loan_count, 0),
+        db.func.coalesce(MemberBalance.pending_loans, 0),
+        db.func.coalesce(MemberBalance.rejected_loans, 0)
+    ).outerjoin(MemberBalance, MemberBalance.member_id == Member.id).order_by(Member.id).all()
+
+LOW_CONTRIBUTION_CENTS = 5000 * CENTS_PER_UNIT
+MODERATE_CONTRIBUTION_CENTS = 15000 * CENTS_PER_UNIT
+
+def score_member_risk(total_contributions, contribution_count, pending_loans, rejected_loans, days_since_join):
+    """Apply the risk thresholds to whole columns of member metrics at once.
+    
+    `total_contributions` is in cents. Returns the capped risk scores and a list of
+    (factor, mask) pairs marking which members each risk factor applies to.
+    """
+    rules = [
         # Contribution history analysis
-        if total_contributions < 5000:
-            risk_score += 30
-            risk_factors.append('Low contribution history')
-        elif total_contributions < 15000:
-            risk_score += 15
-            risk_factors.append('Moderate contributions')
-        
+        (30, 'Low contribution history', total_contributions < LOW_CONTRIBUTION_CENTS),
+        (15, 'Moderate contributions', (total_contributions >= LOW_CONTRIBUTION_CENTS) & (total_contributions < MODERATE_CONTRIBUTION_CENTS)),
         # Loan history analysis
-        if rejected_loans > 0:
-            risk_score += 25
-            risk_factors.append('Previous loan rejections')
-        
-        if pending_loans > 1:
-            risk_score += 20
-            risk_factors.append('Multiple pending loans')
-        
+        (25, 'Previous loan rejections', rejected_loans > 0),
+        (20, 'Multiple pending loans', pending_loans > 1),
         # Activity analysis
-        if contribution_count < 3:
-            risk_score += 20
-            risk_factors.append('Low activity')
-        
+        (20, 'Low activity', contribution_count < 3),
         # Member tenure
-        days_since_join = (datetime.utcnow() - member.join_date).days
-        if days_since_join < 30:
-            risk_score += 15
-            risk_factors.append('New member')
-        
-        # Determine risk level and color
-        if risk_score >= 60:
-            risk_level = 'High Risk'
-            risk_color = 'danger'
-            high_risk += 1
-        elif risk_score >= 30:
-            risk_level = 'Medium Risk'
-            risk_color = 'warning'
-            medium_risk += 1
-        else:
-            risk_level = 'Low Risk'
-            risk_color = 'success'
-            low_risk += 1
-        
+        (15, 'New member', days_since_join < 30),
+    ]
+    
+    risk_scores = np.zeros(len(total_contributions), dtype=np.int64)
+    for weight, _, mask in rules:
+        risk_scores += weight * mask
+    
+    return np.minimum(risk_scores, 100), [(factor, mask) for _, factor, mask in rules]
+
+def calculate_risk_analysis():
+    rows = member_risk_aggregates()
+    members = [row[0] for row in rows]
+    
+    total_contributions = np.array([row[1].cents for row in rows], dtype=np.int64)
+    contribution_count = np.array([row[2] for row in rows], dtype=np.int64)
+    loan_count = np.array([row[3] for row in rows], dtype=np.int64)
+    pending_loans = np.array([row[4] for row in rows], dtype=np.int64)
+    rejected_loans = np.array([row[5] for row in rows], dtype=np.int64)
+    
+    now = np.datetime64(datetime.utcnow())
+    join_dates = np.array([m.join_date for m in members], dtype='datetime64[us]')
+    days_since_join = (now - join_dates) // np.timedelta64(1, 'D')
+    
+    risk_scores, factor_masks = score_member_risk(
+        total_contributions, contribution_count, pending_loans, rejected_loans, days_since_join
+    )
+    
+    # Determine risk level and color
+    high_mask = risk_scores >= 60
+    medium_mask = (risk_scores >= 30) & ~high_mask
+    risk_levels = np.select([high_mask, medium_mask], ['High Risk', 'Medium Risk'], 'Low Risk')
+    risk_colors = np.select([high_mask, medium_mask], ['danger', 'warning'], 'success')
+    
+    predictions = []
+    for i, member in enumerate(members):
+        risk_factors = [factor for factor, mask in factor_masks if mask[i]]
         if not risk_factors:
             risk_factors = ['Good standing']
         
         predictions.append({
             'member': member,
-            'risk_score': min(risk_score, 100),
-            'risk_level': risk_level,
-            'risk_color': risk_color,
+            'risk_score': int(risk_scores[i]),
+            'risk_level': str(risk_levels[i]),
+            'risk_color': str(risk_colors[i]),
             'risk_factors': risk_factors,
-            'total_contributions': total_contributions,
-            'loan_count': loan_count
+            'total_contributions': rows[i][1],
+            'loan_count': int(loan_count[i])
         })
     
     # Sort by risk score (highest first)
@@ -337,14 +1290,168 @@ def calculate_risk_analysis():
     
     return {
         'summary': {
-            'high_risk': high_risk,
-            'medium_risk': medium_risk,
-            'low_risk': low_risk,
+            'high_risk': int(high_mask.sum()),
+            'medium_risk': int(medium_mask.sum()),
+            'low_risk': int(len(members) - high_mask.sum() - medium_mask.sum()),
             'total_analyzed': len(members)
         },
         'predictions': predictions
     }
 
+# Meeting attendance
+# Attendance is one MeetingAttendance row per member present. A meeting counts as
+# held once its date has passed unless it was cancelled, and members are expected
+# at the meetings held on or after the day they joined.
+def meeting_held(now=None):
+    return db.and_(Meeting.date <= (now or datetime.utcnow()), Meeting.status != 'Cancelled')
+
+def attended_meeting_count(now=None):
+    """Held meetings each Member in the enclosing query attended, as a correlated count."""
+    return db.select(db.func.count()).select_from(MeetingAttendance) \
+        .join(Meeting, Meeting.id == MeetingAttendance.meeting_id) \
+        .where(MeetingAttendance.member_id == Member.id, meeting_held(now)).correlate(Member).scalar_subquery()
+
+def expected_meeting_count(now=None):
+    """Held meetings since each Member in the enclosing query joined, as a correlated count."""
+    return db.select(db.func.count(Meeting.id)) \
+        .where(meeting_held(now), Meeting.date >= Member.join_date).correlate(Member).scalar_subquery()
+
+def meeting_attendee_count():
+    return db.select(db.func.count()).select_from(MeetingAttendance) \
+        .where(MeetingAttendance.meeting_id == Meeting.id).correlate(Meeting).scalar_subquery()
+
+def meeting_eligible_count():
+    """Members who had joined by each Meeting in the enclosing query."""
+    return db.select(db.func.count(Member.id)).where(Member.join_date <= Meeting.date).correlate(Meeting).scalar_subquery()
+
+def attendance_rate(attended, expected):
+    # Attendance recorded before a member's join date still counts towards their rate
+    expected = max(attended, expected)
+    return attended / expected if expected else None
+
+# Default prediction
+# Features for every member come from MemberBalance plus one indexed MAX(date)
+# per member, are scored as whole NumPy columns, and are cached per data version.
+DEFAULT_FEATURES = (
+    'contribution_total', 'contribution_count', 'contribution_mean', 'days_since_contribution',
+    'loan_total', 'outstanding_principal', 'pending_loans', 'approved_loans', 'rejected_loans', 'repaid_loans',
+    'attendance_rate'
+)
+DEFAULT_SCORE_TTL = 300
+NO_HISTORY_RISK = 0.8
+
+def attendance_version():
+    """Changes when attendance is recorded or removed and when a meeting is held or cancelled."""
+    attendance = db.session.query(db.func.count(), db.func.max(MeetingAttendance.recorded_at)) \
+        .select_from(MeetingAttendance).one()
+    held = db.session.query(db.func.count(Meeting.id)).filter(meeting_held()).scalar()
+    return f'{attendance[0]}:{attendance[1]}:{held}'
+
+def member_data_version():
+    """Changes whenever a member is added or removed, any contribution or loan moves a balance or attendance changes."""
+    members = db.session.query(db.func.count(Member.id), db.func.max(Member.id)).one()
+    last_change = db.session.query(db.func.max(MemberBalance.updated_at)).scalar()
+    return f'{members[0]}:{members[1]}:{last_change}:{attendance_version()}'
+
+def default_risk_features(member_ids=None):
+    """(member ids, float matrix with one DEFAULT_FEATURES column each) for all or the given members, by id.
+    
+    Money features are in currency units. days_since_contribution is NaN for
+    members who never contributed and attendance_rate for members who have not
+    been expected at any meeting yet.
+    """
+    last_contribution = db.select(db.func.max(Contribution.date)) \
+        .where(Contribution.member_id == Member.id).correlate(Member).scalar_subquery()
+    cents = lambda column: db.type_coerce(db.func.coalesce(column, 0), db.BigInteger)
+    query = db.select(
+        Member.id,
+        cents(MemberBalance.contribution_total),
+        db.func.coalesce(MemberBalance.contribution_count, 0),
+        cents(MemberBalance.loan_total),
+        cents(MemberBalance.outstanding_principal),
+        db.func.coalesce(MemberBalance.pending_loans, 0),
+        db.func.coalesce(MemberBalance.approved_loans, 0),
+        db.func.coalesce(MemberBalance.rejected_loans, 0),
+        db.func.coalesce(MemberBalance.repaid_loans, 0),
+        attended_meeting_count(),
+        expected_meeting_count(),
+        last_contribution
+    ).outerjoin(MemberBalance, MemberBalance.member_id == Member.id).order_by(Member.id)
+    if member_ids is not None:
+        query = query.where(Member.id.in_(member_ids))
+    rows = db.session.execute(query).all()
+    
+    ids = np.array([row[0] for row in rows], dtype=np.int64)
+    counts = np.array([row[1:11] for row in rows], dtype=np.int64).reshape(len(rows), 10)
+    last_dates = np.array([row[11] for row in rows], dtype='datetime64[us]')
+    
+    features = np.empty((len(rows), len(DEFAULT_FEATURES)), dtype=np.float64)
+    features[:, 0] = counts[:, 0] / CENTS_PER_UNIT
+    features[:, 1] = counts[:, 1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        features[:, 2] = np.where(counts[:, 1] > 0, features[:, 0] / counts[:, 1], 0)
+    features[:, 3] = (np.datetime64(datetime.utcnow()) - last_dates) / np.timedelta64(1, 'D')
+    features[:, 4:6] = counts[:, 2:4] / CENTS_PER_UNIT
+    features[:, 6:10] = counts[:, 4:8]
+    attended, expected = counts[:, 8], np.maximum(counts[:, 8], counts[:, 9])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        features[:, 10] = np.where(expected > 0, attended / expected, np.nan)
+    return ids, features
+
+def score_default_risk(features):
+    """Default risk in [0, 1] and its level for each row of a default_risk_features() matrix."""
+    column = {name: features[:, i] for i, name in enumerate(DEFAULT_FEATURES)}
+    contribution_total, loan_total = column['contribution_total'], column['loan_total']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        exposure = np.where(contribution_total > 0, np.minimum(1.0, loan_total / contribution_total), 1.0)
+    scores = np.where(column['contribution_count'] > 0, exposure, NO_HISTORY_RISK)
+    levels = np.select([scores > 0.7, scores > 0.4], ['High', 'Medium'], 'Low')
+    return scores, levels
+
+def default_risk_scores():
+    """(data version, member ids, features, scores, levels) for every member, cached until the data changes."""
+    version = member_data_version()
+    
+    def load():
+        ids, features = default_risk_features()
+        return (version, ids, features) + score_default_risk(features)
+    
+    # One key holds the latest matrix, so a new version replaces the old one instead of piling up beside it
+    cached = cache.get_or_set('default_scores', DEFAULT_SCORE_TTL, load)
+    if cached[0] != version:
+        cache.invalidate('default_scores')
+        cached = cache.get_or_set('default_scores', DEFAULT_SCORE_TTL, load)
+    return cached
+
+def default_predictions(ids, features, scores, levels):
+    """JSON-ready prediction dicts for matching rows of ids, features, scores and levels."""
+    column = {name: features[:, i] for i, name in enumerate(DEFAULT_FEATURES)}
+    days = column['days_since_contribution'].round(1)
+    attendance = column['attendance_rate'].round(3)
+    predictions = []
+    for member_id, score, level, mean, loans, count, since, pending, rejected, attended in zip(
+        ids.tolist(), scores.tolist(), levels.tolist(), column['contribution_mean'].tolist(),
+        column['loan_total'].tolist(), column['contribution_count'].astype(np.int64).tolist(),
+        np.where(np.isnan(days), None, days).tolist(), column['pending_loans'].astype(np.int64).tolist(),
+        column['rejected_loans'].astype(np.int64).tolist(), np.where(np.isnan(attendance), None, attendance).tolist()
+    ):
+        prediction = {
+            'member_id': member_id,
+            'risk_score': score,
+            'risk_level': level,
+            'avg_contribution': mean,
+            'total_loans': loans,
+            'contribution_count': count,
+            'days_since_contribution': since,
+            'pending_loans': pending,
+            'rejected_loans': rejected,
+            'attendance_rate': attended
+        }
+        if not count:
+            prediction['reason'] = 'No contribution history'
+        predictions.append(prediction)
+    return predictions
+
 # Routes
 @app.route('/')
 @login_required
@@ -352,25 +1459,9 @@ def index():
     if current_user.is_admin:
         return redirect(url_for('admin_dashboard'))
     
-    current_user.update_last_seen()
-    db.session.commit()
+    dashboard = assemble_user_dashboard(current_user)
     
-    member = Member.query.filter_by(user_id=current_user.id).first()
-    all_members = Member.query.filter(Member.user_id != current_user.id).all()
-    online_members = [m for m in all_members if m.user and m.user.is_online]
-    
-    member_ids = [member.id] if member else []
-    contributions = Contribution.query.filter(Contribution.member_id.in_(member_ids)).order_by(Contribution.date.desc()).limit(5).all() if member_ids else []
-    total_contributions = sum(c.amount for c in Contribution.query.filter(Contribution.member_id.in_(member_ids)).all()) if member_ids else 0
-    loans = Loan.query.filter(Loan.member_id.in_(member_ids)).order_by(Loan.date_applied.desc()).limit(3).all() if member_ids else []
-    upcoming_activities = Activity.query.filter(Activity.date >= datetime.utcnow()).order_by(Activity.date).limit(5).all()
-    discussions = Discussion.query.order_by(Discussion.date.desc()).limit(3).all()
-    notifications = Notification.query.filter_by(user_id=current_user.id, is_read=False).limit(3).all()
-    
-    return render_template('user_dashboard.html', 
-                         member=member, online_members=online_members, contributions=contributions,
-                         total_contributions=total_contributions, loans=loans, upcoming_activities=upcoming_activities,
-                         discussions=discussions, notifications=notifications)
+    return render_template('user_dashboard.html', **dashboard)
 
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -380,8 +1471,7 @@ def login():
         user = User.query.filter_by(username=username).first()
         
         if user and check_password_hash(user.password, password):
-            user.update_last_seen()
-            db.session.commit()
+            presence.heartbeat(user.id)
             login_user(user)
             return redirect(url_for('index'))
         else:
@@ -392,68 +1482,386 @@ def login():
 @app.route('/logout')
 @login_required
 def logout():
-    current_user.is_online = False
-    db.session.commit()
+    presence.remove(current_user.id)
     logout_user()
     return redirect(url_for('login'))
 
-# Investment tracking functions
+# Portfolio valuation
+# Every investment has a valuation at purchase and one per revaluation. The
+# current summary is cached until an investment or valuation changes; returns
+# over time are computed from the valuation history.
+PORTFOLIO_CACHE_TTL = 300
+PORTFOLIO_PERIODS = {
+    # numpy datetime64 unit, and the matching period number (months or years
+    # since 1970) of a datetime column, so no timestamps are converted in Python
+    'month': ('M', lambda moment: (db.extract('year', moment) - 1970) * 12 + db.extract('month', moment) - 1),
+    'year': ('Y', lambda moment: db.extract('year', moment) - 1970)
+}
+
+def record_valuation(investment, value, valued_at=None, note=None, recorded_by=None):
+    """Add a valuation snapshot and make it the investment's current value; the caller commits."""
+    valuation = InvestmentValuation(
+        investment_id=investment.id, value=value, valued_at=valued_at or datetime.utcnow(),
+        note=note, recorded_by=recorded_by
+    )
+    db.session.add(valuation)
+    investment.current_value = value
+    return valuation
+
 def calculate_portfolio_performance():
-    investments = Investment.query.filter_by(status='Active').all()
-    total_invested = sum(inv.amount_invested for inv in investments)
-    total_current = sum(inv.current_value for inv in investments)
-    return {
+    """Totals and ROI of the active portfolio, overall and by investment type; cached until it changes."""
+    def load():
+        rows = db.session.query(
+            Investment.type,
+            db.func.count(Investment.id),
+            db.func.coalesce(db.func.sum(Investment.amount_invested), 0),
+            db.func.coalesce(db.func.sum(Investment.current_value), 0)
+        ).filter(Investment.status == 'Active').group_by(Investment.type).order_by(Investment.type).all()
+        by_type = [portfolio_totals(invested, current, type=type_, count=count) for type_, count, invested, current in rows]
+        summary = portfolio_totals(sum((row['total_invested'] for row in by_type), Money()),
+                                   sum((row['current_value'] for row in by_type), Money()))
+        summary['by_type'] = by_type
+        return summary
+    return cache.get_or_set('portfolio:summary', PORTFOLIO_CACHE_TTL, load)
+
+def portfolio_totals(total_invested, total_current, **extra):
+    return dict(extra, **{
         'total_invested': total_invested,
         'current_value': total_current,
         'profit_loss': total_current - total_invested,
         'roi_percentage': ((total_current - total_invested) / total_invested * 100) if total_invested > 0 else 0
+    })
+
+@event.listens_for(Investment, 'after_insert')
+@event.listens_for(Investment, 'after_update')
+@event.listens_for(Investment, 'after_delete')
+@event.listens_for(InvestmentValuation, 'after_insert')
+@event.listens_for(InvestmentValuation, 'after_delete')
+def portfolio_changed(mapper, connection, target):
+    invalidate_on_commit(prefix='portfolio:')
+
+def portfolio_performance_history(period='month', now=None):
+    """Per-period portfolio value, flows, ROI and time-weighted return from the valuation history.
+    
+    An investment's value at the end of a period is its latest valuation up to
+    then. Money invested during a period counts as a flow at its start, so the
+    period return is value / (previous value + flows) - 1 and the time-weighted
+    return chains those. Returns a dict of numpy arrays, one entry per period.
+    """
+    unit, period_number = PORTFOLIO_PERIODS[period]
+    cents = lambda column: db.type_coerce(column, db.BigInteger)
+    active = db.select(Investment.id).where(Investment.status == 'Active')
+    valuations = db.session.execute(
+        db.select(InvestmentValuation.investment_id, period_number(InvestmentValuation.valued_at), cents(InvestmentValuation.value))
+        .where(InvestmentValuation.investment_id.in_(active))
+        .order_by(InvestmentValuation.investment_id, InvestmentValuation.valued_at, InvestmentValuation.id)
+    ).all()
+    purchases = db.session.execute(
+        db.select(period_number(Investment.purchase_date), cents(Investment.amount_invested)).where(Investment.status == 'Active')
+    ).all()
+    if not valuations:
+        empty = np.array([], dtype=np.float64)
+        return {'period_start': np.array([], dtype=f'datetime64[{unit}]'), 'value': empty, 'flows': empty,
+                'invested': empty, 'roi': empty, 'period_return': empty, 'time_weighted_return': empty}
+    
+    investment_ids, valued_in, values = np.array([tuple(row) for row in valuations], dtype=np.int64).T
+    values = values / CENTS_PER_UNIT
+    purchased_in, amounts = np.array([tuple(row) for row in purchases], dtype=np.int64).T
+    amounts = amounts / CENTS_PER_UNIT
+    
+    first = min(valued_in.min(), purchased_in.min())
+    last = max(valued_in.max(), np.datetime64(now or datetime.utcnow(), unit).astype(np.int64))
+    period_start = np.arange(first, last + 1).astype(f'datetime64[{unit}]')
+    periods = len(period_start)
+    _, rows = np.unique(investment_ids, return_inverse=True)
+    
+    # Last valuation of each investment in each period (rows are in time order,
+    # so later writes win), then carried forward into periods without one
+    grid = np.full((rows.max() + 1, periods), np.nan)
+    grid[rows, valued_in - first] = values
+    filled = np.where(np.isnan(grid), 0, np.arange(periods))
+    np.maximum.accumulate(filled, axis=1, out=filled)
+    grid = np.nan_to_num(np.take_along_axis(grid, filled, axis=1))
+    
+    value = grid.sum(axis=0)
+    flows = np.bincount(purchased_in - first, weights=amounts, minlength=periods)
+    invested = np.cumsum(flows)
+    opening = np.concatenate(([0.0], value[:-1])) + flows
+    with np.errstate(divide='ignore', invalid='ignore'):
+        roi = np.where(invested > 0, (value - invested) / invested, np.nan)
+        period_return = np.where(opening > 0, value / opening - 1, np.nan)
+    time_weighted_return = np.cumprod(1 + np.nan_to_num(period_return)) - 1
+    return {
+        'period_start': period_start,
+        'value': value,
+        'flows': flows,
+        'invested': invested,
+        'roi': roi,
+        'period_return': period_return,
+        'time_weighted_return': time_weighted_return
     }
 
+def portfolio_history_rows(history):
+    """JSON-ready rows of a portfolio_performance_history() result; undefined returns are None."""
+    percent = lambda value: None if np.isnan(value) else round(float(value) * 100, 2)
+    return [{
+        'period': str(start),
+        'value': round(float(value), 2),
+        'flows': round(float(flows), 2),
+        'invested': round(float(invested), 2),
+        'roi_percentage': percent(roi),
+        'return_percentage': percent(period_return),
+        'time_weighted_return_percentage': percent(twr)
+    } for start, value, flows, invested, roi, period_return, twr in zip(
+        history['period_start'], history['value'], history['flows'], history['invested'],
+        history['roi'], history['period_return'], history['time_weighted_return']
+    )]
+
+def portfolio_history(period='month'):
+    """portfolio_history_rows() of the full history, cached like the summary."""
+    return cache.get_or_set(f'portfolio:history:{period}', PORTFOLIO_CACHE_TTL,
+                            lambda: portfolio_history_rows(portfolio_performance_history(period)))
+
 # Blockchain Functions
 import hashlib
 import json
 
+LEDGER_VERIFY_CHUNK = 1000
+MERKLE_SEGMENT_SIZE = 1024
+
+def lock_ledger_head():
+    """Take the ledger write lock for the current transaction and return the chain head.
+    
+    Touching the head row first serializes appenders: it takes a row lock on
+    Postgres and the database write lock on SQLite, so the head read after it
+    cannot be stale.
+    """
+    head_table = LedgerHead.__table__
+    lock = head_table.update().where(head_table.c.id == 1).values(block_count=head_table.c.block_count)
+    if db.session.execute(lock).rowcount == 0:
+        # First append: concurrent appenders may race to create the head, so only one insert lands
+        last_block = db.session.query(Blockchain.id, Blockchain.block_hash).order_by(Blockchain.id.desc()).first()
+        db.session.execute(dialect_insert(head_table).values(
+            id=1,
+            last_block_id=last_block.id if last_block else 0,
+            last_hash=last_block.block_hash if last_block else GENESIS_HASH,
+            block_count=Blockchain.query.count()
+        ).on_conflict_do_nothing())
+        db.session.execute(lock)
+    return db.session.execute(db.select(head_table).where(head_table.c.id == 1)).one()
+
+def append_ledger_blocks(entries):
+    """Chain (transaction_type, amount, member_id, data) entries onto the ledger in the current transaction.
+    
+    All entries share one head lock and one flush; the caller commits.
+    """
+    head = lock_ledger_head()
+    previous_hash = head.last_hash
+    blocks = []
+    
+    for transaction_type, amount, member_id, data in entries:
+        transaction_data = {
+            'type': transaction_type,
+            # Hashed blocks have always carried the amount as a JSON number
+            'amount': float(amount) if amount is not None else None,
+            'member_id': member_id,
+            'timestamp': datetime.utcnow().isoformat(),
+            'data': data
+        }
+        block_hash = compute_block_hash(transaction_data, previous_hash)
+        blocks.append(Blockchain(
+            block_hash=block_hash,
+            previous_hash=previous_hash,
+            transaction_data=json.dumps(transaction_data),
+            transaction_type=transaction_type,
+            amount=amount,
+            member_id=member_id
+        ))
+        previous_hash = block_hash
+    
+    if blocks:
+        db.session.add_all(blocks)
+        db.session.flush()
+        head_table = LedgerHead.__table__
+        db.session.execute(head_table.update().where(head_table.c.id == 1).values(
+            last_block_id=blocks[-1].id,
+            last_hash=previous_hash,
+            block_count=head_table.c.block_count + len(blocks)
+        ))
+    return blocks
+
 def create_blockchain_transaction(transaction_type, amount, member_id, data):
-    # Get the last block
-    last_block = Blockchain.query.order_by(Blockchain.id.desc()).first()
-    previous_hash = last_block.block_hash if last_block else '0' * 64
-    
-    # Create transaction data
-    transaction_data = {
-        'type': transaction_type,
-        'amount': amount,
-        'member_id': member_id,
-        'timestamp': datetime.utcnow().isoformat(),
-        'data': data
-    }
+    return append_ledger_blocks([(transaction_type, amount, member_id, data)])[0]
+
+def iter_ledger_blocks(after_id=0, last_id=None, chunk_size=LEDGER_VERIFY_CHUNK):
+    """Yield (id, previous_hash, block_hash, transaction_data) rows in id order, one chunk at a time."""
+    while True:
+        query = db.session.query(
+            Blockchain.id, Blockchain.previous_hash, Blockchain.block_hash, Blockchain.transaction_data
+        ).filter(Blockchain.id > after_id)
+        if last_id is not None:
+            query = query.filter(Blockchain.id <= last_id)
+        rows = query.order_by(Blockchain.id).limit(chunk_size).all()
+        if not rows:
+            return
+        yield from rows
+        after_id = rows[-1].id
+
+def check_ledger_blocks(rows, expected_previous):
+    """Recompute each block's hash and link; returns (error, last_row)."""
+    last_row = None
+    for row in rows:
+        if expected_previous is not None and row.previous_hash != expected_previous:
+            return f'Block {row.id} has invalid previous hash', last_row
+        if compute_block_hash(row.transaction_data, row.previous_hash) != row.block_hash:
+            return f'Block {row.id} has been tampered with', last_row
+        expected_previous = row.block_hash
+        last_row = row
+    return None, last_row
+
+def merkle_segment_bounds(segment):
+    return segment * MERKLE_SEGMENT_SIZE + 1, (segment + 1) * MERKLE_SEGMENT_SIZE
+
+def seal_merkle_segments(up_to_block_id):
+    """Store roots for every closed segment ending at or before `up_to_block_id` that has none yet."""
+    sealed = db.session.query(db.func.max(LedgerMerkleRoot.segment)).scalar()
+    segment = 0 if sealed is None else sealed + 1
+    while merkle_segment_bounds(segment)[1] <= up_to_block_id:
+        first_id, last_id = merkle_segment_bounds(segment)
+        leaves = [block_hash for block_hash, in db.session.query(Blockchain.block_hash).filter(
+            Blockchain.id.between(first_id, last_id)
+        ).order_by(Blockchain.id)]
+        if leaves:
+            db.session.add(LedgerMerkleRoot(
+                segment=segment, first_block_id=first_id, last_block_id=last_id,
+                block_count=len(leaves), root=merkle_root(leaves)
+            ))
+        segment += 1
+
+def verify_ledger(full=False):
+    """Stream the chain in chunks, recomputing every hash.
     
-    # Calculate hash
-    block_string = json.dumps(transaction_data, sort_keys=True) + previous_hash
-    block_hash = hashlib.sha256(block_string.encode()).hexdigest()
-    
-    # Create blockchain entry
-    blockchain_entry = Blockchain(
-        block_hash=block_hash,
-        previous_hash=previous_hash,
-        transaction_data=json.dumps(transaction_data),
-        transaction_type=transaction_type,
-        amount=amount,
-        member_id=member_id
-    )
+    Unless `full`, verification resumes after the stored checkpoint, so only
+    blocks appended since the last run are checked.
+    """
+    checkpoint = None if full else db.session.get(LedgerCheckpoint, 1)
+    after_id, expected_previous = 0, GENESIS_HASH
+    if checkpoint:
+        anchor = db.session.get(Blockchain, checkpoint.block_id)
+        if not anchor or anchor.block_hash != checkpoint.block_hash:
+            return {'valid': False, 'error': f'Checkpoint block {checkpoint.block_id} has been modified'}
+        after_id, expected_previous = checkpoint.block_id, checkpoint.block_hash
+    
+    checked = 0
+    last_row = None
+    for row in iter_ledger_blocks(after_id):
+        error, _ = check_ledger_blocks([row], expected_previous)
+        if error:
+            return {'valid': False, 'error': error, 'block_id': row.id}
+        expected_previous = row.block_hash
+        last_row = row
+        checked += 1
+    
+    if last_row:
+        if not checkpoint:
+            checkpoint = db.session.get(LedgerCheckpoint, 1) or LedgerCheckpoint(id=1, blocks_verified=0)
+            db.session.add(checkpoint)
+        checkpoint.block_id = last_row.id
+        checkpoint.block_hash = last_row.block_hash
+        checkpoint.blocks_verified = (checkpoint.blocks_verified or 0) + checked
+        checkpoint.verified_at = datetime.utcnow()
+        seal_merkle_segments(last_row.id)
+    db.session.commit()
     
-    db.session.add(blockchain_entry)
-    return blockchain_entry
+    return {'valid': True, 'message': 'Blockchain is valid', 'blocks_checked': checked}
+
+def verify_ledger_range(first_id, last_id):
+    """Verify blocks first_id..last_id against the sealed Merkle roots covering them.
+    
+    Only the covering segments are read; blocks past the last sealed segment
+    are checked link by link from the end of that segment.
+    """
+    first_segment = (first_id - 1) // MERKLE_SEGMENT_SIZE
+    last_segment = (last_id - 1) // MERKLE_SEGMENT_SIZE
+    roots = {root.segment: root for root in LedgerMerkleRoot.query.filter(
+        LedgerMerkleRoot.segment.between(first_segment, last_segment)
+    )}
+    
+    for segment in range(first_segment, last_segment + 1):
+        segment_first, segment_last = merkle_segment_bounds(segment)
+        rows = list(iter_ledger_blocks(segment_first - 1, segment_last))
+        if not rows:
+            continue
+        previous = db.session.query(Blockchain.block_hash).filter(Blockchain.id < rows[0].id) \
+            .order_by(Blockchain.id.desc()).limit(1).scalar() or GENESIS_HASH
+        error, _ = check_ledger_blocks(rows, previous)
+        if error:
+            return {'valid': False, 'error': error}
+        stored = roots.get(segment)
+        if stored and merkle_root([row.block_hash for row in rows]) != stored.root:
+            return {'valid': False, 'error': f'Segment {segment} does not match its Merkle root'}
+    
+    return {'valid': True, 'message': f'Blocks {first_id}-{last_id} are valid'}
+
+def ledger_inclusion_proof(block_id):
+    """Merkle path proving a block belongs to its sealed segment, or None if not sealed yet.
+    
+    `verified` is False when the segment's blocks no longer hash to the root
+    sealed for it.
+    """
+    segment = (block_id - 1) // MERKLE_SEGMENT_SIZE
+    stored = db.session.get(LedgerMerkleRoot, segment)
+    if not stored:
+        return None
+    
+    hashes = db.session.query(Blockchain.id, Blockchain.block_hash).filter(
+        Blockchain.id.between(stored.first_block_id, stored.last_block_id)
+    ).order_by(Blockchain.id).all()
+    index = next((i for i, row in enumerate(hashes) if row.id == block_id), None)
+    if index is None:
+        return None
+    
+    proof = merkle_proof([row.block_hash for row in hashes], index)
+    return {
+        'block_id': block_id,
+        'block_hash': hashes[index].block_hash,
+        'segment': segment,
+        'root': stored.root,
+        'verified': verify_merkle_proof(hashes[index].block_hash, proof, stored.root),
+        'proof': [{'hash': sibling, 'position': 'right' if is_right else 'left'} for sibling, is_right in proof]
+    }
 
 # AI-Powered Analytics
+# Insights are generated by a background job and stored as AIInsight rows, which
+# is all the /ai-insights page reads. A run is skipped unless members,
+# contributions, loans or investments changed since the last completed run, and
+# only one process at a time can hold the Running InsightRun.
+RECENT_CONTRIBUTION_WINDOW = 5
+INSIGHT_RUN_TIMEOUT = int(os.getenv('INSIGHT_RUN_TIMEOUT', 3600))
+
+def contribution_trend():
+    """(count, overall average, average of the latest RECENT_CONTRIBUTION_WINDOW) contributions in one windowed query."""
+    ranked = db.select(
+        Contribution.amount,
+        db.func.row_number().over(order_by=(Contribution.date.desc(), Contribution.id.desc())).label('recency')
+    ).subquery()
+    recent = ranked.c.recency <= RECENT_CONTRIBUTION_WINDOW
+    count, total, recent_count, recent_total = db.session.execute(db.select(
+        db.func.count(),
+        db.func.coalesce(db.func.sum(ranked.c.amount), 0),
+        db.func.count(db.case((recent, 1))),
+        db.func.coalesce(db.func.sum(db.case((recent, ranked.c.amount))), 0)
+    )).one()
+    if not count:
+        return 0, Money(0), Money(0)
+    return count, total / count, recent_total / recent_count
+
 def generate_ai_insights():
     insights = []
     
     # Analyze contribution patterns
-    contributions = Contribution.query.all()
-    if len(contributions) > 5:
-        avg_contribution = sum(c.amount for c in contributions) / len(contributions)
-        recent_avg = sum(c.amount for c in contributions[-5:]) / 5
-        
+    contribution_count, avg_contribution, recent_avg = contribution_trend()
+    if contribution_count > RECENT_CONTRIBUTION_WINDOW and avg_contribution > 0:
         if recent_avg > avg_contribution * 1.2:
             insights.append({
                 'type': 'prediction',
@@ -487,95 +1895,1137 @@ def generate_ai_insights():
             'priority': 'Medium'
         })
     
-    return insights
+    return insights
+
+def insight_source_state():
+    """Fingerprint of the members, balances and investments insights are computed from.
+    
+    Contribution and loan changes move MemberBalance.updated_at, including the
+    set-based loan approvals, so the contribution and loan tables themselves
+    are never scanned.
+    """
+    investments = db.session.query(
+        db.func.count(Investment.id), db.func.max(Investment.id),
+        db.func.sum(Investment.amount_invested), db.func.sum(Investment.current_value)
+    ).filter(Investment.status == 'Active').one()
+    return '|'.join([member_data_version()] + [str(value) for value in investments])
+
+def save_ai_insights(insights, generated_at):
+    """Keep one Active row per insight title: refresh the ones still produced, add new ones, resolve the rest."""
+    current = {insight['title']: insight for insight in insights}
+    for insight in AIInsight.query.filter_by(status='Active').order_by(AIInsight.generated_date.desc()):
+        data = current.pop(insight.title, None)
+        if data is None:
+            insight.status = 'Resolved'
+            continue
+        insight.insight_type = data['type']
+        insight.description = data['description']
+        insight.confidence_score = data['confidence']
+        insight.priority = data['priority']
+        insight.generated_date = generated_at
+    db.session.add_all(AIInsight(
+        insight_type=data['type'],
+        title=data['title'],
+        description=data['description'],
+        confidence_score=data['confidence'],
+        priority=data['priority'],
+        generated_date=generated_at
+    ) for data in current.values())
+
+def claim_insight_run(state):
+    """Insert the single Running InsightRun, or return None if another process holds it.
+    
+    Runs left Running for longer than INSIGHT_RUN_TIMEOUT (a worker that died
+    mid-run) are marked Failed first so they cannot block refreshes for good.
+    """
+    now = datetime.utcnow()
+    InsightRun.query.filter(
+        InsightRun.status == 'Running',
+        InsightRun.started_at < now - timedelta(seconds=INSIGHT_RUN_TIMEOUT)
+    ).update({'status': 'Failed', 'error': 'Abandoned: no result before the run timeout', 'finished_at': now},
+             synchronize_session=False)
+    run_id = db.session.execute(
+        dialect_insert(InsightRun.__table__).values(
+            source_state=state, status='Running', insights_generated=0, started_at=now
+        ).on_conflict_do_nothing().returning(InsightRun.id)
+    ).scalar()
+    db.session.commit()
+    return db.session.get(InsightRun, run_id) if run_id is not None else None
+
+def refresh_ai_insights(force=False):
+    """Regenerate insights if their source data changed since the last completed run.
+    
+    Safe to call from several processes at once: only the one that claims the
+    Running row generates insights. Returns the InsightRun, or None when the
+    run was skipped.
+    """
+    state = insight_source_state()
+    last_run = InsightRun.query.filter_by(status='Completed').order_by(InsightRun.id.desc()).first()
+    if not force and last_run is not None and last_run.source_state == state:
+        db.session.rollback()
+        return None
+    
+    run = claim_insight_run(state)
+    if run is None:
+        return None
+    start = time.perf_counter()
+    try:
+        insights = generate_ai_insights()
+        save_ai_insights(insights, run.started_at)
+        run.status = 'Completed'
+        run.insights_generated = len(insights)
+    except Exception as e:
+        db.session.rollback()
+        app.logger.exception('AI insight generation failed')
+        run = db.session.get(InsightRun, run.id)
+        run.status = 'Failed'
+        run.error = str(e)
+    run.finished_at = datetime.utcnow()
+    run.duration_seconds = time.perf_counter() - start
+    db.session.commit()
+    return run
+
+# Smart Contract Execution
+compiled_contracts = {}
+
+class CompiledLoanContract:
+    """A loan contract's conditions parsed once into an approval predicate over whole arrays of cents."""
+    
+    def __init__(self, contract_id, conditions):
+        self.contract_id = contract_id
+        self.auto_approve_limit = Money.parse(conditions['auto_approve_limit']).cents
+        self.contribution_multiplier = float(conditions.get('contribution_multiplier', 2))
+    
+    def approves(self, amounts, contribution_totals):
+        return (amounts <= self.auto_approve_limit) & (contribution_totals >= amounts * self.contribution_multiplier)
+
+def compile_contract(contract):
+    key = (contract.id, contract.conditions)
+    if key not in compiled_contracts:
+        conditions = json.loads(contract.conditions)
+        if contract.contract_type == 'loan' and 'auto_approve_limit' in conditions:
+            compiled_contracts[key] = CompiledLoanContract(contract.id, conditions)
+        else:
+            compiled_contracts[key] = None
+    return compiled_contracts[key]
+
+def approve_loans_in_bulk(approvals):
+    """Approve (loan_id, member_id, amount, contract_id) tuples in the current transaction.
+    
+    transition_loans() moves the loans, adjusts the balance projection and
+    writes their schedules; this records the contracts and ledger blocks.
+    """
+    by_id = {approval[0]: approval for approval in approvals}
+    approved = [by_id[loan_id] for loan_id, _, _ in transition_loans(list(by_id), 'Approved')]
+    if not approved:
+        return []
+    
+    contract_table = SmartContract.__table__
+    db.session.execute(
+        contract_table.update().where(contract_table.c.id.in_({approval[3] for approval in approved}))
+        .values(executed_date=datetime.utcnow())
+    )
+    
+    # Create blockchain records
+    append_ledger_blocks([
+        ('loan_approval', amount, member_id, {'loan_id': loan_id, 'auto_approved': True, 'contract_id': contract_id})
+        for loan_id, member_id, amount, contract_id in approved
+    ])
+    return approved
+
+def execute_smart_contracts(member_ids=None):
+    """Auto-approve pending loans that satisfy an active loan contract.
+    
+    With `member_ids`, only those members' pending loans are evaluated (the
+    event path); without, every pending loan is scored in one batch.
+    """
+    contracts = [
+        compiled for compiled in (compile_contract(contract) for contract in
+                                  SmartContract.query.filter_by(status='Active', auto_execute=True).order_by(SmartContract.id))
+        if compiled
+    ]
+    if not contracts:
+        return []
+    
+    query = db.session.query(
+        Loan.id, Loan.member_id, Loan.amount, db.func.coalesce(MemberBalance.contribution_total, 0)
+    ).outerjoin(MemberBalance, MemberBalance.member_id == Loan.member_id).filter(Loan.status == 'Pending')
+    if member_ids is not None:
+        query = query.filter(Loan.member_id.in_(member_ids))
+    rows = query.order_by(Loan.id).all()
+    if not rows:
+        return []
+    
+    amounts = np.array([row[2].cents for row in rows], dtype=np.int64)
+    contribution_totals = np.array([row[3].cents for row in rows], dtype=np.int64)
+    
+    # Earlier contracts take precedence, as each approved loan is no longer pending
+    undecided = np.ones(len(rows), dtype=bool)
+    approvals = []
+    for contract in contracts:
+        matched = undecided & contract.approves(amounts, contribution_totals)
+        approvals.extend((rows[i][0], rows[i][1], rows[i][2], contract.contract_id) for i in np.flatnonzero(matched))
+        undecided &= ~matched
+    
+    return approve_loans_in_bulk(approvals) if approvals else []
+
+@event.listens_for(db.session, 'after_flush')
+def collect_contract_triggers(session, flush_context):
+    triggered = {
+        obj.member_id for obj in session.new
+        if isinstance(obj, Contribution) or (isinstance(obj, Loan) and obj.status == 'Pending')
+    }
+    if triggered:
+        session.info.setdefault('contract_members', set()).update(triggered)
+
+@event.listens_for(db.session, 'before_commit')
+def run_triggered_contracts(session):
+    # New loans and contributions are evaluated in the transaction that created them
+    session.flush()
+    member_ids = session.info.pop('contract_members', None)
+    if member_ids:
+        execute_smart_contracts(member_ids)
+
+@app.cli.command('run-contracts')
+def run_contracts_command():
+    """Evaluate every pending loan against the active smart contracts."""
+    approved = execute_smart_contracts()
+    db.session.commit()
+    click.echo(f'Auto-approved {len(approved)} loan(s).')
+
+# Financial Reports
+# Closed months are summarized once into FinancialRollup rows; a report over
+# any range reads those and only queries raw rows for partial or open months.
+REPORT_GRANULARITIES = ('day', 'week', 'month')
+REPORT_METRICS = ('contributions', 'loans', 'expenses')
+
+def report_sources():
+    return [
+        ('contributions', Contribution.date, Contribution.amount, None),
+        ('loans', Loan.date_applied, Loan.amount, None),
+        ('expenses', Expense.date, Expense.amount, Expense.status == 'Approved')
+    ]
+
+def month_start(timestamp):
+    return datetime(timestamp.year, timestamp.month, 1)
+
+def next_month(timestamp):
+    return datetime(timestamp.year + timestamp.month // 12, timestamp.month % 12 + 1, 1)
+
+def period_bucket(column, granularity):
+    """SQL expression for the 'YYYY-MM-DD' start of the day, week (Monday) or month a timestamp falls in."""
+    if db.engine.dialect.name == 'postgresql':
+        return db.func.to_char(db.func.date_trunc(granularity, column), 'YYYY-MM-DD')
+    if granularity == 'month':
+        return db.func.strftime('%Y-%m-01', column)
+    if granularity == 'week':
+        return db.func.date(column, 'weekday 0', '-6 days')
+    return db.func.date(column)
+
+def empty_period_totals():
+    return {metric: {'total': Money(0), 'count': 0} for metric in REPORT_METRICS}
+
+def live_period_totals(start, end, granularity, breakdown):
+    """Add SUM/COUNT per period for rows in [start, end) into `breakdown`, one grouped query per source."""
+    if start >= end:
+        return
+    for metric, date_column, amount_column, condition in report_sources():
+        bucket = period_bucket(date_column, granularity)
+        query = db.session.query(bucket, db.func.sum(amount_column), db.func.count()) \
+            .filter(date_column >= start, date_column < end)
+        if condition is not None:
+            query = query.filter(condition)
+        for period, total, count in query.group_by(bucket):
+            totals = breakdown.setdefault(period, empty_period_totals())[metric]
+            totals['total'] += total or 0
+            totals['count'] += count
+
+def refresh_monthly_rollups():
+    """Roll up every closed month that has no FinancialRollup row yet."""
+    current_month = month_start(datetime.utcnow())
+    first_dates = [
+        db.session.query(db.func.min(date_column)).scalar()
+        for _, date_column, _, _ in report_sources()
+    ]
+    first_dates = [first for first in first_dates if first]
+    if not first_dates:
+        return
+    
+    existing = {month for month, in db.session.query(FinancialRollup.month)}
+    missing = []
+    month = month_start(min(first_dates))
+    while month < current_month:
+        if month.date() not in existing:
+            missing.append(month)
+        month = next_month(month)
+    if not missing:
+        return
+    
+    breakdown = {}
+    live_period_totals(missing[0], current_month, 'month', breakdown)
+    now = datetime.utcnow()
+    for month in missing:
+        totals = breakdown.get(month.strftime('%Y-%m-%d'), empty_period_totals())
+        db.session.add(FinancialRollup(
+            month=month.date(),
+            computed_at=now,
+            **{f'{metric}_{field}': totals[metric][field] for metric in REPORT_METRICS for field in ('total', 'count')}
+        ))
+    db.session.commit()
+
+def invalidate_rollups(connection, *timestamps):
+    current_month = month_start(datetime.utcnow())
+    months = {month_start(timestamp).date() for timestamp in timestamps if timestamp and timestamp < current_month}
+    if months:
+        rollup_table = FinancialRollup.__table__
+        connection.execute(rollup_table.delete().where(rollup_table.c.month.in_(months)))
+
+for tracked_attribute in (Contribution.date, Loan.date_applied, Expense.date, Expense.status, Expense.amount, Expense.category):
+    event.listen(tracked_attribute, 'set', track_previous_value, active_history=True)
+
+@event.listens_for(Contribution, 'after_insert')
+@event.listens_for(Contribution, 'after_update')
+@event.listens_for(Contribution, 'after_delete')
+def contribution_rollup_changed(mapper, connection, target):
+    invalidate_rollups(connection, target.date, previous_value(target, 'date'))
+
+@event.listens_for(Loan, 'after_insert')
+@event.listens_for(Loan, 'after_update')
+@event.listens_for(Loan, 'after_delete')
+def loan_rollup_changed(mapper, connection, target):
+    invalidate_rollups(connection, target.date_applied, previous_value(target, 'date_applied'))
+
+@event.listens_for(Expense, 'after_insert')
+@event.listens_for(Expense, 'after_update')
+@event.listens_for(Expense, 'after_delete')
+def expense_rollup_changed(mapper, connection, target):
+    invalidate_rollups(connection, target.date, previous_value(target, 'date'))
+
+def generate_financial_report(start_date, end_date, granularity='month'):
+    """Totals and a per-period breakdown for start_date through the whole of end_date."""
+    end = end_date + timedelta(days=1)
+    refresh_monthly_rollups()
+    
+    breakdown = {}
+    live_ranges = [(start_date, end)]
+    if granularity == 'month':
+        first_whole = start_date if start_date == month_start(start_date) else next_month(start_date)
+        last_whole_end = min(month_start(end), month_start(datetime.utcnow()))
+        if first_whole < last_whole_end:
+            for rollup in FinancialRollup.query.filter(
+                FinancialRollup.month >= first_whole.date(), FinancialRollup.month < last_whole_end.date()
+            ):
+                breakdown[rollup.month.isoformat()] = {
+                    metric: {
+                        'total': getattr(rollup, f'{metric}_total'),
+                        'count': getattr(rollup, f'{metric}_count')
+                    } for metric in REPORT_METRICS
+                }
+            live_ranges = [(start_date, first_whole), (last_whole_end, end)]
+    
+    for range_start, range_end in live_ranges:
+        live_period_totals(range_start, range_end, granularity, breakdown)
+    
+    totals = empty_period_totals()
+    for period_totals in breakdown.values():
+        for metric in REPORT_METRICS:
+            totals[metric]['total'] += period_totals[metric]['total']
+            totals[metric]['count'] += period_totals[metric]['count']
+    
+    return {
+        'period_start': start_date.isoformat(),
+        'period_end': end_date.isoformat(),
+        'granularity': granularity,
+        'total_contributions': totals['contributions']['total'],
+        'total_loans': totals['loans']['total'],
+        'total_expenses': totals['expenses']['total'],
+        'net_position': totals['contributions']['total'] - totals['loans']['total'] - totals['expenses']['total'],
+        'counts': {metric: totals[metric]['count'] for metric in REPORT_METRICS},
+        'expenses_by_category': expense_category_totals(start_date, end),
+        'breakdown': [dict(period=period, **breakdown[period]) for period in sorted(breakdown)]
+    }
+
+# Expense review
+# ExpenseRollup holds approved totals per month and category. ORM writes adjust
+# it from mapper events; review_expenses() changes many expenses with one
+# UPDATE and applies the same deltas itself, since bulk updates skip events.
+EXPENSE_REVIEW_MAX = 1000
+EXPENSE_REVIEW_STATUSES = {'approve': 'Approved', 'reject': 'Rejected'}
+
+def expense_rollup_deltas(deltas, status, category, date, amount, sign):
+    """Add one expense's contribution to {(month, category): [total, count]} if it is approved."""
+    if status != 'Approved' or date is None:
+        return deltas
+    key = (month_start(date).date(), category)
+    totals = deltas.setdefault(key, [Money(0), 0])
+    totals[0] += (amount or Money(0)) * sign
+    totals[1] += sign
+    return deltas
+
+def apply_expense_rollup_deltas(connection, deltas):
+    deltas = {key: totals for key, totals in deltas.items() if totals[0] or totals[1]}
+    if not deltas:
+        return
+    table = ExpenseRollup.__table__
+    statement = dialect_insert(table)
+    now = datetime.utcnow()
+    connection.execute(statement.on_conflict_do_update(
+        index_elements=['month', 'category'],
+        set_={
+            'total': table.c.total + statement.excluded.total,
+            'count': table.c.count + statement.excluded.count,
+            'updated_at': statement.excluded.updated_at
+        }
+    ), [{'month': month, 'category': category, 'total': total, 'count': count, 'updated_at': now}
+        for (month, category), (total, count) in deltas.items()])
+    # Drop months and categories left without approved expenses
+    connection.execute(table.delete().where(
+        table.c.count == 0, db.tuple_(table.c.month, table.c.category).in_(list(deltas))
+    ))
+
+@event.listens_for(Expense, 'after_insert')
+def expense_counted(mapper, connection, target):
+    apply_expense_rollup_deltas(connection, expense_rollup_deltas(
+        {}, target.status, target.category, target.date, target.amount, 1
+    ))
+
+@event.listens_for(Expense, 'after_update')
+def expense_recounted(mapper, connection, target):
+    deltas = expense_rollup_deltas(
+        {}, previous_value(target, 'status'), previous_value(target, 'category'),
+        previous_value(target, 'date'), previous_value(target, 'amount'), -1
+    )
+    apply_expense_rollup_deltas(connection, expense_rollup_deltas(
+        deltas, target.status, target.category, target.date, target.amount, 1
+    ))
+
+@event.listens_for(Expense, 'after_delete')
+def expense_uncounted(mapper, connection, target):
+    apply_expense_rollup_deltas(connection, expense_rollup_deltas(
+        {}, target.status, target.category, target.date, target.amount, -1
+    ))
+
+def review_expenses(expense_ids, action, reviewer_id):
+    """Approve or reject the pending expenses among expense_ids in the current transaction; the caller commits.
+    
+    Approvals update the rollups, invalidate closed report months and are
+    chained onto the ledger in one batch. Returns the ids changed and the ids
+    skipped because they do not exist or were already reviewed.
+    """
+    status = EXPENSE_REVIEW_STATUSES[action]
+    table = Expense.__table__
+    reviewed = db.session.execute(
+        table.update().where(table.c.id.in_(expense_ids), table.c.status == 'Pending')
+        .values(status=status, approved_by=reviewer_id)
+        .returning(table.c.id, table.c.category, table.c.amount, table.c.date)
+    ).all()
+    if status == 'Approved' and reviewed:
+        connection = db.session.connection()
+        deltas = {}
+        for _, category, amount, date in reviewed:
+            expense_rollup_deltas(deltas, status, category, date, amount, 1)
+        apply_expense_rollup_deltas(connection, deltas)
+        invalidate_rollups(connection, *(date for _, _, _, date in reviewed))
+        append_ledger_blocks([
+            ('expense', amount, None, {'expense_id': expense_id, 'category': category, 'approved_by': reviewer_id})
+            for expense_id, category, amount, _ in sorted(reviewed)
+        ])
+    changed = sorted(row[0] for row in reviewed)
+    return {'status': status, 'changed': changed, 'skipped': sorted(set(expense_ids) - set(changed))}
+
+def parse_id_list(values, field, limit):
+    """Distinct positive int ids from a list of ints or numeric strings; raises ValueError otherwise."""
+    if not isinstance(values, list) or not values:
+        raise ValueError(f'{field} must be a non-empty list')
+    if len(values) > limit:
+        raise ValueError(f'At most {limit} ids per request')
+    ids = set()
+    for value in values:
+        if isinstance(value, bool) or not isinstance(value, (int, str)) or not str(value).isdigit() or int(value) <= 0:
+            raise ValueError(f'Invalid id in {field}: {value!r}')
+        ids.add(int(value))
+    return sorted(ids)
+
+def expense_category_totals(start, end):
+    """{category: {'total', 'count'}} of approved expenses dated in [start, end).
+    
+    Whole months are read from ExpenseRollup; only the partial months at
+    either end query expenses, over their own date range.
+    """
+    totals = {}
+    def add(category, total, count):
+        entry = totals.setdefault(category, {'total': Money(0), 'count': 0})
+        entry['total'] += total or 0
+        entry['count'] += count
+    
+    first_whole = start if start == month_start(start) else next_month(start)
+    last_whole_end = month_start(end)
+    live_ranges = [(start, end)]
+    if first_whole < last_whole_end:
+        for category, total, count in db.session.query(
+            ExpenseRollup.category, db.func.sum(ExpenseRollup.total), db.func.sum(ExpenseRollup.count)
+        ).filter(
+            ExpenseRollup.month >= first_whole.date(), ExpenseRollup.month < last_whole_end.date()
+        ).group_by(ExpenseRollup.category):
+            add(category, total, count)
+        live_ranges = [(start, first_whole), (last_whole_end, end)]
+    for range_start, range_end in live_ranges:
+        if range_start >= range_end:
+            continue
+        for category, total, count in db.session.query(
+            Expense.category, db.func.sum(Expense.amount), db.func.count()
+        ).filter(
+            Expense.status == 'Approved', Expense.date >= range_start, Expense.date < range_end
+        ).group_by(Expense.category):
+            add(category, total, count)
+    return dict(sorted(totals.items(), key=lambda item: item[1]['total'], reverse=True))
+
+def compute_expense_rollups():
+    """{(month, category): (total, count)} of approved expenses recomputed from the expense table."""
+    bucket = period_bucket(Expense.date, 'month')
+    rows = db.session.query(bucket, Expense.category, db.func.sum(Expense.amount), db.func.count()) \
+        .filter(Expense.status == 'Approved', Expense.date.isnot(None)).group_by(bucket, Expense.category)
+    return {
+        (datetime.strptime(month, '%Y-%m-%d').date(), category): (total or Money(0), count)
+        for month, category, total, count in rows
+    }
+
+def rebuild_expense_rollups(verify_only=False):
+    """Recompute ExpenseRollup from scratch; returns (month, category, stored, expected) drift."""
+    expected = compute_expense_rollups()
+    stored = {(row.month, row.category): (row.total, row.count) for row in ExpenseRollup.query}
+    drift = [
+        (month, category, stored.get((month, category)), expected.get((month, category)))
+        for month, category in sorted(set(stored) | set(expected))
+        if stored.get((month, category)) != expected.get((month, category))
+    ]
+    if not verify_only:
+        now = datetime.utcnow()
+        db.session.execute(db.delete(ExpenseRollup))
+        if expected:
+            db.session.execute(db.insert(ExpenseRollup), [
+                {'month': month, 'category': category, 'total': total, 'count': count, 'updated_at': now}
+                for (month, category), (total, count) in expected.items()
+            ])
+        db.session.commit()
+    return drift
+
+@app.cli.command('rebuild-expense-rollups')
+@click.option('--verify-only', is_flag=True, help='Report drift without rewriting the rollups.')
+def rebuild_expense_rollups_command(verify_only):
+    """Rebuild the approved-expense rollups and report drift."""
+    drift = rebuild_expense_rollups(verify_only=verify_only)
+    for month, category, stored_value, expected_value in drift:
+        click.echo(f'{month} {category}: stored={stored_value} expected={expected_value}')
+    
+    action = 'Verified' if verify_only else 'Rebuilt'
+    click.echo(f'{action} expense rollups: {len(drift)} drifted row(s).')
+    if verify_only and drift:
+        raise SystemExit(1)
+
+# Loan servicing
+# Approval generates each loan's amortization schedule. service_loans() then
+# derives repaid amount, arrears, days past due and outstanding balance for
+# every active loan from its installments and repayments in one pass and
+# stores them on Loan, so listings and the portfolio-at-risk view only read.
+LOAN_INTEREST_RATE = float(os.getenv('LOAN_INTEREST_RATE', 10))
+LOAN_DEFAULT_TERM_MONTHS = 3
+LOAN_REVIEW_MAX = 1000
+LOAN_REVIEW_STATUSES = {'approve': 'Approved', 'reject': 'Rejected'}
+# Each status a loan can move to, and the one status it moves from
+LOAN_TRANSITIONS = {'Approved': 'Pending', 'Rejected': 'Pending', 'Repaid': 'Approved'}
+LOAN_ARREARS_BUCKETS = [('current', 0), ('1-30', 1), ('31-60', 31), ('61-90', 61), ('90+', 91)]
+LOAN_PAR_DAYS = 30
+
+def loan_term_months(applied, due_date):
+    """Whole months from application to the requested due date, at least one."""
+    if not applied or not due_date:
+        return LOAN_DEFAULT_TERM_MONTHS
+    months = (due_date.year - applied.year) * 12 + due_date.month - applied.month + (due_date.day > applied.day)
+    return max(1, months)
+
+def schedule_loans(loans):
+    """Write installments for (loan_id, amount, interest_rate, term_months, disbursed_at) tuples.
+    
+    Any existing schedule of those loans is replaced, and each loan's term,
+    total payable, final due date and opening position are set to match.
+    """
+    if not loans:
+        return
+    loan_ids = [loan[0] for loan in loans]
+    terms = [max(1, loan[3]) for loan in loans]
+    loan_index, number, due_days, principal, interest = amortization_schedules(
+        [loan[1].cents for loan in loans],
+        [LOAN_INTEREST_RATE if loan[2] is None else loan[2] for loan in loans],
+        terms,
+        np.array([loan[4].date() for loan in loans], dtype='datetime64[D]')
+    )
+    
+    installment_table = LoanInstallment.__table__
+    for i in range(0, len(loan_ids), 500):
+        db.session.execute(installment_table.delete().where(installment_table.c.loan_id.in_(loan_ids[i:i + 500])))
+    # Amounts are already cents, so insert through plain BIGINT columns rather than MoneyType
+    installment_cents = db.table('loan_installment', db.column('loan_id', db.Integer), db.column('number', db.Integer),
+                                 db.column('due_date', db.Date), db.column('principal', db.BigInteger),
+                                 db.column('interest', db.BigInteger))
+    db.session.execute(installment_cents.insert(), [
+        {'loan_id': loan_ids[k], 'number': n, 'due_date': due, 'principal': p, 'interest': i}
+        for k, n, due, p, i in zip(loan_index.tolist(), number.tolist(), due_days.tolist(),
+                                   principal.tolist(), interest.tolist())
+    ])
+    
+    ends = np.cumsum(terms)
+    totals = np.bincount(loan_index, weights=principal + interest, minlength=len(loans)).astype(np.int64).tolist()
+    first_due, last_due = due_days[ends - terms].tolist(), due_days[ends - 1].tolist()
+    loan_table = Loan.__table__
+    db.session.execute(
+        loan_table.update().where(loan_table.c.id == db.bindparam('scheduled_loan_id')).values(
+            term_months=db.bindparam('scheduled_term'),
+            disbursed_at=db.bindparam('scheduled_disbursed_at'),
+            due_date=db.bindparam('scheduled_due_date'),
+            total_payable=db.bindparam('scheduled_total', type_=db.BigInteger),
+            outstanding_balance=db.bindparam('scheduled_total', type_=db.BigInteger)
+            - db.type_coerce(db.func.coalesce(loan_table.c.amount_repaid, 0), db.BigInteger),
+            next_due_date=db.bindparam('scheduled_next_due')
+        ),
+        [{
+            'scheduled_loan_id': loan[0],
+            'scheduled_term': terms[i],
+            'scheduled_disbursed_at': loan[4],
+            'scheduled_due_date': datetime.combine(last_due[i], datetime.min.time()),
+            'scheduled_total': totals[i],
+            'scheduled_next_due': first_due[i]
+        } for i, loan in enumerate(loans)]
+    )
+
+def schedule_unscheduled_loans(loan_ids=None):
+    """Schedule approved loans that have none yet, such as ones approved before schedules existed."""
+    query = db.session.query(
+        Loan.id, Loan.amount, Loan.interest_rate, Loan.term_months, Loan.date_applied, Loan.due_date,
+        db.func.coalesce(Loan.status_changed_at, Loan.date_applied)
+    ).filter(Loan.status == 'Approved', Loan.total_payable.is_(None))
+    if loan_ids is not None:
+        query = query.filter(Loan.id.in_(loan_ids))
+    now = datetime.utcnow()
+    rows = query.order_by(Loan.id).all()
+    schedule_loans([
+        (loan_id, amount, rate, term or loan_term_months(applied, due_date), disbursed_at or now)
+        for loan_id, amount, rate, term, applied, due_date, disbursed_at in rows
+    ])
+    return len(rows)
+
+def transition_loans(loan_ids, to_status, changed_by=None):
+    """Move loans to to_status in the current transaction; the caller commits.
+    
+    Only loans in the status the transition starts from change. They are
+    flipped with set-based UPDATEs, so the balance projection and status
+    history are written here rather than by the per-row mapper events, and
+    approvals get their schedules. Returns (loan_id, member_id, amount) rows.
+    """
+    from_status = LOAN_TRANSITIONS[to_status]
+    loan_table = Loan.__table__
+    now = datetime.utcnow()
+    moved = []
+    for i in range(0, len(loan_ids), 500):
+        moved.extend(db.session.execute(
+            loan_table.update().where(loan_table.c.id.in_(loan_ids[i:i + 500]), loan_table.c.status == from_status)
+            .values(status=to_status, status_changed_at=now)
+            .returning(loan_table.c.id, loan_table.c.member_id, loan_table.c.amount, loan_table.c.interest_rate,
+                       loan_table.c.term_months, loan_table.c.date_applied, loan_table.c.due_date,
+                       loan_table.c.principal_repaid)
+        ).all())
+    if not moved:
+        return []
+    
+    member_deltas = {}
+    for _, member_id, amount, *_, principal_repaid in moved:
+        count, principal = member_deltas.get(member_id, (0, Money(0)))
+        member_deltas[member_id] = (count + 1, principal + amount - (principal_repaid or 0))
+    from_column, to_column = LOAN_STATUS_COLUMNS[from_status], LOAN_STATUS_COLUMNS[to_status]
+    principal_sign = (to_status == 'Approved') - (from_status == 'Approved')
+    balance_table = MemberBalance.__table__
+    db.session.execute(
+        balance_table.update().where(balance_table.c.member_id == db.bindparam('balance_member_id')).values(**{
+            from_column: balance_table.c[from_column] - db.bindparam('moved_count'),
+            to_column: balance_table.c[to_column] + db.bindparam('moved_count'),
+            'outstanding_principal': balance_table.c.outstanding_principal + db.bindparam('principal_delta'),
+            'updated_at': now
+        }),
+        [{'balance_member_id': member_id, 'moved_count': count, 'principal_delta': principal * principal_sign}
+         for member_id, (count, principal) in member_deltas.items()]
+    )
+    for member_id in member_deltas:
+        invalidate_member_dashboard(member_id)
+    
+    db.session.execute(LoanStatusChange.__table__.insert(), [
+        {'loan_id': loan_id, 'from_status': from_status, 'to_status': to_status, 'changed_at': now, 'changed_by': changed_by}
+        for loan_id, *_ in moved
+    ])
+    if to_status == 'Approved':
+        schedule_loans([
+            (loan_id, amount, rate, term or loan_term_months(applied, due_date), now)
+            for loan_id, _, amount, rate, term, applied, due_date, _ in moved
+        ])
+    return [(loan_id, member_id, amount) for loan_id, member_id, amount, *_ in moved]
+
+def review_loans(loan_ids, action, reviewer_id):
+    """Approve or reject the pending loans among loan_ids in the current transaction; the caller commits."""
+    status = LOAN_REVIEW_STATUSES[action]
+    moved = transition_loans(loan_ids, status, reviewer_id)
+    if status == 'Approved':
+        append_ledger_blocks([
+            ('loan_approval', amount, member_id, {'loan_id': loan_id, 'approved_by': reviewer_id})
+            for loan_id, member_id, amount in moved
+        ])
+    changed = sorted(loan_id for loan_id, _, _ in moved)
+    return {'status': status, 'changed': changed, 'skipped': sorted(set(loan_ids) - set(changed))}
+
+def read_loan_positions(filters, as_of, *columns):
+    """Positions of the loans matching filters as of a date, derived from their installments and repayments.
+    
+    Returns the (id, *columns) loan rows ordered by id, the cents repaid on
+    each and the loan_positions() arrays in the same order.
+    """
+    # Core columns keep these reads off the ORM row loading, which dominates at 10^6 installments
+    loan_table, installment_table = Loan.__table__, LoanInstallment.__table__
+    repayment_table = LoanRepayment.__table__
+    cents = lambda column: db.type_coerce(column, db.BigInteger)
+    
+    loans = db.session.execute(db.select(loan_table.c.id, *columns).where(*filters).order_by(loan_table.c.id)).all()
+    loan_id_array = np.array([row[0] for row in loans], dtype=np.int64)
+    repaid = np.zeros(len(loans), dtype=np.int64)
+    repayments = db.session.execute(
+        db.select(repayment_table.c.loan_id, cents(db.func.sum(repayment_table.c.amount)))
+        .join(loan_table, loan_table.c.id == repayment_table.c.loan_id).where(*filters)
+        .group_by(repayment_table.c.loan_id)
+    ).all()
+    if repayments:
+        repaid_ids, repaid_totals = zip(*repayments)
+        repaid[np.searchsorted(loan_id_array, repaid_ids)] = repaid_totals
+    
+    installments = db.session.execute(
+        db.select(installment_table.c.loan_id, db.cast(installment_table.c.due_date, db.String),
+                  cents(installment_table.c.principal), cents(installment_table.c.interest))
+        .join(loan_table, loan_table.c.id == installment_table.c.loan_id).where(*filters)
+        .order_by(installment_table.c.loan_id, installment_table.c.number)
+    ).all()
+    installment_loans, due_dates, principals, interests = zip(*installments) if installments else ((), (), (), ())
+    positions = loan_positions(
+        np.searchsorted(loan_id_array, np.array(installment_loans, dtype=np.int64)),
+        np.array(due_dates, dtype='datetime64[D]'), np.array(principals, dtype=np.int64),
+        np.array(interests, dtype=np.int64), repaid, as_of
+    )
+    return loans, repaid, positions
+
+def service_loans(as_of=None, loan_ids=None):
+    """Bring the stored position of active loans up to date as of a date; the caller commits.
+    
+    Without loan_ids every approved loan is serviced in one pass and the
+    day's LoanPortfolioSnapshot is written. Loans whose schedule is fully
+    repaid move to Repaid. Only loans whose position changed are written,
+    and newly repaid principal comes off MemberBalance.outstanding_principal.
+    """
+    as_of = as_of or datetime.utcnow().date()
+    schedule_unscheduled_loans(loan_ids)
+    loan_table = Loan.__table__
+    cents = lambda column: db.type_coerce(column, db.BigInteger)
+    active = [loan_table.c.status == 'Approved']
+    if loan_ids is not None:
+        active.append(loan_table.c.id.in_(loan_ids))
+    loans, repaid, positions = read_loan_positions(
+        active, as_of, loan_table.c.member_id, cents(loan_table.c.amount_repaid),
+        cents(loan_table.c.outstanding_balance), cents(loan_table.c.arrears), loan_table.c.days_past_due,
+        loan_table.c.next_due_date, cents(db.func.coalesce(loan_table.c.principal_repaid, 0))
+    )
+    loan_id_array = np.array([row[0] for row in loans], dtype=np.int64)
+    
+    now = datetime.utcnow()
+    updates = []
+    principal_deltas = {}
+    computed = zip(repaid.tolist(), positions['outstanding'].tolist(), positions['arrears'].tolist(),
+                   positions['days_past_due'].tolist(), positions['next_due'].tolist(),
+                   positions['principal_repaid'].tolist())
+    for (loan_id, member_id, *stored), position in zip(loans, computed):
+        if tuple(stored) != position:
+            repaid_cents, outstanding, arrears, days_past_due, next_due, principal_repaid = position
+            updates.append({
+                'serviced_loan_id': loan_id, 'serviced_repaid': repaid_cents, 'serviced_outstanding': outstanding,
+                'serviced_arrears': arrears, 'serviced_days_past_due': days_past_due, 'serviced_next_due': next_due,
+                'serviced_principal_repaid': principal_repaid
+            })
+            if principal_repaid != stored[-1] and member_id is not None:
+                principal_deltas[member_id] = principal_deltas.get(member_id, 0) + principal_repaid - stored[-1]
+    if updates:
+        db.session.execute(
+            loan_table.update().where(loan_table.c.id == db.bindparam('serviced_loan_id')).values(
+                amount_repaid=db.bindparam('serviced_repaid', type_=db.BigInteger),
+                outstanding_balance=db.bindparam('serviced_outstanding', type_=db.BigInteger),
+                arrears=db.bindparam('serviced_arrears', type_=db.BigInteger),
+                days_past_due=db.bindparam('serviced_days_past_due'),
+                next_due_date=db.bindparam('serviced_next_due'),
+                principal_repaid=db.bindparam('serviced_principal_repaid', type_=db.BigInteger),
+                serviced_at=now
+            ),
+            updates
+        )
+    if principal_deltas:
+        balance_table = MemberBalance.__table__
+        db.session.execute(
+            balance_table.update().where(balance_table.c.member_id == db.bindparam('balance_member_id')).values(
+                outstanding_principal=cents(balance_table.c.outstanding_principal)
+                - db.bindparam('principal_repaid_delta', type_=db.BigInteger),
+                updated_at=now
+            ),
+            [{'balance_member_id': member_id, 'principal_repaid_delta': delta}
+             for member_id, delta in principal_deltas.items()]
+        )
+        for member_id in principal_deltas:
+            invalidate_member_dashboard(member_id)
+    
+    cleared = (positions['outstanding'] == 0) & (positions['total'] > 0)
+    repaid_loans = transition_loans(loan_id_array[cleared].tolist(), 'Repaid')
+    
+    if loan_ids is None:
+        open_loans = ~cleared
+        bucket = np.searchsorted([start for _, start in LOAN_ARREARS_BUCKETS], positions['days_past_due'], side='right') - 1
+        bucket_loans = np.bincount(bucket[open_loans], minlength=len(LOAN_ARREARS_BUCKETS))
+        bucket_outstanding = np.bincount(bucket[open_loans], weights=positions['outstanding'][open_loans],
+                                         minlength=len(LOAN_ARREARS_BUCKETS)).astype(np.int64)
+        bucket_arrears = np.bincount(bucket[open_loans], weights=positions['arrears'][open_loans],
+                                     minlength=len(LOAN_ARREARS_BUCKETS)).astype(np.int64)
+        snapshot_table = LoanPortfolioSnapshot.__table__
+        db.session.execute(snapshot_table.delete().where(snapshot_table.c.as_of == as_of))
+        db.session.execute(snapshot_table.insert(), [
+            {'as_of': as_of, 'bucket': name, 'loans': int(bucket_loans[i]),
+             'outstanding': Money(int(bucket_outstanding[i])), 'arrears': Money(int(bucket_arrears[i]))}
+            for i, (name, _) in enumerate(LOAN_ARREARS_BUCKETS)
+        ])
+    return {'as_of': as_of, 'loans': len(loans), 'updated': len(updates), 'repaid': len(repaid_loans)}
+
+def record_loan_repayment(loan, amount, recorded_by, reference=None):
+    """Record a repayment on an approved loan and update its position; the caller commits."""
+    repayment = LoanRepayment(loan_id=loan.id, amount=amount, reference=reference, recorded_by=recorded_by)
+    db.session.add(repayment)
+    db.session.flush()
+    append_ledger_blocks([
+        ('loan_repayment', amount, loan.member_id, {'loan_id': loan.id, 'repayment_id': repayment.id, 'reference': reference})
+    ])
+    service_loans(loan_ids=[loan.id])
+    return repayment
+
+def portfolio_at_risk(history_days=30):
+    """Arrears buckets and PAR from the latest LoanPortfolioSnapshot, with the PAR trend over history_days."""
+    latest = db.session.query(db.func.max(LoanPortfolioSnapshot.as_of)).scalar()
+    if latest is None:
+        return None
+    snapshots = {}
+    for row in LoanPortfolioSnapshot.query.filter(LoanPortfolioSnapshot.as_of >= latest - timedelta(days=history_days)):
+        snapshots.setdefault(row.as_of, {})[row.bucket] = row
+    
+    at_risk_buckets = [name for name, start in LOAN_ARREARS_BUCKETS if start > LOAN_PAR_DAYS]
+    def par(rows):
+        outstanding = sum((row.outstanding for row in rows.values()), Money(0))
+        at_risk = sum((rows[name].outstanding for name in at_risk_buckets if name in rows), Money(0))
+        return outstanding, at_risk, round(float(at_risk) / float(outstanding) * 100, 2) if outstanding else 0.0
+    
+    rows = snapshots[latest]
+    outstanding, at_risk, ratio = par(rows)
+    empty = {'loans': 0, 'outstanding': Money(0), 'arrears': Money(0)}
+    return {
+        'as_of': latest,
+        'par_days': LOAN_PAR_DAYS,
+        'buckets': [
+            {'bucket': name, **({'loans': rows[name].loans, 'outstanding': rows[name].outstanding,
+                                 'arrears': rows[name].arrears} if name in rows else empty)}
+            for name, _ in LOAN_ARREARS_BUCKETS
+        ],
+        'loans': sum(row.loans for row in rows.values()),
+        'outstanding': outstanding,
+        'arrears': sum((row.arrears for row in rows.values()), Money(0)),
+        'at_risk': at_risk,
+        'par': ratio,
+        'trend': [{'as_of': day, 'par': par(snapshots[day])[2]} for day in sorted(snapshots)]
+    }
+
+@app.cli.command('service-loans')
+@click.option('--as-of', type=click.DateTime(formats=['%Y-%m-%d']), help='Service as of this date (default today).')
+def service_loans_command(as_of):
+    """Nightly loan servicing: schedules, arrears, days past due and the portfolio snapshot."""
+    summary = service_loans(as_of.date() if as_of else None)
+    db.session.commit()
+    click.echo(f"Serviced {summary['loans']} loan(s) as of {summary['as_of']}: "
+               f"{summary['updated']} updated, {summary['repaid']} repaid.")
+
+# M-Pesa STK Push function
+def initiate_stk_push(phone, amount, account_ref, **kwargs):
+    try:
+        return mpesa.stk_push(phone, amount, account_ref, **kwargs)
+    except MpesaUnconfirmed:
+        raise
+    except (requests.RequestException, MpesaError, ValueError):
+        return {'ResponseCode': '1', 'errorMessage': 'Service unavailable'}
+
+# M-Pesa payment pipeline
+# A contribution request only queues a PendingPayment. Pool threads submit the
+# STK push, and /mpesa_callback marks it paid; paid payments become
+# Contribution and ledger rows in batches. A push with no clear reply is left
+# Unknown, and its callback finds it through the signed ref in the callback URL.
+PAYMENT_RECONCILE_BATCH = 500
+PAYMENT_SUBMIT_TIMEOUT = int(os.getenv('PAYMENT_SUBMIT_TIMEOUT', 300))
+PAYMENT_CONFIRM_TIMEOUT = int(os.getenv('PAYMENT_CONFIRM_TIMEOUT', 86400))
+payment_refs = URLSafeSerializer(app.config['SECRET_KEY'], salt='mpesa-callback')
+
+def payment_callback_url(payment_id):
+    separator = '&' if '?' in mpesa.callback_url else '?'
+    return f'{mpesa.callback_url}{separator}ref={payment_refs.dumps(payment_id)}'
+
+def callback_payment_id(ref):
+    try:
+        return payment_refs.loads(ref) if ref else None
+    except BadSignature:
+        return None
+
+def queue_stk_push(member_id, phone, amount, description='', category=None):
+    amount = Money.parse(amount)
+    if not phone or amount <= 0:
+        raise ValueError('A phone number and a positive amount are required')
+    if category is not None and category not in CONTRIBUTION_CATEGORIES:
+        raise ValueError(f'Unknown contribution category: {category}')
+    
+    payment = PendingPayment(member_id=member_id, phone=phone, amount=amount, description=description, category=category)
+    db.session.add(payment)
+    db.session.commit()
+    payment_workers.enqueue(payment.id)
+    return payment
+
+def submit_pending_payment(payment_id):
+    payment_table = PendingPayment.__table__
+    # Claim the payment so a retry from another worker never prompts the customer twice
+    claimed = db.session.execute(
+        payment_table.update()
+        .where(payment_table.c.id == payment_id, payment_table.c.status == 'Queued')
+        .values(status='Submitting', attempts=payment_table.c.attempts + 1, submitted_at=datetime.utcnow())
+    ).rowcount
+    db.session.commit()
+    if not claimed:
+        return None
+    
+    payment = db.session.get(PendingPayment, payment_id)
+    unconfirmed = False
+    try:
+        response = initiate_stk_push(payment.phone, payment.amount, f'CONTRIB-{payment.member_id}',
+                                     callback_url=payment_callback_url(payment.id))
+    except MpesaUnconfirmed as e:
+        # The customer may have been prompted; only the callback can tell, so never fail it here
+        app.logger.warning('STK push for payment %s has no confirmed reply: %s', payment.id, e)
+        unconfirmed = True
+        response = {'errorMessage': str(e)}
+    if response.get('ResponseCode') == '0':
+        values = {
+            'status': 'Submitted',
+            'checkout_request_id': response.get('CheckoutRequestID'),
+            'merchant_request_id': response.get('MerchantRequestID')
+        }
+    else:
+        values = {
+            'status': 'Unknown' if unconfirmed else 'Failed',
+            'result_desc': (response.get('errorMessage') or response.get('ResponseDescription') or '')[:255]
+        }
+    # The callback can beat this commit; a payment it already settled is left alone
+    db.session.execute(
+        payment_table.update()
+        .where(payment_table.c.id == payment_id, payment_table.c.status == 'Submitting')
+        .values(**values)
+    )
+    db.session.commit()
+    return payment
+
+def record_stk_callback(result, payment_id=None):
+    """Apply one parsed callback; returns False for duplicates and unknown checkouts.
+    
+    `payment_id` comes from the signed ref in the callback URL and finds a
+    payment whose checkout id is not stored yet: its push reply was lost, or
+    the callback arrived before submit_pending_payment committed it.
+    """
+    payment_table = PendingPayment.__table__
+    values = {
+        'checkout_request_id': result['checkout_request_id'],
+        'result_code': result['result_code'],
+        'result_desc': (result['result_desc'] or '')[:255]
+    }
+    if result['merchant_request_id']:
+        values['merchant_request_id'] = result['merchant_request_id']
+    if result['result_code'] == 0:
+        values.update(status='Paid', receipt=result['receipt'], paid_amount=result['amount'])
+        # The customer has paid, so this also settles a payment given up on for want of a reply
+        open_statuses = ('Submitting', 'Submitted', 'Unknown', 'Failed')
+    else:
+        values.update(status='Failed', completed_at=datetime.utcnow())
+        open_statuses = ('Submitting', 'Submitted', 'Unknown')
+    
+    match = payment_table.c.checkout_request_id == result['checkout_request_id']
+    if payment_id is not None:
+        match = db.or_(match, db.and_(payment_table.c.id == payment_id,
+                                      payment_table.c.checkout_request_id.is_(None)))
+    # Only the first delivery moves the payment out of an open status; redeliveries match nothing
+    updated = db.session.execute(
+        payment_table.update()
+        .where(match, payment_table.c.status.in_(open_statuses))
+        .values(**values)
+    ).rowcount
+    db.session.commit()
+    if not updated and not db.session.query(db.exists().where(match)).scalar():
+        app.logger.warning('M-Pesa callback matched no payment: %s', result)
+    return bool(updated)
 
-# Smart Contract Execution
-def execute_smart_contracts():
-    active_contracts = SmartContract.query.filter_by(status='Active', auto_execute=True).all()
+def sweep_stale_payments():
+    """Settle payments whose submit or callback never came, without prompting the customer again.
     
-    for contract in active_contracts:
-        conditions = json.loads(contract.conditions)
-        
-        # Example: Auto-approve loans under certain conditions
-        if contract.contract_type == 'loan' and 'auto_approve_limit' in conditions:
-            pending_loans = Loan.query.filter_by(status='Pending').all()
-            
-            for loan in pending_loans:
-                if loan.amount <= conditions['auto_approve_limit']:
-                    # Check member's contribution history
-                    member_contributions = sum(c.amount for c in loan.member.contributions)
-                    if member_contributions >= loan.amount * 2:  # 2x contribution requirement
-                        loan.status = 'Approved'
-                        contract.executed_date = datetime.utcnow()
-                        
-                        # Create blockchain record
-                        create_blockchain_transaction('loan_approval', loan.amount, loan.member_id, {
-                            'loan_id': loan.id,
-                            'auto_approved': True,
-                            'contract_id': contract.id
-                        })
-
-def generate_financial_report(start_date, end_date):
-    contributions = Contribution.query.filter(
-        Contribution.date.between(start_date, end_date)
-    ).all()
-    loans = Loan.query.filter(
-        Loan.date_applied.between(start_date, end_date)
-    ).all()
-    expenses = Expense.query.filter(
-        Expense.date.between(start_date, end_date),
-        Expense.status == 'Approved'
+    Submitting rows older than PAYMENT_SUBMIT_TIMEOUT belong to a worker that
+    died mid-push and become Unknown. Submitted rows that old are settled with
+    the STK query API. Unknown rows still open after PAYMENT_CONFIRM_TIMEOUT
+    are failed; a late successful callback still marks them Paid.
+    Returns (abandoned, queried, expired) counts.
+    """
+    payment_table = PendingPayment.__table__
+    now = datetime.utcnow()
+    submit_cutoff = now - timedelta(seconds=PAYMENT_SUBMIT_TIMEOUT)
+    abandoned = db.session.execute(
+        payment_table.update()
+        .where(payment_table.c.status == 'Submitting', payment_table.c.submitted_at < submit_cutoff)
+        .values(status='Unknown', result_desc='Abandoned: the worker stopped before the push reply was recorded')
+    ).rowcount
+    expired = db.session.execute(
+        payment_table.update()
+        .where(payment_table.c.status == 'Unknown',
+               payment_table.c.submitted_at < now - timedelta(seconds=PAYMENT_CONFIRM_TIMEOUT))
+        .values(status='Failed', result_desc='No confirmation received from M-Pesa', completed_at=now)
+    ).rowcount
+    stale = db.session.query(payment_table.c.checkout_request_id).filter(
+        payment_table.c.status == 'Submitted', payment_table.c.submitted_at < submit_cutoff
     ).all()
+    db.session.commit()
     
-    return {
-        'total_contributions': sum(c.amount for c in contributions),
-        'total_loans': sum(l.amount for l in loans),
-        'total_expenses': sum(e.amount for e in expenses),
-        'net_position': sum(c.amount for c in contributions) - sum(l.amount for l in loans) - sum(e.amount for e in expenses)
-    }
+    queried = 0
+    for checkout_request_id, in stale:
+        try:
+            reply = mpesa.stk_query(checkout_request_id)
+            result_code = int(reply['ResultCode'])
+        except (KeyError, TypeError):
+            # Still being processed, or the query was refused; try again next sweep
+            continue
+        except (requests.RequestException, MpesaError, ValueError) as e:
+            app.logger.warning('STK query for %s failed: %s', checkout_request_id, e)
+            continue
+        queried += record_stk_callback({
+            'merchant_request_id': reply.get('MerchantRequestID'),
+            'checkout_request_id': checkout_request_id,
+            'result_code': result_code,
+            'result_desc': reply.get('ResultDesc'),
+            'amount': None,
+            'receipt': None
+        })
+    return abandoned, queried, expired
 
-# M-Pesa STK Push function
-def initiate_stk_push(phone, amount, account_ref):
-    try:
-        # Get access token
-        consumer_key = 'bfb279f9aa9bdbcf158e97dd71a467cd2e0c893059b10f78e6b72ada1ed2c919'
-        consumer_secret = 'b051e7d22f7e0fe81e71b1d1a0e8b9c2d5c0b1f8e6a9c8d7f4e3b2a1c9d8e7f6'
-        
-        api_url = 'https://sandbox.safaricom.co.ke/oauth/v1/generate?grant_type=client_credentials'
-        r = requests.get(api_url, auth=(consumer_key, consumer_secret))
-        access_token = r.json()['access_token']
-        
-        # STK Push request
-        api_url = 'https://sandbox.safaricom.co.ke/mpesa/stkpush/v1/processrequest'
-        headers = {
-            'Authorization': f'Bearer {access_token}',
-            'Content-Type': 'application/json'
-        }
-        
-        timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-        shortcode = '174379'
-        passkey = 'bfb279f9aa9bdbcf158e97dd71a467cd2e0c893059b10f78e6b72ada1ed2c919b051e7d22f7e0fe81e71b1d1a0e8b9c2d5c0b1f8e6a9c8d7f4e3b2a1c9d8e7f6'
-        
-        password = base64.b64encode((shortcode + passkey + timestamp).encode()).decode('utf-8')
+def reconcile_payments(limit=PAYMENT_RECONCILE_BATCH):
+    """Turn paid payments into Contribution and ledger rows, one batch per transaction."""
+    payment_table = PendingPayment.__table__
+    reconciled = 0
+    while True:
+        batch = db.session.query(payment_table.c.id).filter(payment_table.c.status == 'Paid') \
+            .order_by(payment_table.c.id).limit(limit).scalar_subquery()
+        claimed = db.session.execute(
+            payment_table.update()
+            .where(payment_table.c.id.in_(batch), payment_table.c.status == 'Paid')
+            .values(status='Completed', completed_at=datetime.utcnow())
+            .returning(payment_table.c.id, payment_table.c.member_id, payment_table.c.amount,
+                       payment_table.c.paid_amount, payment_table.c.receipt, payment_table.c.description,
+                       payment_table.c.category)
+        ).all()
+        if not claimed:
+            return reconciled
         
-        payload = {
-            'BusinessShortCode': shortcode,
-            'Password': password,
-            'Timestamp': timestamp,
-            'TransactionType': 'CustomerPayBillOnline',
-            'Amount': int(amount),
-            'PartyA': phone,
-            'PartyB': shortcode,
-            'PhoneNumber': phone,
-            'CallBackURL': 'https://mydomain.com/path',
-            'AccountReference': account_ref,
-            'TransactionDesc': 'Chama Contribution'
-        }
-        
-        response = requests.post(api_url, json=payload, headers=headers)
-        return response.json()
-    except:
-        return {'ResponseCode': '1', 'errorMessage': 'Service unavailable'}
+        contributions = [
+            Contribution(
+                member_id=member_id,
+                amount=paid_amount if paid_amount is not None else amount,
+                description=description or (f'M-Pesa {receipt}' if receipt else 'M-Pesa payment'),
+                category=category
+            )
+            for _, member_id, amount, paid_amount, receipt, description, category in claimed
+        ]
+        db.session.add_all(contributions)
+        db.session.flush()
+        db.session.execute(
+            payment_table.update().where(payment_table.c.id == db.bindparam('payment_id'))
+            .values(contribution_id=db.bindparam('new_contribution_id')),
+            [{'payment_id': row[0], 'new_contribution_id': contribution.id}
+             for row, contribution in zip(claimed, contributions)]
+        )
+        append_ledger_blocks([
+            ('contribution', contribution.amount, contribution.member_id,
+             {'contribution_id': contribution.id, 'mpesa_receipt': row[4]})
+            for row, contribution in zip(claimed, contributions)
+        ])
+        db.session.commit()
+        reconciled += len(claimed)
+
+def in_app_context(fn):
+    @wraps(fn)
+    def wrapper(*args):
+        with app.app_context():
+            return fn(*args)
+    return wrapper
+
+payment_workers = PaymentWorkers(
+    submit=in_app_context(submit_pending_payment),
+    reconcile=in_app_context(reconcile_payments),
+    max_workers=int(os.getenv('PAYMENT_WORKERS', 8)),
+    batch_delay=float(os.getenv('PAYMENT_BATCH_SECONDS', 2)),
+    on_error=lambda e: app.logger.exception('M-Pesa payment worker failed', exc_info=e)
+)
+app.extensions['payments'] = payment_workers
+
+@app.route('/mpesa_callback', methods=['POST'])
+def mpesa_callback():
+    try:
+        result = parse_stk_callback(request.get_json(silent=True))
+    except ValueError:
+        return jsonify({'ResultCode': 1, 'ResultDesc': 'Rejected'}), 400
+    
+    payment_id = callback_payment_id(request.args.get('ref'))
+    if record_stk_callback(result, payment_id) and result['result_code'] == 0:
+        payment_workers.schedule_reconcile()
+    # Safaricom retries until acknowledged, so duplicates are accepted too
+    return jsonify({'ResultCode': 0, 'ResultDesc': 'Accepted'})
+
+@app.route('/payments/<int:payment_id>')
+@login_required
+def payment_status(payment_id):
+    payment = PendingPayment.query.get_or_404(payment_id)
+    member = Member.query.filter_by(user_id=current_user.id).first()
+    if not current_user.is_admin and (not member or member.id != payment.member_id):
+        abort(403)
+    
+    return jsonify({
+        'id': payment.id,
+        'status': payment.status,
+        'amount': payment.amount,
+        'result_desc': payment.result_desc,
+        'receipt': payment.receipt,
+        'contribution_id': payment.contribution_id
+    })
+
+@app.cli.command('process-payments')
+def process_payments_command():
+    """Settle stale payments, re-queue payments left in Queued and reconcile paid ones."""
+    abandoned, queried, expired = sweep_stale_payments()
+    click.echo(f'Marked {abandoned} abandoned submits Unknown, settled {queried} by STK query, '
+               f'failed {expired} unconfirmed payments')
+    queued = [payment_id for payment_id, in db.session.query(PendingPayment.id).filter_by(status='Queued')]
+    for payment_id in queued:
+        submit_pending_payment(payment_id)
+    click.echo(f'Submitted {len(queued)} queued payments, reconciled {reconcile_payments()}')
 
 @app.route('/contribute', methods=['GET', 'POST'])
 @login_required
@@ -589,18 +3039,18 @@ def contribute():
         amount = request.form.get('amount')
         phone = request.form.get('phone')
         description = request.form.get('description', '')
+        category = request.form.get('category') or None
         
-        # Initiate M-Pesa STK Push
-        mpesa_response = initiate_stk_push(phone, amount, f'CONTRIB-{member.id}')
-        
-        if mpesa_response.get('ResponseCode') == '0':
-            flash('Payment request sent to your phone. Please complete the payment.', 'info')
-        else:
-            flash('Payment request failed. Please try again.', 'danger')
+        try:
+            queue_stk_push(member.id, phone, amount, description, category)
+        except (TypeError, ValueError):
+            flash('Please enter a valid amount.', 'danger')
+            return redirect(url_for('contribute'))
         
+        flash('Payment request sent to your phone. Please complete the payment.', 'info')
         return redirect(url_for('index'))
     
-    return render_template('contribute.html', member=member)
+    return render_template('contribute.html', member=member, categories=CONTRIBUTION_CATEGORIES)
 
 @app.route('/request-loan', methods=['GET', 'POST'])
 @login_required
@@ -615,7 +3065,8 @@ def request_loan():
         purpose = request.form.get('purpose')
         due_date = datetime.strptime(request.form.get('due_date'), '%Y-%m-%d')
         
-        loan = Loan(amount=float(amount), purpose=purpose, member_id=member.id, due_date=due_date)
+        loan = Loan(amount=Money.parse(amount), purpose=purpose, member_id=member.id, due_date=due_date,
+                    interest_rate=LOAN_INTEREST_RATE, term_months=loan_term_months(datetime.utcnow(), due_date))
         db.session.add(loan)
         db.session.commit()
         flash('Loan request submitted successfully!', 'success')
@@ -626,40 +3077,59 @@ def request_loan():
 @app.route('/contributions')
 @login_required
 def contributions():
-    if current_user.is_admin:
-        contributions = Contribution.query.all()
-    else:
-        member_ids = [m.id for m in Member.query.filter_by(user_id=current_user.id).all()]
-        contributions = Contribution.query.filter(Contribution.member_id.in_(member_ids)).all()
-    return render_template('contributions.html', contributions=contributions)
+    query = Contribution.query.options(db.joinedload(Contribution.member))
+    if not current_user.is_admin:
+        query = query.filter(Contribution.member_id.in_(db.session.query(Member.id).filter_by(user_id=current_user.id)))
+    page = paginate_request(query, [Contribution.date, Contribution.id])
+    return render_template('contributions.html', contributions=page.items, page=page)
 
 @app.route('/my-contributions')
 @login_required
 def my_contributions():
     member = Member.query.filter_by(user_id=current_user.id).first()
     if not member:
-        contributions, total = [], 0
+        contributions, total, count, page = [], 0, 0, None
     else:
-        contributions = Contribution.query.filter_by(member_id=member.id).order_by(Contribution.date.desc()).all()
-        total = sum(c.amount for c in contributions)
+        page = paginate_request(Contribution.query.filter_by(member_id=member.id), [Contribution.date, Contribution.id])
+        contributions = page.items
+        balance = get_member_balance(member.id)
+        total, count = balance.contribution_total, balance.contribution_count
     
-    return render_template('my_contributions.html', contributions=contributions, total=total, member=member)
+    return render_template('my_contributions.html', contributions=contributions, total=total, count=count,
+                           member=member, page=page)
+
+@app.route('/loans/<int:loan_id>')
+@login_required
+def loan_detail(loan_id):
+    loan = Loan.query.get_or_404(loan_id)
+    if not current_user.is_admin and (not loan.member or loan.member.user_id != current_user.id):
+        abort(403)
+    installments = LoanInstallment.query.filter_by(loan_id=loan.id).order_by(LoanInstallment.number).all()
+    repayments = LoanRepayment.query.filter_by(loan_id=loan.id).order_by(LoanRepayment.paid_at.desc()).all()
+    history = LoanStatusChange.query.filter_by(loan_id=loan.id).order_by(LoanStatusChange.changed_at).all()
+    return render_template('loans/detail.html', loan=loan, installments=installments, repayments=repayments,
+                           history=history, today=datetime.utcnow().date())
 
 @app.route('/loans')
 @login_required
 def loans():
-    if current_user.is_admin:
-        loans = Loan.query.all()
-    else:
-        member_ids = [m.id for m in Member.query.filter_by(user_id=current_user.id).all()]
-        loans = Loan.query.filter(Loan.member_id.in_(member_ids)).all()
-    return render_template('loans/list.html', loans=loans)
+    query = Loan.query.options(db.joinedload(Loan.member))
+    if not current_user.is_admin:
+        query = query.filter(Loan.member_id.in_(db.session.query(Member.id).filter_by(user_id=current_user.id)))
+    page = paginate_request(query, [Loan.date_applied, Loan.id])
+    return render_template('loans/list.html', loans=page.items, page=page)
 
 @app.route('/discussions')
 @login_required
 def discussions():
-    discussions = Discussion.query.order_by(Discussion.date.desc()).all()
-    return render_template('discussions/list.html', discussions=discussions)
+    # The list shows a 100 character preview, so only that much of each body is read
+    page = paginate_request(
+        Discussion.query.outerjoin(User, Discussion.user_id == User.id),
+        [Discussion.date, Discussion.id],
+        columns=[Discussion.id, Discussion.title, Discussion.date,
+                 db.func.substr(Discussion.content, 1, 101).label('content'), User.username]
+    )
+    return render_template('discussions/list.html', discussions=page.items, page=page)
 
 @app.route('/discussions/create', methods=['GET', 'POST'])
 @login_required
@@ -680,7 +3150,8 @@ def create_discussion():
 @login_required
 def view_discussion(discussion_id):
     discussion = Discussion.query.get_or_404(discussion_id)
-    messages = Message.query.filter_by(discussion_id=discussion_id).order_by(Message.timestamp).all()
+    messages = Message.query.options(db.joinedload(Message.user)) \
+        .filter_by(discussion_id=discussion_id).order_by(Message.id).all()
     return render_template('discussions/view.html', discussion=discussion, messages=messages)
 
 @app.route('/discussions/<int:discussion_id>/message', methods=['POST'])
@@ -691,13 +3162,239 @@ def add_message(discussion_id):
         message = Message(content=content.strip(), user_id=current_user.id, discussion_id=discussion_id)
         db.session.add(message)
         db.session.commit()
+        message_broker.publish(discussion_channel(discussion_id), message_payload(
+            message.id, message.content, message.timestamp, message.user_id, current_user.username
+        ))
     return redirect(url_for('view_discussion', discussion_id=discussion_id))
 
+# Discussion message feed
+# Clients poll with ?since=<last message id> and an If-None-Match ETag, or hold
+# an SSE stream open that replays anything after Last-Event-ID and then relays
+# messages published by add_message().
+MESSAGE_FEED_LIMIT = 200
+MESSAGE_STREAM_SECONDS = int(os.getenv('MESSAGE_STREAM_SECONDS', 300))
+MESSAGE_STREAM_KEEPALIVE = 15
+
+def discussion_channel(discussion_id):
+    return f'discussion:{discussion_id}'
+
+def message_payload(message_id, content, timestamp, user_id, username):
+    return {
+        'id': message_id,
+        'content': content,
+        'user': username,
+        'username': username,
+        'user_id': user_id,
+        'timestamp': timestamp.isoformat()
+    }
+
+def messages_since(discussion_id, since=0, limit=MESSAGE_FEED_LIMIT):
+    """Messages after id `since`, oldest first, with the author name joined in rather than lazy-loaded."""
+    rows = db.session.query(
+        Message.id, Message.content, Message.timestamp, Message.user_id, User.username
+    ).outerjoin(User, User.id == Message.user_id).filter(
+        Message.discussion_id == discussion_id, Message.id > since
+    ).order_by(Message.id).limit(limit).all()
+    return [message_payload(*row) for row in rows]
+
+def latest_message_id(discussion_id):
+    return db.session.query(db.func.coalesce(db.func.max(Message.id), 0)) \
+        .filter(Message.discussion_id == discussion_id).scalar()
+
 @app.route('/api/discussions/<int:discussion_id>/messages')
 @login_required
 def get_messages(discussion_id):
-    messages = Message.query.filter_by(discussion_id=discussion_id).order_by(Message.timestamp).all()
-    return {'messages': [{'content': m.content, 'user': m.user.username, 'timestamp': m.timestamp.isoformat()} for m in messages]}
+    since = request.args.get('since', 0, type=int)
+    latest = latest_message_id(discussion_id)
+    # The feed only ever grows, so the newest id identifies the response for a cursor
+    etag = f'messages-{discussion_id}-{since}-{latest}'
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        messages = messages_since(discussion_id, since)
+        for message in messages:
+            message['is_current_user'] = message['user_id'] == current_user.id
+        response = jsonify({
+            'messages': messages,
+            'since': messages[-1]['id'] if messages else since,
+            'has_more': bool(messages) and messages[-1]['id'] < latest
+        })
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+@app.route('/api/discussions/<int:discussion_id>/stream')
+@login_required
+def stream_messages(discussion_id):
+    """Server-Sent Events feed of a discussion; the browser reconnects with Last-Event-ID when it closes."""
+    since = request.headers.get('Last-Event-ID', type=int) or request.args.get('since', 0, type=int)
+    user_id = current_user.id
+    
+    def events():
+        # Subscribe before reading the backlog so nothing posted in between is missed
+        subscription = message_broker.subscribe(discussion_channel(discussion_id))
+        try:
+            last_id = since
+            yield 'retry: 3000\n\n'
+            while True:
+                backlog = messages_since(discussion_id, last_id)
+                for message in backlog:
+                    message['is_current_user'] = message['user_id'] == user_id
+                    yield format_sse(message, event_id=message['id'])
+                    last_id = message['id']
+                if len(backlog) < MESSAGE_FEED_LIMIT:
+                    break
+            # Do not hold a pooled connection while the stream idles
+            db.session.remove()
+            
+            deadline = time.monotonic() + MESSAGE_STREAM_SECONDS
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                message = subscription.get(timeout=min(MESSAGE_STREAM_KEEPALIVE, remaining))
+                if message is None:
+                    yield format_sse(comment='keepalive')
+                elif message['id'] > last_id:
+                    message['is_current_user'] = message['user_id'] == user_id
+                    yield format_sse(message, event_id=message['id'])
+                    last_id = message['id']
+        finally:
+            subscription.close()
+    
+    response = Response(stream_with_context(events()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+# Search
+# Discussions, messages, members and activities are indexed in an FTS5 table on
+# SQLite or a tsvector table on Postgres. Mapper events keep the index in step
+# with every insert, update and delete; `flask rebuild-search-index` rebuilds it.
+SEARCH_KINDS = ('discussion', 'message', 'member', 'activity')
+ADMIN_SEARCH_KINDS = ('member',)
+SEARCH_PER_PAGE = 20
+MAX_SEARCH_PAGE = 50
+
+search_backend = search_backend_for(app.config['SQLALCHEMY_DATABASE_URI'], SEARCH_KINDS)
+
+SEARCH_DOCUMENTS = {
+    'discussion': (Discussion, ('title', 'content'), lambda d: (d.title, d.content)),
+    'message': (Message, ('content',), lambda m: ('', m.content)),
+    'member': (Member, ('name', 'phone', 'email'), lambda m: (m.name, ' '.join(filter(None, [m.phone, m.email])))),
+    'activity': (Activity, ('title', 'description'), lambda a: (a.title, a.description))
+}
+
+def search_sources():
+    """(id, title, body) selects used to rebuild each kind's documents in SQL."""
+    return {
+        'discussion': db.select(Discussion.id, Discussion.title, Discussion.content),
+        'message': db.select(Message.id, db.literal(''), Message.content),
+        'member': db.select(
+            Member.id, Member.name,
+            db.func.trim(db.func.coalesce(Member.phone, '') + ' ' + db.func.coalesce(Member.email, ''))
+        ),
+        'activity': db.select(Activity.id, Activity.title, Activity.description)
+    }
+
+def listen_for_search_changes(kind, model, columns, document):
+    def inserted(mapper, connection, target):
+        search_backend.upsert(connection, kind, target.id, *document(target))
+    
+    def updated(mapper, connection, target):
+        state = db.inspect(target)
+        if any(state.attrs[column].history.has_changes() for column in columns):
+            search_backend.upsert(connection, kind, target.id, *document(target))
+    
+    def deleted(mapper, connection, target):
+        search_backend.delete(connection, kind, target.id)
+    
+    event.listen(model, 'after_insert', inserted)
+    event.listen(model, 'after_update', updated)
+    event.listen(model, 'after_delete', deleted)
+
+for search_kind, (search_model, search_columns, search_document) in SEARCH_DOCUMENTS.items():
+    listen_for_search_changes(search_kind, search_model, search_columns, search_document)
+
+def ensure_search_index(rebuild=False):
+    """Create the search index if it is missing and fill it from the source tables."""
+    with db.engine.begin() as connection:
+        if rebuild or not search_backend.exists(connection):
+            search_backend.create(connection)
+            search_backend.rebuild(connection, search_sources())
+            return True
+    return False
+
+def search_kinds_for(user, kind=None):
+    kinds = [k for k in SEARCH_KINDS if user.is_admin or k not in ADMIN_SEARCH_KINDS]
+    return [k for k in kinds if k == kind] if kind else kinds
+
+def run_search(text, kind=None, page=1, per_page=SEARCH_PER_PAGE):
+    """One page of ranked hits for the current user, each with a title and a link; returns (results, has_next)."""
+    page = max(1, min(page, MAX_SEARCH_PAGE))
+    hits = search_backend.search(
+        db.session.connection(), text, search_kinds_for(current_user, kind), per_page + 1, (page - 1) * per_page
+    )
+    has_next = len(hits) > per_page and page < MAX_SEARCH_PAGE
+    hits = hits[:per_page]
+    
+    # Messages link to their discussion and borrow its title
+    message_ids = [ref_id for hit_kind, ref_id, _, _, _ in hits if hit_kind == 'message']
+    message_threads = {
+        message_id: (discussion_id, title) for message_id, discussion_id, title in db.session.query(
+            Message.id, Message.discussion_id, Discussion.title
+        ).join(Discussion, Discussion.id == Message.discussion_id).filter(Message.id.in_(message_ids))
+    } if message_ids else {}
+    
+    results = []
+    for hit_kind, ref_id, title, snippet, rank in hits:
+        if hit_kind == 'discussion':
+            url = url_for('view_discussion', discussion_id=ref_id)
+        elif hit_kind == 'message':
+            if ref_id not in message_threads:
+                continue
+            discussion_id, title = message_threads[ref_id]
+            url = url_for('view_discussion', discussion_id=discussion_id)
+        elif hit_kind == 'member':
+            url = url_for('admin_members')
+        else:
+            url = url_for('activities')
+        results.append({
+            'kind': hit_kind,
+            'id': ref_id,
+            'title': title,
+            'snippet': render_snippet(snippet),
+            'rank': rank,
+            'url': url
+        })
+    return results, has_next
+
+@app.route('/search')
+@login_required
+def search():
+    text = request.args.get('q', '').strip()
+    kind = request.args.get('kind') or None
+    page = request.args.get('page', 1, type=int)
+    results, has_next = run_search(text, kind, page) if text else ([], False)
+    return render_template('search.html', query=text, kind=kind, kinds=search_kinds_for(current_user),
+                           results=results, page=page, has_next=has_next)
+
+@app.route('/api/search')
+@login_required
+def api_search():
+    text = request.args.get('q', '').strip()
+    page = request.args.get('page', 1, type=int)
+    per_page = max(1, min(request.args.get('per_page', SEARCH_PER_PAGE, type=int), 100))
+    results, has_next = run_search(text, request.args.get('kind') or None, page, per_page) if text else ([], False)
+    for result in results:
+        result['snippet'] = str(result['snippet'])
+    return jsonify({'query': text, 'page': page, 'per_page': per_page, 'has_next': has_next, 'results': results})
+
+@app.cli.command('rebuild-search-index')
+def rebuild_search_index_command():
+    """Rebuild the full-text search index from the source tables."""
+    ensure_search_index(rebuild=True)
+    click.echo('Rebuilt the search index.')
 
 @app.route('/activities')
 @login_required
@@ -709,11 +3406,13 @@ def activities():
 @app.route('/notifications')
 @login_required
 def notifications():
-    notifications = Notification.query.filter_by(user_id=current_user.id).order_by(Notification.date.desc()).all()
+    notifications = notification_feed(current_user.id).all()
     discussions = Discussion.query.order_by(Discussion.date.desc()).limit(5).all()
     
     # Mark all notifications as read
     Notification.query.filter_by(user_id=current_user.id, is_read=False).update({'is_read': True})
+    advance_broadcast_marker(current_user.id)
+    invalidate_user_dashboard(current_user.id)
     db.session.commit()
     
     return render_template('notifications/list.html', notifications=notifications, discussions=discussions)
@@ -722,6 +3421,8 @@ def notifications():
 @login_required
 def clear_notifications():
     Notification.query.filter_by(user_id=current_user.id).delete()
+    advance_broadcast_marker(current_user.id, cleared=True)
+    invalidate_user_dashboard(current_user.id)
     db.session.commit()
     flash('All notifications cleared successfully!', 'success')
     return redirect(url_for('notifications'))
@@ -746,55 +3447,140 @@ def admin_dashboard():
         'users': User.query.count(),
         'members': Member.query.count(),
         'contributions': Contribution.query.count(),
-        'loans': Loan.query.count()
+        'loans': Loan.query.count(),
+        'pending_expenses': Expense.query.filter_by(status='Pending').count()
     }
     
     # AI Risk Analysis
     risk_analysis = calculate_risk_analysis()
     
-    return render_template('admin/dashboard.html', stats=stats, risk_analysis=risk_analysis)
+    this_month = month_start(datetime.utcnow()).date()
+    expenses_this_month = ExpenseRollup.query.filter(ExpenseRollup.month == this_month) \
+        .order_by(ExpenseRollup.total.desc()).all()
+    
+    return render_template('admin/dashboard.html', stats=stats, risk_analysis=risk_analysis,
+                           expenses_this_month=expenses_this_month)
 
 @app.route('/admin/members')
 @login_required
 @admin_required
 def admin_members():
-    members = Member.query.all()
-    return render_template('admin/members.html', members=members)
+    page = paginate_request(Member.query, [Member.id], descending=False, columns=[
+        Member.id, Member.name, Member.phone, Member.email, Member.join_date, Member.status, Member.user_id
+    ])
+    return render_template('admin/members.html', members=page.items, page=page)
 
 @app.route('/admin/users')
 @login_required
 @admin_required
 def admin_users():
-    users = User.query.all()
-    return render_template('admin/users.html', users=users)
+    page = paginate_request(User.query, [User.id], descending=False, columns=[User.id, User.username, User.is_admin])
+    return render_template('admin/users.html', users=page.items, page=page)
 
 @app.route('/admin/loan-requests')
 @login_required
 @admin_required
 def admin_loan_requests():
-    loans = Loan.query.order_by(Loan.date_applied.desc()).all()
-    return render_template('admin/loans.html', loans=loans)
+    page = paginate_request(Loan.query.options(db.joinedload(Loan.member)), [Loan.date_applied, Loan.id])
+    return render_template('admin/loans.html', loans=page.items, page=page)
 
-@app.route('/admin/loans/<int:loan_id>/approve')
+@app.route('/admin/loans/<int:loan_id>/approve', methods=['POST'])
 @login_required
 @admin_required
 def approve_loan(loan_id):
-    loan = Loan.query.get_or_404(loan_id)
-    loan.status = 'Approved'
+    Loan.query.get_or_404(loan_id)
+    result = review_loans([loan_id], 'approve', current_user.id)
     db.session.commit()
-    flash('Loan approved successfully!', 'success')
+    if result['changed']:
+        flash('Loan approved successfully!', 'success')
+    else:
+        flash('Loan was already reviewed.', 'info')
     return redirect(url_for('admin_loan_requests'))
 
-@app.route('/admin/loans/<int:loan_id>/reject')
+@app.route('/admin/loans/<int:loan_id>/reject', methods=['POST'])
 @login_required
 @admin_required
 def reject_loan(loan_id):
-    loan = Loan.query.get_or_404(loan_id)
-    loan.status = 'Rejected'
+    Loan.query.get_or_404(loan_id)
+    result = review_loans([loan_id], 'reject', current_user.id)
+    db.session.commit()
+    flash('Loan rejected!' if result['changed'] else 'Loan was already reviewed.', 'info')
+    return redirect(url_for('admin_loan_requests'))
+
+@app.route('/admin/loans/review', methods=['POST'])
+@login_required
+@admin_required
+def review_selected_loans():
+    action = request.form.get('action')
+    try:
+        loan_ids = parse_id_list(request.form.getlist('loan_ids'), 'loan_ids', LOAN_REVIEW_MAX)
+    except ValueError:
+        flash('Select at least one loan.', 'warning')
+        return redirect(url_for('admin_loan_requests'))
+    if action not in LOAN_REVIEW_STATUSES:
+        abort(400)
+    result = review_loans(loan_ids, action, current_user.id)
     db.session.commit()
-    flash('Loan rejected!', 'info')
+    flash(f"{len(result['changed'])} loan(s) {result['status'].lower()}"
+          + (f", {len(result['skipped'])} already reviewed." if result['skipped'] else '.'), 'success')
     return redirect(url_for('admin_loan_requests'))
 
+@app.route('/api/loans/review', methods=['POST'])
+@login_required
+@admin_required
+def review_loans_api():
+    """{"loan_ids": [...], "action": "approve" | "reject"}; only pending loans change."""
+    data = request.get_json(silent=True) or {}
+    if data.get('action') not in LOAN_REVIEW_STATUSES:
+        return jsonify({'error': f"action must be one of {', '.join(LOAN_REVIEW_STATUSES)}"}), 400
+    try:
+        loan_ids = parse_id_list(data.get('loan_ids'), 'loan_ids', LOAN_REVIEW_MAX)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    result = review_loans(loan_ids, data['action'], current_user.id)
+    db.session.commit()
+    return jsonify(result)
+
+@app.route('/admin/loans/<int:loan_id>/repayments', methods=['POST'])
+@login_required
+@admin_required
+def record_repayment(loan_id):
+    loan = Loan.query.get_or_404(loan_id)
+    if loan.status != 'Approved':
+        flash('Repayments can only be recorded on active loans.', 'warning')
+        return redirect(url_for('loan_detail', loan_id=loan.id))
+    try:
+        amount = Money.parse(request.form.get('amount'))
+    except (TypeError, ValueError):
+        amount = None
+    if not amount or amount < 0 or amount > (loan.outstanding_balance or 0):
+        flash('Enter an amount up to the outstanding balance.', 'danger')
+        return redirect(url_for('loan_detail', loan_id=loan.id))
+    record_loan_repayment(loan, amount, current_user.id, request.form.get('reference') or None)
+    db.session.commit()
+    flash('Repayment recorded.', 'success')
+    return redirect(url_for('loan_detail', loan_id=loan.id))
+
+@app.route('/admin/loans/portfolio')
+@login_required
+@admin_required
+def loan_portfolio():
+    # Buckets come from the last servicing run; the list is served by ix_loan_status_days_past_due
+    past_due = Loan.query.options(db.joinedload(Loan.member)) \
+        .filter(Loan.status == 'Approved', Loan.days_past_due > 0) \
+        .order_by(Loan.days_past_due.desc()).limit(50).all()
+    return render_template('admin/loan_portfolio.html', portfolio=portfolio_at_risk(), past_due=past_due)
+
+@app.route('/api/loans/portfolio-at-risk')
+@login_required
+@admin_required
+def portfolio_at_risk_api():
+    portfolio = portfolio_at_risk()
+    if portfolio is None:
+        return jsonify({'error': 'Loans have not been serviced yet; run `flask service-loans`'}), 404
+    return jsonify(dict(portfolio, as_of=portfolio['as_of'].isoformat(),
+                        trend=[dict(point, as_of=point['as_of'].isoformat()) for point in portfolio['trend']]))
+
 @app.route('/admin/ai-insights')
 @login_required
 @admin_required
@@ -874,10 +3660,7 @@ def send_notification():
         user_id = request.form.get('user_id')
         
         if user_id == 'all':
-            users = User.query.filter_by(is_admin=False).all()
-            for user in users:
-                notification = Notification(title=title, message=message, user_id=user.id)
-                db.session.add(notification)
+            db.session.add(Broadcast(title=title, message=message, created_by=current_user.id))
         else:
             notification = Notification(title=title, message=message, user_id=int(user_id))
             db.session.add(notification)
@@ -989,9 +3772,42 @@ def reset_password():
 @app.route('/investments')
 @login_required
 def investments():
-    investments = Investment.query.order_by(Investment.purchase_date.desc()).all()
+    page = paginate_request(Investment.query, [Investment.purchase_date, Investment.id])
     portfolio = calculate_portfolio_performance()
-    return render_template('investments/list.html', investments=investments, portfolio=portfolio)
+    history = portfolio_history()[-12:]
+    return render_template('investments/list.html', investments=page.items, portfolio=portfolio, page=page,
+                           history=history[::-1])
+
+@app.route('/api/investments/performance')
+@login_required
+def investment_performance_api():
+    period = request.args.get('period', 'month')
+    if period not in PORTFOLIO_PERIODS:
+        return jsonify({'error': f"period must be one of {', '.join(PORTFOLIO_PERIODS)}"}), 400
+    portfolio = calculate_portfolio_performance()
+    return jsonify({
+        'summary': portfolio,
+        'period': period,
+        'history': portfolio_history(period)
+    })
+
+@app.route('/investments/<int:investment_id>/revalue', methods=['POST'])
+@login_required
+@admin_required
+def revalue_investment(investment_id):
+    investment = Investment.query.get_or_404(investment_id)
+    try:
+        value = Money.parse(request.form.get('value'))
+    except ValueError:
+        flash('Enter a valid value.', 'danger')
+        return redirect(url_for('investments'))
+    if value < 0:
+        flash('Value cannot be negative.', 'danger')
+        return redirect(url_for('investments'))
+    record_valuation(investment, value, note=request.form.get('note') or None, recorded_by=current_user.id)
+    db.session.commit()
+    flash(f'{investment.name} revalued at KSH {value:.2f}.', 'success')
+    return redirect(url_for('investments'))
 
 @app.route('/investments/add', methods=['GET', 'POST'])
 @login_required
@@ -1001,12 +3817,15 @@ def add_investment():
         investment = Investment(
             name=request.form.get('name'),
             type=request.form.get('type'),
-            amount_invested=float(request.form.get('amount')),
-            current_value=float(request.form.get('amount')),
+            amount_invested=Money.parse(request.form.get('amount')),
+            current_value=Money.parse(request.form.get('amount')),
             description=request.form.get('description'),
             created_by=current_user.id
         )
         db.session.add(investment)
+        db.session.flush()
+        record_valuation(investment, investment.amount_invested, valued_at=investment.purchase_date,
+                         note='Purchase', recorded_by=current_user.id)
         db.session.commit()
         flash('Investment added successfully!', 'success')
         return redirect(url_for('investments'))
@@ -1016,11 +3835,13 @@ def add_investment():
 @app.route('/expenses')
 @login_required
 def expenses():
-    if current_user.is_admin:
-        expenses = Expense.query.order_by(Expense.date.desc()).all()
-    else:
-        expenses = Expense.query.filter_by(created_by=current_user.id).order_by(Expense.date.desc()).all()
-    return render_template('expenses/list.html', expenses=expenses)
+    query = Expense.query
+    if not current_user.is_admin:
+        query = query.filter_by(created_by=current_user.id)
+    page = paginate_request(query, [Expense.date, Expense.id], columns=[
+        Expense.id, Expense.category, Expense.description, Expense.amount, Expense.date, Expense.status
+    ])
+    return render_template('expenses/list.html', expenses=page.items, page=page)
 
 @app.route('/expenses/add', methods=['GET', 'POST'])
 @login_required
@@ -1028,7 +3849,7 @@ def add_expense():
     if request.method == 'POST':
         expense = Expense(
             category=request.form.get('category'),
-            amount=float(request.form.get('amount')),
+            amount=Money.parse(request.form.get('amount')),
             description=request.form.get('description'),
             created_by=current_user.id
         )
@@ -1038,23 +3859,96 @@ def add_expense():
         return redirect(url_for('expenses'))
     return render_template('expenses/add.html')
 
-@app.route('/expenses/<int:expense_id>/approve')
+@app.route('/expenses/<int:expense_id>/approve', methods=['POST'])
 @login_required
 @admin_required
 def approve_expense(expense_id):
-    expense = Expense.query.get_or_404(expense_id)
-    expense.status = 'Approved'
-    expense.approved_by = current_user.id
+    Expense.query.get_or_404(expense_id)
+    result = review_expenses([expense_id], 'approve', current_user.id)
+    db.session.commit()
+    flash('Expense approved!' if result['changed'] else 'Expense was already reviewed.',
+          'success' if result['changed'] else 'info')
+    return redirect(url_for('expenses'))
+
+@app.route('/expenses/review', methods=['POST'])
+@login_required
+@admin_required
+def review_selected_expenses():
+    action = request.form.get('action')
+    try:
+        expense_ids = parse_id_list(request.form.getlist('expense_ids'), 'expense_ids', EXPENSE_REVIEW_MAX)
+    except ValueError:
+        flash('Select at least one expense.', 'warning')
+        return redirect(url_for('expenses'))
+    if action not in EXPENSE_REVIEW_STATUSES:
+        abort(400)
+    result = review_expenses(expense_ids, action, current_user.id)
     db.session.commit()
-    flash('Expense approved!', 'success')
+    flash(f"{len(result['changed'])} expense(s) {result['status'].lower()}"
+          + (f", {len(result['skipped'])} already reviewed." if result['skipped'] else '.'), 'success')
     return redirect(url_for('expenses'))
 
+@app.route('/api/expenses/review', methods=['POST'])
+@login_required
+@admin_required
+def review_expenses_api():
+    """{"expense_ids": [...], "action": "approve" | "reject"}; only pending expenses change."""
+    data = request.get_json(silent=True) or {}
+    if data.get('action') not in EXPENSE_REVIEW_STATUSES:
+        return jsonify({'error': f"action must be one of {', '.join(EXPENSE_REVIEW_STATUSES)}"}), 400
+    try:
+        expense_ids = parse_id_list(data.get('expense_ids'), 'expense_ids', EXPENSE_REVIEW_MAX)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    result = review_expenses(expense_ids, data['action'], current_user.id)
+    db.session.commit()
+    return jsonify(result)
+
+@app.route('/api/expenses/rollups')
+@login_required
+@admin_required
+def expense_rollups_api():
+    """Approved totals per month and category for the last ?months= months (default 12), newest first."""
+    months = max(1, min(request.args.get('months', 12, type=int), 120))
+    since = month_start(datetime.utcnow())
+    for _ in range(months - 1):
+        since = month_start(since - timedelta(days=1))
+    rows = ExpenseRollup.query.filter(ExpenseRollup.month >= since.date()) \
+        .order_by(ExpenseRollup.month.desc(), ExpenseRollup.category).all()
+    return jsonify({'rollups': [{
+        'month': row.month.isoformat(),
+        'category': row.category,
+        'total': row.total,
+        'count': row.count
+    } for row in rows]})
+
 # Goals Management Routes
 @app.route('/goals')
 @login_required
 def goals():
     goals = Goal.query.order_by(Goal.target_date).all()
-    return render_template('goals/list.html', goals=goals)
+    return render_template('goals/list.html', goals=goals, projections=goal_projections(), now=datetime.utcnow())
+
+@app.route('/api/goals')
+@login_required
+def goals_api():
+    projections = goal_projections()
+    return jsonify({'goals': [{
+        'id': goal.id,
+        'title': goal.title,
+        'category': goal.category,
+        'status': goal.status,
+        'target_amount': goal.target_amount,
+        'current_amount': goal.current_amount,
+        'target_date': goal.target_date.isoformat(),
+        'progress_source': goal.progress_source or 'manual',
+        'contribution_category': goal.contribution_category,
+        'contributions_from': goal.contributions_from.isoformat() if goal.contributions_from else None,
+        'contributions_until': goal.contributions_until.isoformat() if goal.contributions_until else None,
+        'rate_per_day': projections[goal.id]['rate_per_day'],
+        'projected_date': projections[goal.id]['projected_date'].isoformat() if projections[goal.id]['projected_date'] else None,
+        'on_track': projections[goal.id]['on_track']
+    } for goal in Goal.query.order_by(Goal.target_date, Goal.id)]})
 
 @app.route('/goals/add', methods=['GET', 'POST'])
 @login_required
@@ -1064,23 +3958,36 @@ def add_goal():
         goal = Goal(
             title=request.form.get('title'),
             description=request.form.get('description'),
-            target_amount=float(request.form.get('target_amount')),
+            target_amount=Money.parse(request.form.get('target_amount')),
             target_date=datetime.strptime(request.form.get('target_date'), '%Y-%m-%d'),
             category=request.form.get('category'),
             created_by=current_user.id
         )
+        if request.form.get('track_contributions'):
+            counted_from = request.form.get('contributions_from')
+            counted_through = request.form.get('contributions_through')
+            goal.progress_source = 'contributions'
+            goal.contribution_category = request.form.get('contribution_category') or None
+            goal.contributions_from = datetime.strptime(counted_from, '%Y-%m-%d') if counted_from else None
+            # Inclusive date in the form, exclusive bound in the table
+            goal.contributions_until = datetime.strptime(counted_through, '%Y-%m-%d') + timedelta(days=1) if counted_through else None
+        else:
+            goal.current_amount = Money.parse(request.form.get('current_amount') or 0)
         db.session.add(goal)
+        db.session.flush()
+        if goal.progress_source == 'contributions':
+            rebuild_goal_progress([goal.id])
         db.session.commit()
         flash('Goal created successfully!', 'success')
         return redirect(url_for('goals'))
-    return render_template('goals/add.html')
+    return render_template('goals/add.html', categories=CONTRIBUTION_CATEGORIES)
 
 # Meeting Management Routes
 @app.route('/meetings')
 @login_required
 def meetings():
-    meetings = Meeting.query.order_by(Meeting.date.desc()).all()
-    return render_template('meetings/list.html', meetings=meetings)
+    page = paginate_request(Meeting.query, [Meeting.date, Meeting.id])
+    return render_template('meetings/list.html', meetings=page.items, page=page)
 
 @app.route('/meetings/add', methods=['GET', 'POST'])
 @login_required
@@ -1101,13 +4008,99 @@ def add_meeting():
         return redirect(url_for('meetings'))
     return render_template('meetings/add.html')
 
+@app.route('/meetings/<int:meeting_id>/attendance', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def meeting_attendance(meeting_id):
+    meeting = Meeting.query.get_or_404(meeting_id)
+    if request.method == 'POST':
+        member_ids = request.form.getlist('member_ids', type=int)
+        meeting.attendees = Member.query.filter(Member.id.in_(member_ids)).all() if member_ids else []
+        db.session.commit()
+        flash(f'Attendance recorded for {len(meeting.attendees)} member(s).', 'success')
+        return redirect(url_for('meetings'))
+    
+    present = {member.id for member in meeting.attendees}
+    members = db.session.query(Member.id, Member.name).order_by(Member.name).all()
+    return render_template('meetings/attendance.html', meeting=meeting, members=members, present=present)
+
+@app.route('/api/attendance/members')
+@login_required
+@admin_required
+def api_member_attendance():
+    """Attendance rate of every member, one keyset page at a time."""
+    page = paginate_request(Member.query, [Member.id], descending=False, columns=[
+        Member.id, Member.name, attended_meeting_count().label('attended'), expected_meeting_count().label('expected')
+    ])
+    return jsonify({
+        'next_cursor': page.next_cursor,
+        'members': [{
+            'member_id': m.id,
+            'name': m.name,
+            'meetings_attended': m.attended,
+            'meetings_expected': max(m.attended, m.expected),
+            'attendance_rate': attendance_rate(m.attended, m.expected)
+        } for m in page.items]
+    })
+
+@app.route('/api/attendance/members/<int:member_id>')
+@login_required
+def api_member_meetings(member_id):
+    """The held meetings one member attended, newest first, with their overall rate."""
+    member = Member.query.get_or_404(member_id)
+    if not current_user.is_admin and member.user_id != current_user.id:
+        abort(403)
+    
+    attended, expected = db.session.query(
+        attended_meeting_count(), expected_meeting_count()
+    ).select_from(Member).filter(Member.id == member_id).one()
+    page = paginate_request(
+        Meeting.query.join(MeetingAttendance, MeetingAttendance.meeting_id == Meeting.id)
+            .filter(MeetingAttendance.member_id == member_id, meeting_held()),
+        [Meeting.date, Meeting.id],
+        columns=[Meeting.id, Meeting.title, Meeting.date]
+    )
+    return jsonify({
+        'member_id': member_id,
+        'meetings_attended': attended,
+        'meetings_expected': max(attended, expected),
+        'attendance_rate': attendance_rate(attended, expected),
+        'next_cursor': page.next_cursor,
+        'meetings': [{'id': m.id, 'title': m.title, 'date': m.date.isoformat()} for m in page.items]
+    })
+
+@app.route('/api/attendance/meetings')
+@login_required
+@admin_required
+def api_meeting_attendance():
+    """Attendance rate of every held meeting against the members who had joined by then, newest first."""
+    page = paginate_request(Meeting.query.filter(meeting_held()), [Meeting.date, Meeting.id], columns=[
+        Meeting.id, Meeting.title, Meeting.date, Meeting.status,
+        meeting_attendee_count().label('attendees'), meeting_eligible_count().label('eligible')
+    ])
+    return jsonify({
+        'next_cursor': page.next_cursor,
+        'meetings': [{
+            'meeting_id': m.id,
+            'title': m.title,
+            'date': m.date.isoformat(),
+            'status': m.status,
+            'attendees': m.attendees,
+            'eligible_members': max(m.attendees, m.eligible),
+            'attendance_rate': attendance_rate(m.attendees, m.eligible)
+        } for m in page.items]
+    })
+
 # Reports Routes
 @app.route('/reports')
 @login_required
 @admin_required
 def reports():
-    reports = Report.query.order_by(Report.generated_date.desc()).all()
-    return render_template('reports/list.html', reports=reports)
+    # Report.content can be large, so the list only selects what it shows
+    page = paginate_request(Report.query, [Report.generated_date, Report.id], columns=[
+        Report.id, Report.title, Report.type, Report.period_start, Report.period_end, Report.generated_date
+    ])
+    return render_template('reports/list.html', reports=page.items, page=page)
 
 @app.route('/reports/generate', methods=['GET', 'POST'])
 @login_required
@@ -1117,13 +4110,16 @@ def generate_report():
         start_date = datetime.strptime(request.form.get('start_date'), '%Y-%m-%d')
         end_date = datetime.strptime(request.form.get('end_date'), '%Y-%m-%d')
         report_type = request.form.get('type')
+        granularity = request.form.get('granularity', 'month')
+        if granularity not in REPORT_GRANULARITIES:
+            granularity = 'month'
         
-        financial_data = generate_financial_report(start_date, end_date)
+        financial_data = generate_financial_report(start_date, end_date, granularity)
         
         report = Report(
             title=f'{report_type.title()} Report - {start_date.strftime("%b %Y")}',
             type=report_type,
-            content=str(financial_data),
+            content=json.dumps(financial_data, default=json_default),
             period_start=start_date,
             period_end=end_date,
             generated_by=current_user.id
@@ -1134,6 +4130,43 @@ def generate_report():
         return redirect(url_for('reports'))
     return render_template('reports/generate.html')
 
+@app.route('/reports/runs/<int:run_id>')
+@login_required
+@admin_required
+def report_run_status(run_id):
+    run = ReportRun.query.get_or_404(run_id)
+    return jsonify({
+        'id': run.id,
+        'status': run.status,
+        'period_start': run.period_start.isoformat() if run.period_start else None,
+        'period_end': run.period_end.isoformat() if run.period_end else None,
+        'total_members': run.total_members,
+        'skipped_members': run.skipped_members,
+        'shard_count': run.shard_count,
+        'completed_shards': run.completed_shards,
+        'progress': run.completed_shards / run.shard_count if run.shard_count else 1.0,
+        'started_at': run.started_at.isoformat() if run.started_at else None,
+        'finished_at': run.finished_at.isoformat() if run.finished_at else None,
+        'shards': [{
+            'index': shard.shard_index,
+            'status': shard.status,
+            'member_count': shard.member_count,
+            'reports_written': shard.reports_written,
+            'duration_seconds': shard.duration_seconds,
+            'error': shard.error
+        } for shard in run.shards]
+    })
+
+@app.cli.command('generate-monthly-reports')
+@click.option('--format', 'fmt', type=click.Choice(['xlsx', 'csv', 'parquet']), default='xlsx', help='Statement file format.')
+@click.option('--shard-size', type=click.IntRange(min=1), default=500, help='Members per shard.')
+def generate_monthly_reports_command(fmt, shard_size):
+    """Write statements for members with new activity on a local process pool; no Celery broker needed."""
+    from tasks.reports import run_monthly_reports
+    run = run_monthly_reports(fmt, shard_size)
+    click.echo(f'Report run {run.id} {run.status.lower()}: {run.total_members - run.skipped_members} statement(s) '
+               f'in {run.shard_count} shard(s), {run.skipped_members} member(s) without new activity skipped.')
+
 # Blockchain & Crypto Routes
 @app.route('/blockchain')
 @login_required
@@ -1168,35 +4201,42 @@ def crypto_wallet():
     return render_template('crypto/wallet.html', wallet=wallet)
 
 # AI Insights Routes
+# Scheduled refreshes come from the update_ai_insights Celery beat task or
+# `flask refresh-ai-insights` in cron, not from a timer in every web worker.
+# insight_job only runs the refresh an admin asks for off the request thread.
+insight_job = PeriodicJob(
+    in_app_context(refresh_ai_insights),
+    interval=0,
+    name='ai-insights',
+    on_error=lambda e: app.logger.exception('AI insight job failed', exc_info=e)
+)
+app.extensions['ai_insights'] = insight_job
+
 @app.route('/ai-insights')
 @login_required
 def ai_insights():
-    # Only admins can generate new insights
-    if current_user.is_admin:
-        insights = generate_ai_insights()
-        
-        # Save insights to database
-        for insight_data in insights:
-            existing = AIInsight.query.filter_by(
-                title=insight_data['title'],
-                generated_date=datetime.utcnow().date()
-            ).first()
-            
-            if not existing:
-                insight = AIInsight(
-                    insight_type=insight_data['type'],
-                    title=insight_data['title'],
-                    description=insight_data['description'],
-                    confidence_score=insight_data['confidence'],
-                    priority=insight_data['priority']
-                )
-                db.session.add(insight)
-        
-        db.session.commit()
-    
-    # Both admins and regular users can view insights
+    # Insights are written by insight_job; both admins and regular users only read them here
     all_insights = AIInsight.query.filter_by(status='Active').order_by(AIInsight.generated_date.desc()).all()
-    return render_template('ai/insights.html', insights=all_insights, is_admin=current_user.is_admin)
+    last_run = InsightRun.query.filter_by(status='Completed').order_by(InsightRun.id.desc()).first() if current_user.is_admin else None
+    return render_template('ai/insights.html', insights=all_insights, last_run=last_run, is_admin=current_user.is_admin)
+
+@app.route('/ai-insights/refresh', methods=['POST'])
+@login_required
+@admin_required
+def refresh_ai_insights_now():
+    insight_job.trigger()
+    flash('Insights are being refreshed in the background. Reload in a moment to see the results.', 'info')
+    return redirect(url_for('ai_insights'))
+
+@app.cli.command('refresh-ai-insights')
+@click.option('--force', is_flag=True, help='Regenerate even if the source data has not changed.')
+def refresh_ai_insights_command(force):
+    """Regenerate AI insights if contributions, loans or investments changed since the last run."""
+    run = refresh_ai_insights(force=force)
+    if run is None:
+        click.echo('No changes since the last run; insights are up to date.')
+    else:
+        click.echo(f'Insight run {run.id} {run.status.lower()}: {run.insights_generated} insight(s) in {run.duration_seconds:.2f}s.')
 
 # Smart Contracts Routes
 @app.route('/smart-contracts')
@@ -1221,7 +4261,7 @@ def create_smart_contract():
             contract_name=request.form.get('name'),
             contract_type=request.form.get('type'),
             conditions=json.dumps(conditions),
-            amount=float(request.form.get('amount', 0))
+            amount=Money.parse(request.form.get('amount', 0))
         )
         db.session.add(contract)
         db.session.commit()
@@ -1230,20 +4270,241 @@ def create_smart_contract():
     
     return render_template('smart_contracts/create.html')
 
+# IoT telemetry
+# Readings are appended to SensorReading. The same batch is folded into minute
+# and hour SensorRollup buckets and the SensorLatest value per metric, and each
+# device's last_ping and battery_level are written once per batch.
+IOT_MAX_BATCH = int(os.getenv('IOT_MAX_BATCH', 5000))
+IOT_RAW_RETENTION_DAYS = int(os.getenv('IOT_RAW_RETENTION_DAYS', 30))
+IOT_MINUTE_RETENTION_DAYS = int(os.getenv('IOT_MINUTE_RETENTION_DAYS', 30))
+IOT_MAX_HISTORY_HOURS = 24 * 90
+BATTERY_METRIC = 'battery_level'
+
+def dialect_insert(table):
+    """INSERT for the bound dialect, so callers can add ON CONFLICT clauses."""
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table)
+
+def ingest_readings(readings):
+    """Store (device_id string, timestamp, metric, value) readings in the current transaction.
+    
+    Readings already stored (same device, metric and timestamp) are ignored, so
+    a device can safely resend a batch. Returns counts and unknown device ids.
+    """
+    device_ids = dict(db.session.query(IoTDevice.device_id, IoTDevice.id)
+                      .filter(IoTDevice.device_id.in_({reading[0] for reading in readings})))
+    known = [(device_ids[device], timestamp, metric, value)
+             for device, timestamp, metric, value in readings if device in device_ids]
+    summary = {
+        'accepted': 0,
+        'duplicates': 0,
+        'unknown_devices': sorted({reading[0] for reading in readings} - set(device_ids))
+    }
+    if not known:
+        return summary
+    
+    connection = db.session.connection()
+    reading_table = SensorReading.__table__
+    inserted = []
+    for i in range(0, len(known), 1000):
+        result = connection.execute(
+            dialect_insert(reading_table).on_conflict_do_nothing().returning(
+                reading_table.c.device_id, reading_table.c.recorded_at, reading_table.c.metric, reading_table.c.value
+            ),
+            [{'device_id': device, 'day': day_number(timestamp), 'metric': metric, 'recorded_at': timestamp, 'value': value}
+             for device, timestamp, metric, value in known[i:i + 1000]]
+        )
+        inserted.extend(tuple(row) for row in result)
+    summary['accepted'] = len(inserted)
+    summary['duplicates'] = len(known) - len(inserted)
+    if not inserted:
+        return summary
+    
+    rollup_table = SensorRollup.__table__
+    smaller, larger = (db.func.least, db.func.greatest) if db.engine.dialect.name == 'postgresql' else (db.func.min, db.func.max)
+    statement = dialect_insert(rollup_table)
+    connection.execute(statement.on_conflict_do_update(
+        index_elements=['device_id', 'metric', 'resolution', 'bucket_start'],
+        set_={
+            'count': rollup_table.c.count + statement.excluded.count,
+            'total': rollup_table.c.total + statement.excluded.total,
+            'minimum': smaller(rollup_table.c.minimum, statement.excluded.minimum),
+            'maximum': larger(rollup_table.c.maximum, statement.excluded.maximum)
+        }
+    ), [
+        {'device_id': device, 'metric': metric, 'resolution': resolution, 'bucket_start': bucket,
+         'count': count, 'total': total, 'minimum': minimum, 'maximum': maximum}
+        for (device, metric, resolution, bucket), (count, total, minimum, maximum) in rollup_deltas(inserted).items()
+    ])
+    
+    latest = {}
+    for device, timestamp, metric, value in inserted:
+        if (device, metric) not in latest or timestamp >= latest[device, metric][0]:
+            latest[device, metric] = (timestamp, value)
+    latest_table = SensorLatest.__table__
+    statement = dialect_insert(latest_table)
+    connection.execute(statement.on_conflict_do_update(
+        index_elements=['device_id', 'metric'],
+        set_={'recorded_at': statement.excluded.recorded_at, 'value': statement.excluded.value},
+        where=statement.excluded.recorded_at >= latest_table.c.recorded_at
+    ), [{'device_id': device, 'metric': metric, 'recorded_at': timestamp, 'value': value}
+        for (device, metric), (timestamp, value) in latest.items()])
+    
+    # One coalesced write per device: last_ping only moves forward and the
+    # battery level follows the newest stored battery reading
+    last_ping = {}
+    for device, timestamp, _, _ in inserted:
+        last_ping[device] = max(timestamp, last_ping.get(device, timestamp))
+    device_table = IoTDevice.__table__
+    ping = db.bindparam('ping', type_=db.DateTime)
+    battery = db.select(db.cast(db.func.round(latest_table.c.value), db.Integer)).where(
+        latest_table.c.device_id == device_table.c.id, latest_table.c.metric == BATTERY_METRIC
+    ).scalar_subquery()
+    connection.execute(
+        device_table.update().where(device_table.c.id == db.bindparam('device_pk')).values(
+            last_ping=db.case((db.or_(device_table.c.last_ping.is_(None), device_table.c.last_ping < ping), ping),
+                              else_=device_table.c.last_ping),
+            battery_level=db.func.coalesce(battery, device_table.c.battery_level)
+        ),
+        [{'device_pk': device, 'ping': timestamp} for device, timestamp in last_ping.items()]
+    )
+    return summary
+
+def latest_sensor_values(device_pks=None):
+    """{device pk: {metric: (recorded_at, value)}} from the latest-value table."""
+    query = db.session.query(SensorLatest.device_id, SensorLatest.metric, SensorLatest.recorded_at, SensorLatest.value)
+    if device_pks is not None:
+        query = query.filter(SensorLatest.device_id.in_(device_pks))
+    latest = {}
+    for device, metric, recorded_at, value in query.order_by(SensorLatest.device_id, SensorLatest.metric):
+        latest.setdefault(device, {})[metric] = (recorded_at, value)
+    return latest
+
+def sensor_history(device_pk, metric, start, end, resolution=None):
+    """Readings of one metric between start and end, oldest first.
+    
+    With a resolution (seconds) they come from the rollups as (bucket start,
+    count, average, minimum, maximum); without one they are raw
+    (recorded_at, value) rows.
+    """
+    if resolution is None:
+        return db.session.query(SensorReading.recorded_at, SensorReading.value).filter(
+            SensorReading.device_id == device_pk,
+            SensorReading.day.between(day_number(start), day_number(end)),
+            SensorReading.metric == metric,
+            SensorReading.recorded_at.between(start, end)
+        ).order_by(SensorReading.day, SensorReading.recorded_at).all()
+    rows = db.session.query(
+        SensorRollup.bucket_start, SensorRollup.count, SensorRollup.total, SensorRollup.minimum, SensorRollup.maximum
+    ).filter(
+        SensorRollup.device_id == device_pk,
+        SensorRollup.metric == metric,
+        SensorRollup.resolution == resolution,
+        SensorRollup.bucket_start.between(start, end)
+    ).order_by(SensorRollup.bucket_start)
+    return [(bucket, count, total / count, minimum, maximum) for bucket, count, total, minimum, maximum in rows]
+
+def iot_ingest_authorized():
+    """Devices present the IOT_INGEST_TOKEN bearer token; admins can also post from a session."""
+    token = os.getenv('IOT_INGEST_TOKEN')
+    header = request.headers.get('Authorization', '')
+    if token and header.startswith('Bearer ') and secrets.compare_digest(header[len('Bearer '):], token):
+        return True
+    return current_user.is_authenticated and current_user.is_admin
+
+@app.route('/api/iot/readings', methods=['POST'])
+def ingest_iot_readings():
+    if not iot_ingest_authorized():
+        return jsonify({'error': 'Not authorized'}), 401
+    try:
+        readings = parse_readings(request.get_json(silent=True), IOT_MAX_BATCH, datetime.utcnow())
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    summary = ingest_readings(readings)
+    db.session.commit()
+    return jsonify(summary), 202 if summary['accepted'] or summary['duplicates'] else 422
+
+@app.route('/api/iot/devices/latest')
+@login_required
+@admin_required
+def iot_latest_values():
+    devices = db.session.query(IoTDevice.id, IoTDevice.device_id, IoTDevice.last_ping, IoTDevice.battery_level).all()
+    latest = latest_sensor_values()
+    return jsonify({'devices': [{
+        'device_id': device_id,
+        'last_ping': last_ping.isoformat() if last_ping else None,
+        'battery_level': battery_level,
+        'latest': {metric: {'recorded_at': recorded_at.isoformat(), 'value': value}
+                   for metric, (recorded_at, value) in latest.get(pk, {}).items()}
+    } for pk, device_id, last_ping, battery_level in devices]})
+
+@app.route('/api/iot/devices/<device_id>/history')
+@login_required
+@admin_required
+def iot_device_history(device_id):
+    """?metric=&hours=24[&resolution=raw|minute|hour]; the resolution defaults to the finest that fits the window."""
+    device = IoTDevice.query.filter_by(device_id=device_id).first_or_404()
+    metric = request.args.get('metric')
+    if not metric:
+        return jsonify({'error': 'metric is required'}), 400
+    hours = max(1 / 60, min(request.args.get('hours', 24, type=float), IOT_MAX_HISTORY_HOURS))
+    end = datetime.utcnow()
+    start = end - timedelta(hours=hours)
+    
+    resolution = {'raw': None, 'minute': ROLLUP_RESOLUTIONS[0], 'hour': ROLLUP_RESOLUTIONS[-1]}.get(
+        request.args.get('resolution'), history_resolution(hours * 3600)
+    )
+    if resolution is None:
+        points = [{'t': recorded_at.isoformat(), 'value': value}
+                  for recorded_at, value in sensor_history(device.id, metric, start, end)]
+    else:
+        points = [{'t': bucket.isoformat(), 'count': count, 'avg': average, 'min': minimum, 'max': maximum}
+                  for bucket, count, average, minimum, maximum in sensor_history(device.id, metric, start, end, resolution)]
+    return jsonify({
+        'device_id': device.device_id,
+        'metric': metric,
+        'resolution': 'raw' if resolution is None else resolution,
+        'points': points
+    })
+
+@app.cli.command('prune-sensor-data')
+def prune_sensor_data_command():
+    """Delete raw readings and minute rollups past their retention; hour rollups are kept."""
+    now = datetime.utcnow()
+    raw_cutoff = day_number(now - timedelta(days=IOT_RAW_RETENTION_DAYS))
+    minute_cutoff = now - timedelta(days=IOT_MINUTE_RETENTION_DAYS)
+    raw = minutes = 0
+    for device_pk, in db.session.query(IoTDevice.id):
+        # Per device, so each delete is a range of the primary key
+        raw += SensorReading.query.filter(
+            SensorReading.device_id == device_pk, SensorReading.day < raw_cutoff
+        ).delete(synchronize_session=False)
+        minutes += SensorRollup.query.filter(
+            SensorRollup.device_id == device_pk,
+            SensorRollup.resolution == ROLLUP_RESOLUTIONS[0],
+            SensorRollup.bucket_start < minute_cutoff
+        ).delete(synchronize_session=False)
+        db.session.commit()
+    click.echo(f'Deleted {raw} raw reading(s) and {minutes} minute rollup(s).')
+
 # IoT Dashboard
 @app.route('/iot-dashboard')
 @login_required
 @admin_required
 def iot_dashboard():
     devices = IoTDevice.query.all()
-    return render_template('iot/dashboard.html', devices=devices)
+    return render_template('iot/dashboard.html', devices=devices, latest=latest_sensor_values())
 
 # VR Meeting Routes
 @app.route('/vr-meetings')
 @login_required
 def vr_meetings():
-    vr_sessions = VirtualReality.query.order_by(VirtualReality.start_time.desc()).all()
-    return render_template('vr/meetings.html', sessions=vr_sessions, is_admin=current_user.is_admin)
+    page = paginate_request(VirtualReality.query, [VirtualReality.start_time, VirtualReality.id])
+    return render_template('vr/meetings.html', sessions=page.items, is_admin=current_user.is_admin, page=page)
 
 @app.route('/vr-meetings/create', methods=['GET', 'POST'])
 @login_required
@@ -1277,48 +4538,194 @@ def biometric_setup():
 @app.route('/api/blockchain/verify', methods=['POST'])
 @login_required
 def verify_blockchain():
-    blocks = Blockchain.query.order_by(Blockchain.id).all()
-    
-    for i, block in enumerate(blocks):
-        if i == 0:  # Genesis block
-            continue
-        
-        previous_block = blocks[i-1]
-        if block.previous_hash != previous_block.block_hash:
-            return jsonify({'valid': False, 'error': f'Block {block.id} has invalid previous hash'})
-    
-    return jsonify({'valid': True, 'message': 'Blockchain is valid'})
+    first_id = request.args.get('first', type=int)
+    last_id = request.args.get('last', type=int)
+    if first_id and last_id:
+        return jsonify(verify_ledger_range(first_id, last_id))
+    return jsonify(verify_ledger(full=request.args.get('full') == '1'))
+
+@app.route('/api/blockchain/proof/<int:block_id>')
+@login_required
+def blockchain_proof(block_id):
+    proof = ledger_inclusion_proof(block_id)
+    if not proof:
+        return jsonify({'error': f'Block {block_id} is not in a sealed segment yet'}), 404
+    return jsonify(proof)
 
 @app.route('/api/ai/predict-default/<int:member_id>')
 @login_required
 @admin_required
 def predict_member_default(member_id):
-    member = Member.query.get_or_404(member_id)
-    
-    # Simple ML prediction based on contribution patterns
-    contributions = member.contributions
-    loans = member.loans
-    
-    if not contributions:
-        return jsonify({'risk_score': 0.8, 'risk_level': 'High', 'reason': 'No contribution history'})
-    
-    avg_contribution = sum(c.amount for c in contributions) / len(contributions)
-    total_loans = sum(l.amount for l in loans)
-    
-    risk_score = min(1.0, total_loans / (avg_contribution * len(contributions)) if contributions else 1.0)
+    ids, features = default_risk_features([member_id])
+    if not len(ids):
+        abort(404)
+    return jsonify(default_predictions(ids, features, *score_default_risk(features))[0])
+
+@app.route('/api/ai/predict-default', methods=['POST'])
+@login_required
+@admin_required
+def predict_default_batch():
+    """Score the members in {"member_ids": [...]}, or every member when no ids are given."""
+    member_ids = (request.get_json(silent=True) or {}).get('member_ids')
+    if member_ids is not None and (
+        not isinstance(member_ids, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in member_ids)
+    ):
+        return jsonify({'error': 'member_ids must be a list of integers'}), 400
     
-    risk_level = 'High' if risk_score > 0.7 else 'Medium' if risk_score > 0.4 else 'Low'
+    version, ids, features, scores, levels = default_risk_scores()
+    if member_ids is None:
+        rows = np.arange(len(ids))
+        missing = []
+    else:
+        requested = np.unique(np.array(member_ids, dtype=np.int64))
+        positions = np.minimum(np.searchsorted(ids, requested), max(len(ids) - 1, 0))
+        found = (ids[positions] == requested) if len(ids) else np.zeros(len(requested), dtype=bool)
+        rows = positions[found]
+        missing = requested[~found].tolist()
     
     return jsonify({
-        'risk_score': risk_score,
-        'risk_level': risk_level,
-        'avg_contribution': avg_contribution,
-        'total_loans': total_loans
+        'data_version': version,
+        'count': len(rows),
+        'missing': missing,
+        'predictions': default_predictions(ids[rows], features[rows], scores[rows], levels[rows])
     })
 
+# Query plan checks
+# Each entry mirrors a query on a hot path above; `flask check-query-plans`
+# fails if SQLite would answer any of them with a full table scan.
+def hot_queries():
+    now = datetime.utcnow()
+    month_ago = now - timedelta(days=30)
+    return [
+        ('dashboard contributions', db.select(Contribution.id, Contribution.amount, Contribution.date)
+            .where(Contribution.member_id == 1).order_by(Contribution.date.desc()).limit(5)),
+        ('dashboard loans', db.select(Loan.id, Loan.amount, Loan.status)
+            .where(Loan.member_id == 1).order_by(Loan.date_applied.desc()).limit(3)),
+        ('unread notifications', db.select(db.func.count()).select_from(Notification)
+            .where(Notification.user_id == 1, Notification.is_read == False)),
+        ('notifications list', db.select(Notification).where(Notification.user_id == 1)
+            .order_by(Notification.date.desc())),
+        ('unread broadcasts', db.select(db.func.count(Broadcast.id)).where(Broadcast.id > 1)),
+        ('discussion messages', db.select(Message).where(Message.discussion_id == 1).order_by(Message.id)),
+        ('messages since', db.select(Message.id, Message.content, User.username)
+            .outerjoin(User, User.id == Message.user_id)
+            .where(Message.discussion_id == 1, Message.id > 10).order_by(Message.id).limit(MESSAGE_FEED_LIMIT)),
+        ('latest message', db.select(db.func.max(Message.id)).where(Message.discussion_id == 1)),
+        ('upcoming activities', db.select(Activity).where(Activity.date >= now).order_by(Activity.date).limit(5)),
+        ('member by user', db.select(Member).where(Member.user_id == 1)),
+        ('my expenses', db.select(Expense).where(Expense.created_by == 1).order_by(Expense.date.desc(), Expense.id.desc()).limit(51)),
+        ('member data version', db.select(db.func.max(MemberBalance.updated_at))),
+        ('attendance version', db.select(db.func.count(), db.func.max(MeetingAttendance.recorded_at))
+            .select_from(MeetingAttendance)),
+        ('held meetings', db.select(db.func.count(Meeting.id)).where(meeting_held(now))),
+        ('last insight run', db.select(InsightRun).where(InsightRun.status == 'Completed').order_by(InsightRun.id.desc()).limit(1)),
+        ('active insights', db.select(AIInsight).where(AIInsight.status == 'Active').order_by(AIInsight.generated_date.desc())),
+        ('contributions page', db.select(Contribution)
+            .where(db.or_(Contribution.date < now, db.and_(Contribution.date == now, Contribution.id < 100)))
+            .order_by(Contribution.date.desc(), Contribution.id.desc()).limit(51)),
+        ('member contributions page', db.select(Contribution)
+            .where(Contribution.member_id == 1, Contribution.date < now)
+            .order_by(Contribution.date.desc(), Contribution.id.desc()).limit(51)),
+        ('loans page', db.select(Loan).order_by(Loan.date_applied.desc(), Loan.id.desc()).limit(51)),
+        ('discussions page', db.select(Discussion.id, Discussion.title)
+            .order_by(Discussion.date.desc(), Discussion.id.desc()).limit(51)),
+        ('report contributions', db.select(db.func.sum(Contribution.amount), db.func.count())
+            .where(Contribution.date >= month_ago, Contribution.date < now)),
+        ('report loans', db.select(db.func.sum(Loan.amount), db.func.count())
+            .where(Loan.date_applied >= month_ago, Loan.date_applied < now)),
+        ('report expenses', db.select(db.func.sum(Expense.amount), db.func.count())
+            .where(Expense.status == 'Approved', Expense.date >= month_ago, Expense.date < now)),
+        ('pending loans for members', db.select(Loan.id, Loan.amount)
+            .where(Loan.status == 'Pending', Loan.member_id.in_([1, 2, 3]))),
+        ('latest statements', db.select(Report.member_id, db.func.max(Report.generated_date))
+            .where(Report.type == 'member_statement').group_by(Report.member_id)),
+        ('reports page', db.select(Report.id, Report.title)
+            .order_by(Report.generated_date.desc(), Report.id.desc()).limit(51)),
+        ('latest sensor values', db.select(SensorLatest).where(SensorLatest.device_id.in_([1, 2]))),
+        ('sensor rollup history', db.select(SensorRollup.bucket_start, SensorRollup.total).where(
+            SensorRollup.device_id == 1, SensorRollup.metric == 'x', SensorRollup.resolution == 60,
+            SensorRollup.bucket_start.between(month_ago, now)).order_by(SensorRollup.bucket_start)),
+        ('raw sensor history', db.select(SensorReading.recorded_at, SensorReading.value).where(
+            SensorReading.device_id == 1, SensorReading.day.between(1, 2), SensorReading.metric == 'x',
+            SensorReading.recorded_at.between(month_ago, now)).order_by(SensorReading.day, SensorReading.recorded_at)),
+        ('meetings attended by member', db.select(Meeting.id, Meeting.title, Meeting.date)
+            .join(MeetingAttendance, MeetingAttendance.meeting_id == Meeting.id)
+            .where(MeetingAttendance.member_id == 1).order_by(Meeting.date.desc(), Meeting.id.desc()).limit(51)),
+        ('meeting attendees', db.select(db.func.count()).select_from(MeetingAttendance).where(MeetingAttendance.meeting_id == 1)),
+        ('members joined by', db.select(db.func.count(Member.id)).where(Member.join_date <= now)),
+        ('meetings since joining', db.select(db.func.count(Meeting.id)).where(Meeting.date <= now, Meeting.date >= month_ago)),
+        ('meetings page', db.select(Meeting).order_by(Meeting.date.desc(), Meeting.id.desc()).limit(51)),
+        ('recent contributions by category', db.select(Contribution.category, db.func.sum(Contribution.amount))
+            .where(Contribution.date >= month_ago).group_by(Contribution.category, db.func.date(Contribution.date))),
+        ('loans past due', db.select(Loan).where(Loan.status == 'Approved', Loan.days_past_due > 0)
+            .order_by(Loan.days_past_due.desc()).limit(50)),
+        ('loan schedule', db.select(LoanInstallment).where(LoanInstallment.loan_id == 1).order_by(LoanInstallment.number)),
+        ('loan repayments', db.select(LoanRepayment).where(LoanRepayment.loan_id == 1).order_by(LoanRepayment.paid_at.desc())),
+        ('loan status history', db.select(LoanStatusChange).where(LoanStatusChange.loan_id == 1)
+            .order_by(LoanStatusChange.changed_at)),
+        ('portfolio snapshot', db.select(LoanPortfolioSnapshot).where(LoanPortfolioSnapshot.as_of >= month_ago.date())),
+        ('expense rollups by month', db.select(ExpenseRollup).where(ExpenseRollup.month >= month_ago.date())
+            .order_by(ExpenseRollup.month.desc(), ExpenseRollup.category)),
+        ('pending expenses', db.select(db.func.count(Expense.id)).where(Expense.status == 'Pending')),
+        ('investment valuations', db.select(InvestmentValuation.investment_id, InvestmentValuation.valued_at)
+            .where(InvestmentValuation.investment_id.in_(db.select(Investment.id).where(Investment.status == 'Active')))
+            .order_by(InvestmentValuation.investment_id, InvestmentValuation.valued_at, InvestmentValuation.id)),
+        ('investments page', db.select(Investment).order_by(Investment.purchase_date.desc(), Investment.id.desc()).limit(51)),
+        ('vr sessions page', db.select(VirtualReality)
+            .order_by(VirtualReality.start_time.desc(), VirtualReality.id.desc()).limit(51))
+    ]
+
+def explain_query_plan(statement):
+    compiled = statement.compile(dialect=db.engine.dialect, compile_kwargs={'render_postcompile': True})
+    params = tuple(compiled.params[name] for name in compiled.positiontup or ())
+    connection = db.session.connection()
+    return [row[-1] for row in connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {compiled}', params)]
+
+def find_plan_scans():
+    """(query name, plan line) for every hot query step that scans a table without an index."""
+    scans = []
+    for name, statement in hot_queries():
+        for step in explain_query_plan(statement):
+            if step.startswith('SCAN') and 'INDEX' not in step:
+                scans.append((name, step))
+    return scans
+
+@app.cli.command('check-query-plans')
+def check_query_plans_command():
+    """Fail if any hot query's SQLite plan regresses to a full table scan."""
+    if db.engine.dialect.name != 'sqlite':
+        click.echo('Query plan checks only run against SQLite.')
+        return
+    
+    scans = find_plan_scans()
+    for name, step in scans:
+        click.echo(f'{name}: {step}')
+    click.echo(f'Checked {len(hot_queries())} hot queries: {len(scans)} full scan(s).')
+    if scans:
+        raise SystemExit(1)
+
 # Create database tables and add sample data
-with app.app_context():
+def missing_columns():
+    """(table, column) pairs the models have but the database lacks, i.e. migrations not applied yet."""
+    inspector = db.inspect(db.engine)
+    existing_tables = set(inspector.get_table_names())
+    missing = []
+    for table in db.metadata.sorted_tables:
+        if table.name in existing_tables:
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            missing.extend((table.name, column.name) for column in table.columns if column.name not in existing)
+    return missing
+
+def initialize_database():
     db.create_all()
+    # Querying the models would fail until `flask db upgrade` adds the new
+    # columns, and that command imports this module too
+    pending = missing_columns()
+    if pending:
+        app.logger.warning('Database is missing %s; run `flask db upgrade`. Skipped seeding and backfills.',
+                           ', '.join(f'{table}.{column}' for table, column in pending))
+        return
+    ensure_search_index()
     
     if not User.query.filter_by(is_admin=True).first():
         admin_user = User(username='admin', password=generate_password_hash('admin'), is_admin=True)
@@ -1367,7 +4774,33 @@ with app.app_context():
         )
         
         db.session.add_all([member1, member2, activity1, activity2, investment1, investment2, goal1, goal2, smart_contract1, iot_device1])
+        db.session.flush()
+        for investment in (investment1, investment2):
+            db.session.add(InvestmentValuation(investment_id=investment.id, valued_at=investment.purchase_date,
+                                               value=investment.amount_invested, note='Purchase'))
+            db.session.add(InvestmentValuation(investment_id=investment.id, value=investment.current_value))
         db.session.commit()
+    
+    # Anchor the ledger head on the existing chain before the first append
+    if not db.session.get(LedgerHead, 1):
+        lock_ledger_head()
+        db.session.commit()
+    
+    # Backfill the balance projection for databases created before it existed
+    if not MemberBalance.query.first() and (Contribution.query.first() or Loan.query.first()):
+        rebuild_member_balances()
+    
+    # Likewise the expense rollups
+    if not ExpenseRollup.query.first() and Expense.query.filter_by(status='Approved').first():
+        rebuild_expense_rollups()
+    
+    # And schedules and positions for loans approved before servicing existed
+    if not LoanInstallment.query.first() and Loan.query.filter_by(status='Approved').first():
+        service_loans()
+        db.session.commit()
+
+with app.app_context():
+    initialize_database()
 
 # API Routes for Mobile
 @app.route('/api/login', methods=['POST'])
@@ -1386,7 +4819,7 @@ def api_dashboard():
     # Simple dashboard data for mobile
     stats = {
         'total_members': Member.query.count(),
-        'total_contributions': sum(c.amount for c in Contribution.query.all()),
+        'total_contributions': db.session.query(db.func.coalesce(db.func.sum(MemberBalance.contribution_total), 0)).scalar(),
         'pending_loans': Loan.query.filter_by(status='Pending').count(),
         'upcoming_activities': Activity.query.filter(Activity.date >= datetime.utcnow()).count()
     }
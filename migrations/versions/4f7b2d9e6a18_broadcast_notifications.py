@@ -0,0 +1,51 @@
+"""broadcast notifications
+
+A broadcast to every member is stored once in `broadcast`, and each user's
+read and cleared position is kept in `broadcast_marker`.
+
+Revision ID: 4f7b2d9e6a18
+Revises: c3a9e15b7d40
+Create Date: 2026-10-17 12:14:52.806344
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4f7b2d9e6a18'
+down_revision = 'c3a9e15b7d40'
+branch_labels = None
+depends_on = None
+
+
+def has_table(name):
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def upgrade():
+    if not has_table('broadcast'):
+        op.create_table('broadcast',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('title', sa.String(length=100), nullable=False),
+        sa.Column('message', sa.Text(), nullable=False),
+        sa.Column('date', sa.DateTime(), nullable=True),
+        sa.Column('created_by', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['created_by'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+    if not has_table('broadcast_marker'):
+        op.create_table('broadcast_marker',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('read_through_id', sa.Integer(), nullable=False),
+        sa.Column('cleared_through_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('user_id')
+        )
+
+
+def downgrade():
+    if has_table('broadcast_marker'):
+        op.drop_table('broadcast_marker')
+    if has_table('broadcast'):
+        op.drop_table('broadcast')
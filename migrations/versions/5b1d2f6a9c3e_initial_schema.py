@@ -0,0 +1,441 @@
+"""initial schema
+
+Creates every table the app defines, skipping tables that already exist, so
+databases built by db.create_all() before migrations existed can be brought
+under Alembic with a plain `flask db upgrade`.
+
+Revision ID: 5b1d2f6a9c3e
+Revises: 
+Create Date: 2026-10-17 09:12:44.118203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b1d2f6a9c3e'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def has_table(name):
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def has_column(table, column):
+    return column in {c['name'] for c in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def upgrade():
+    if not has_table('ai_insight'):
+        op.create_table('ai_insight',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('insight_type', sa.String(length=50), nullable=False),
+        sa.Column('title', sa.String(length=200), nullable=False),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('confidence_score', sa.Float(), nullable=True),
+        sa.Column('data_points', sa.Text(), nullable=True),
+        sa.Column('generated_date', sa.DateTime(), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=True),
+        sa.Column('priority', sa.String(length=20), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+    if not has_table('financial_rollup'):
+        op.create_table('financial_rollup',
+        sa.Column('month', sa.Date(), nullable=False),
+        sa.Column('contributions_total', sa.Float(), nullable=True),
+        sa.Column('contributions_count', sa.Integer(), nullable=True),
+        sa.Column('loans_total', sa.Float(), nullable=True),
+        sa.Column('loans_count', sa.Integer(), nullable=True),
+        sa.Column('expenses_total', sa.Float(), nullable=True),
+        sa.Column('expenses_count', sa.Integer(), nullable=True),
+        sa.Column('computed_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('month')
+        )
+    if not has_table('io_t_device'):
+        op.create_table('io_t_device',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('device_name', sa.String(length=100), nullable=False),
+        sa.Column('device_type', sa.String(length=50), nullable=False),
+        sa.Column('device_id', sa.String(length=100), nullable=False),
+        sa.Column('location', sa.String(length=200), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=True),
+        sa.Column('last_ping', sa.DateTime(), nullable=True),
+        sa.Column('data', sa.Text(), nullable=True),
+        sa.Column('battery_level', sa.Integer(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('device_id')
+        )
+    if not has_table('ledger_checkpoint'):
+        op.create_table('ledger_checkpoint',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('block_id', sa.Integer(), nullable=False),
+        sa.Column('block_hash', sa.String(length=64), nullable=False),
+        sa.Column('blocks_verified', sa.Integer(), nullable=True),
+        sa.Column('verified_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+    if not has_table('ledger_head'):
+        op.create_table('ledger_head',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('last_block_id', sa.Integer(), nullable=True),
+        sa.Column('last_hash', sa.String(length=64), nullable=False),
+        sa.Column('block_count', sa.Integer(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+    if not has_table('ledger_merkle_root'):
+        op.create_table('ledger_merkle_root',
+        sa.Column('segment', sa.Integer(), nullable=False),
+        sa.Column('first_block_id', sa.Integer(), nullable=False),
+        sa.Column('last_block_id', sa.Integer(), nullable=False),
+        sa.Column('block_count', sa.Integer(), nullable=False),
+        sa.Column('root', sa.String(length=64), nullable=False),
+        sa.Column('sealed_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('segment')
+        )
+    if not has_table('report_run'):
+        op.create_table('report_run',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('report_type', sa.String(length=50), nullable=True),
+        sa.Column('period_start', sa.DateTime(), nullable=True),
+        sa.Column('period_end', sa.DateTime(), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=True),
+        sa.Column('total_members', sa.Integer(), nullable=True),
+        sa.Column('skipped_members', sa.Integer(), nullable=True),
+        sa.Column('shard_count', sa.Integer(), nullable=True),
+        sa.Column('completed_shards', sa.Integer(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+    if not has_table('user'):
+        op.create_table('user',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('username', sa.String(length=80), nullable=False),
+        sa.Column('password', sa.String(length=200), nullable=False),
+        sa.Column('is_admin', sa.Boolean(), nullable=True),
+        sa.Column('last_seen', sa.DateTime(), nullable=True),
+        sa.Column('is_online', sa.Boolean(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('username')
+        )
+    if not has_table('virtual_reality'):
+        op.create_table('virtual_reality',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('session_name', sa.String(length=100), nullable=False),
+        sa.Column('session_type', sa.String(length=50), nullable=False),
+        sa.Column('vr_room_id', sa.String(length=100), nullable=True),
+        sa.Column('participants', sa.Text(), nullable=True),
+        sa.Column('start_time', sa.DateTime(), nullable=False),
+        sa.Column('end_time', sa.DateTime(), nullable=True),
+        sa.Column('recording_url', sa.String(length=300), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('vr_room_id')
+        )
+    if not has_table('activity'):
+        op.create_table('activity',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('title', sa.String(length=100), nullable=False),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('date', sa.DateTime(), nullable=False),
+        sa.Column('type', sa.String(length=50), nullable=True),
+        sa.Column('created_by', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['created_by'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+    if not has_table('biometric'):
+        op.create_table('biometric',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('biometric_type', sa.String(length=20), nullable=False),
+        sa.Column('biometric_hash', sa.String(length=256), nullable=False),
+        sa.Column('created_date', sa.DateTime(), nullable=True),
+        sa.Column('last_used', sa.DateTime(), nullable=True),
+        sa.Column('is_active', sa.Boolean(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+    if not has_table('discussion'):
+        op.create_table('discussion',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('title', sa.String(length=100), nullable=False),
+        sa.Column('content', sa.Text(), nullable=False),
+        sa.Column('date', sa.DateTime(), nullable=True),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+    if not has_table('expense'):
+        op.create_table('expense',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('category', sa.String(length=50), nullable=False),
+        sa.Column('amount', sa.Float(), nullable=False),
+        sa.Column('description', sa.String(length=200), nullable=False),
+        sa.Column('date', sa.DateTime(), nullable=True),
+        sa.Column('receipt_url', sa.String(length=200), nullable=True),
+        sa.Column('approved_by', sa.Integer(), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=True),
+        sa.Column('created_by', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['approved_by'], ['user.id'], ),
+        sa.ForeignKeyConstraint(['created_by'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+    if not has_table('goal'):
+        op.create_table('goal',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('title', sa.String(length=100), nullable=False),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('target_amount', sa.Float(), nullable=False),
+        sa.Column('current_amount', sa.Float(), nullable=True),
+        sa.Column('target_date', sa.DateTime(), nullable=False),
+        sa.Column('category', sa.String(length=50), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=True),
+        sa.Column('created_by', sa.Integer(), nullable=True),
+        sa.Column('created_date', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['created_by'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+    if not has_table('investment'):
+        op.create_table('investment',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('type', sa.String(length=50), nullable=False),
+        sa.Column('amount_invested', sa.Float(), nullable=False),
+        sa.Column('current_value', sa.Float(), nullable=True),
+        sa.Column('purchase_date', sa.DateTime(), nullable=True),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=True),
+        sa.Column('created_by', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['created_by'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+    if not has_table('meeting'):
+        op.create_table('meeting',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('title', sa.String(length=100), nullable=False),
+        sa.Column('agenda', sa.Text(), nullable=True),
+        sa.Column('date', sa.DateTime(), nullable=False),
+        sa.Column('location', sa.String(length=200), nullable=True),
+        sa.Column('meeting_link', sa.String(length=300), nullable=True),
+        sa.Column('minutes', sa.Text(), nullable=True),
+        sa.Column('attendees', sa.Text(), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=True),
+        sa.Column('created_by', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['created_by'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+    if not has_table('member'):
+        op.create_table('member',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('phone', sa.String(length=20), nullable=False),
+        sa.Column('email', sa.String(length=100), nullable=True),
+        sa.Column('join_date', sa.DateTime(), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=True),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('phone')
+        )
+    if not has_table('notification'):
+        op.create_table('notification',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('title', sa.String(length=100), nullable=False),
+        sa.Column('message', sa.Text(), nullable=False),
+        sa.Column('date', sa.DateTime(), nullable=True),
+        sa.Column('is_read', sa.Boolean(), nullable=True),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+    if not has_table('report_shard'):
+        op.create_table('report_shard',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('run_id', sa.Integer(), nullable=False),
+        sa.Column('shard_index', sa.Integer(), nullable=False),
+        sa.Column('member_count', sa.Integer(), nullable=True),
+        sa.Column('reports_written', sa.Integer(), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.Column('duration_seconds', sa.Float(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.ForeignKeyConstraint(['run_id'], ['report_run.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+    if not has_table('smart_contract'):
+        op.create_table('smart_contract',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('contract_name', sa.String(length=100), nullable=False),
+        sa.Column('contract_type', sa.String(length=50), nullable=False),
+        sa.Column('conditions', sa.Text(), nullable=False),
+        sa.Column('parties', sa.Text(), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=True),
+        sa.Column('created_date', sa.DateTime(), nullable=True),
+        sa.Column('executed_date', sa.DateTime(), nullable=True),
+        sa.Column('amount', sa.Float(), nullable=True),
+        sa.Column('auto_execute', sa.Boolean(), nullable=True),
+        sa.Column('created_by', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['created_by'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+    if not has_table('blockchain'):
+        op.create_table('blockchain',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('block_hash', sa.String(length=64), nullable=False),
+        sa.Column('previous_hash', sa.String(length=64), nullable=True),
+        sa.Column('transaction_data', sa.Text(), nullable=False),
+        sa.Column('timestamp', sa.DateTime(), nullable=True),
+        sa.Column('nonce', sa.Integer(), nullable=True),
+        sa.Column('transaction_type', sa.String(length=50), nullable=True),
+        sa.Column('amount', sa.Float(), nullable=True),
+        sa.Column('member_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['member_id'], ['member.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('block_hash')
+        )
+    if not has_table('contribution'):
+        op.create_table('contribution',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('amount', sa.Float(), nullable=False),
+        sa.Column('date', sa.DateTime(), nullable=True),
+        sa.Column('member_id', sa.Integer(), nullable=True),
+        sa.Column('description', sa.String(length=200), nullable=True),
+        sa.ForeignKeyConstraint(['member_id'], ['member.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+    if not has_table('crypto_wallet'):
+        op.create_table('crypto_wallet',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('member_id', sa.Integer(), nullable=False),
+        sa.Column('wallet_address', sa.String(length=100), nullable=False),
+        sa.Column('private_key_hash', sa.String(length=256), nullable=False),
+        sa.Column('balance_btc', sa.Float(), nullable=True),
+        sa.Column('balance_eth', sa.Float(), nullable=True),
+        sa.Column('balance_usdt', sa.Float(), nullable=True),
+        sa.Column('created_date', sa.DateTime(), nullable=True),
+        sa.Column('is_active', sa.Boolean(), nullable=True),
+        sa.ForeignKeyConstraint(['member_id'], ['member.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('wallet_address')
+        )
+    if not has_table('loan'):
+        op.create_table('loan',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('amount', sa.Float(), nullable=False),
+        sa.Column('purpose', sa.String(length=200), nullable=True),
+        sa.Column('date_applied', sa.DateTime(), nullable=True),
+        sa.Column('due_date', sa.DateTime(), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=True),
+        sa.Column('member_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['member_id'], ['member.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+    if not has_table('member_balance'):
+        op.create_table('member_balance',
+        sa.Column('member_id', sa.Integer(), nullable=False),
+        sa.Column('contribution_total', sa.Float(), nullable=True),
+        sa.Column('contribution_count', sa.Integer(), nullable=True),
+        sa.Column('loan_total', sa.Float(), nullable=True),
+        sa.Column('loan_count', sa.Integer(), nullable=True),
+        sa.Column('outstanding_principal', sa.Float(), nullable=True),
+        sa.Column('pending_loans', sa.Integer(), nullable=True),
+        sa.Column('approved_loans', sa.Integer(), nullable=True),
+        sa.Column('rejected_loans', sa.Integer(), nullable=True),
+        sa.Column('repaid_loans', sa.Integer(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['member_id'], ['member.id'], ),
+        sa.PrimaryKeyConstraint('member_id')
+        )
+    if not has_table('message'):
+        op.create_table('message',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('content', sa.Text(), nullable=False),
+        sa.Column('timestamp', sa.DateTime(), nullable=True),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('discussion_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['discussion_id'], ['discussion.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+    if not has_table('report'):
+        op.create_table('report',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('title', sa.String(length=100), nullable=False),
+        sa.Column('type', sa.String(length=50), nullable=False),
+        sa.Column('content', sa.Text(), nullable=True),
+        sa.Column('file_path', sa.String(length=300), nullable=True),
+        sa.Column('generated_date', sa.DateTime(), nullable=True),
+        sa.Column('period_start', sa.DateTime(), nullable=True),
+        sa.Column('period_end', sa.DateTime(), nullable=True),
+        sa.Column('generated_by', sa.Integer(), nullable=True),
+        sa.Column('member_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['generated_by'], ['user.id'], ),
+        sa.ForeignKeyConstraint(['member_id'], ['member.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+    if not has_table('pending_payment'):
+        op.create_table('pending_payment',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('member_id', sa.Integer(), nullable=True),
+        sa.Column('phone', sa.String(length=20), nullable=False),
+        sa.Column('amount', sa.Float(), nullable=False),
+        sa.Column('description', sa.String(length=200), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=True),
+        sa.Column('checkout_request_id', sa.String(length=100), nullable=True),
+        sa.Column('merchant_request_id', sa.String(length=100), nullable=True),
+        sa.Column('result_code', sa.Integer(), nullable=True),
+        sa.Column('result_desc', sa.String(length=255), nullable=True),
+        sa.Column('receipt', sa.String(length=50), nullable=True),
+        sa.Column('paid_amount', sa.Float(), nullable=True),
+        sa.Column('contribution_id', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('submitted_at', sa.DateTime(), nullable=True),
+        sa.Column('completed_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['contribution_id'], ['contribution.id'], ),
+        sa.ForeignKeyConstraint(['member_id'], ['member.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('checkout_request_id'),
+        sa.UniqueConstraint('receipt')
+        )
+        op.create_index(op.f('ix_pending_payment_status'), 'pending_payment', ['status'], unique=False)
+    # Member statements started recording their member on an existing table
+    if not has_column('report', 'member_id'):
+        with op.batch_alter_table('report') as batch_op:
+            batch_op.add_column(sa.Column('member_id', sa.Integer(), nullable=True))
+            batch_op.create_foreign_key('fk_report_member_id', 'member', ['member_id'], ['id'])
+
+
+def downgrade():
+    op.drop_table('pending_payment')
+    op.drop_table('report')
+    op.drop_table('message')
+    op.drop_table('member_balance')
+    op.drop_table('loan')
+    op.drop_table('crypto_wallet')
+    op.drop_table('contribution')
+    op.drop_table('blockchain')
+    op.drop_table('smart_contract')
+    op.drop_table('report_shard')
+    op.drop_table('notification')
+    op.drop_table('member')
+    op.drop_table('meeting')
+    op.drop_table('investment')
+    op.drop_table('goal')
+    op.drop_table('expense')
+    op.drop_table('discussion')
+    op.drop_table('biometric')
+    op.drop_table('activity')
+    op.drop_table('virtual_reality')
+    op.drop_table('user')
+    op.drop_table('report_run')
+    op.drop_table('ledger_merkle_root')
+    op.drop_table('ledger_head')
+    op.drop_table('ledger_checkpoint')
+    op.drop_table('io_t_device')
+    op.drop_table('financial_rollup')
+    op.drop_table('ai_insight')
@@ -0,0 +1,45 @@
+"""insight runs
+
+Records each background AI insight run with a fingerprint of the data it was
+computed from, so the next run can be skipped when nothing has changed.
+
+Revision ID: 6c2e8a4d1f93
+Revises: d81f4b6c2e95
+Create Date: 2026-10-17 14:21:06.517392
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6c2e8a4d1f93'
+down_revision = 'd81f4b6c2e95'
+branch_labels = None
+depends_on = None
+
+
+def has_table(name):
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def upgrade():
+    if not has_table('insight_run'):
+        op.create_table('insight_run',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('source_state', sa.String(length=255), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=True),
+        sa.Column('insights_generated', sa.Integer(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.Column('duration_seconds', sa.Float(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('insight_run', schema=None) as batch_op:
+            batch_op.create_index('ix_insight_run_status', ['status', 'id'], unique=False)
+
+
+def downgrade():
+    if has_table('insight_run'):
+        op.drop_table('insight_run')
@@ -0,0 +1,68 @@
+"""sensor time series
+
+Adds the sensor_reading table, keyed by device, day, metric and time so a
+device's readings for a day are stored together, with minute/hour rollups
+in sensor_rollup and the newest value per metric in sensor_latest. On SQLite
+the tables are created WITHOUT ROWID so rows are clustered by primary key.
+
+Revision ID: 7d3f9b2e5a40
+Revises: e4a8c2f6b019
+Create Date: 2026-10-17 16:40:22.318054
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7d3f9b2e5a40'
+down_revision = 'e4a8c2f6b019'
+branch_labels = None
+depends_on = None
+
+
+def has_table(name):
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def upgrade():
+    if not has_table('sensor_reading'):
+        op.create_table('sensor_reading',
+            sa.Column('device_id', sa.Integer(), nullable=False),
+            sa.Column('day', sa.Integer(), nullable=False),
+            sa.Column('metric', sa.String(length=50), nullable=False),
+            sa.Column('recorded_at', sa.DateTime(), nullable=False),
+            sa.Column('value', sa.Float(), nullable=False),
+            sa.ForeignKeyConstraint(['device_id'], ['io_t_device.id'], ),
+            sa.PrimaryKeyConstraint('device_id', 'day', 'metric', 'recorded_at'),
+            sqlite_with_rowid=False
+        )
+    if not has_table('sensor_rollup'):
+        op.create_table('sensor_rollup',
+            sa.Column('device_id', sa.Integer(), nullable=False),
+            sa.Column('metric', sa.String(length=50), nullable=False),
+            sa.Column('resolution', sa.Integer(), nullable=False),
+            sa.Column('bucket_start', sa.DateTime(), nullable=False),
+            sa.Column('count', sa.Integer(), nullable=False),
+            sa.Column('total', sa.Float(), nullable=False),
+            sa.Column('minimum', sa.Float(), nullable=False),
+            sa.Column('maximum', sa.Float(), nullable=False),
+            sa.ForeignKeyConstraint(['device_id'], ['io_t_device.id'], ),
+            sa.PrimaryKeyConstraint('device_id', 'metric', 'resolution', 'bucket_start'),
+            sqlite_with_rowid=False
+        )
+    if not has_table('sensor_latest'):
+        op.create_table('sensor_latest',
+            sa.Column('device_id', sa.Integer(), nullable=False),
+            sa.Column('metric', sa.String(length=50), nullable=False),
+            sa.Column('recorded_at', sa.DateTime(), nullable=False),
+            sa.Column('value', sa.Float(), nullable=False),
+            sa.ForeignKeyConstraint(['device_id'], ['io_t_device.id'], ),
+            sa.PrimaryKeyConstraint('device_id', 'metric')
+        )
+
+
+def downgrade():
+    for table in ('sensor_latest', 'sensor_rollup', 'sensor_reading'):
+        if has_table(table):
+            op.drop_table(table)
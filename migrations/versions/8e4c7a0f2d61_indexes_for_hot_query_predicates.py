@@ -0,0 +1,61 @@
+"""indexes for hot query predicates
+
+Composite indexes shaped after the dashboard, list, report and contract
+queries in fixed_app.py. `flask check-query-plans` fails if any of those
+queries stops using them.
+
+Revision ID: 8e4c7a0f2d61
+Revises: 5b1d2f6a9c3e
+Create Date: 2026-10-17 09:31:05.402117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e4c7a0f2d61'
+down_revision = '5b1d2f6a9c3e'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('ix_ai_insight_status_generated', 'ai_insight', ['status', 'generated_date']),
+    ('ix_ai_insight_title_generated', 'ai_insight', ['title', 'generated_date']),
+    ('ix_virtual_reality_start_time', 'virtual_reality', ['start_time']),
+    ('ix_activity_date', 'activity', ['date']),
+    ('ix_discussion_date', 'discussion', ['date']),
+    ('ix_expense_created_by_date', 'expense', ['created_by', 'date']),
+    ('ix_expense_date', 'expense', ['date']),
+    ('ix_expense_status_date', 'expense', ['status', 'date']),
+    ('ix_investment_purchase_date', 'investment', ['purchase_date']),
+    ('ix_meeting_date', 'meeting', ['date']),
+    ('ix_member_user_id', 'member', ['user_id']),
+    ('ix_notification_user_date', 'notification', ['user_id', 'date']),
+    ('ix_notification_user_read', 'notification', ['user_id', 'is_read']),
+    ('ix_contribution_date', 'contribution', ['date']),
+    ('ix_contribution_member_date', 'contribution', ['member_id', 'date']),
+    ('ix_loan_date_applied', 'loan', ['date_applied']),
+    ('ix_loan_member_date_applied', 'loan', ['member_id', 'date_applied']),
+    ('ix_loan_status_member', 'loan', ['status', 'member_id']),
+    ('ix_message_discussion_timestamp', 'message', ['discussion_id', 'timestamp']),
+    ('ix_report_generated_date', 'report', ['generated_date']),
+    ('ix_report_type_member_generated', 'report', ['type', 'member_id', 'generated_date']),
+]
+
+
+def existing_indexes(table):
+    return {index['name'] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        if name not in existing_indexes(table):
+            op.create_index(name, table, columns, unique=False)
+
+
+def downgrade():
+    for name, table, columns in reversed(INDEXES):
+        if name in existing_indexes(table):
+            op.drop_index(name, table_name=table)
@@ -0,0 +1,33 @@
+"""message feed index
+
+Serves the since-cursor message feed and its SSE backlog, which read a
+discussion's messages in id order after a given id.
+
+Revision ID: 9a0c6e3f1b57
+Revises: 4f7b2d9e6a18
+Create Date: 2026-10-17 13:05:18.240917
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a0c6e3f1b57'
+down_revision = '4f7b2d9e6a18'
+branch_labels = None
+depends_on = None
+
+
+def existing_indexes(table):
+    return {index['name'] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade():
+    if 'ix_message_discussion_id' not in existing_indexes('message'):
+        op.create_index('ix_message_discussion_id', 'message', ['discussion_id', 'id'], unique=False)
+
+
+def downgrade():
+    if 'ix_message_discussion_id' in existing_indexes('message'):
+        op.drop_index('ix_message_discussion_id', table_name='message')
@@ -0,0 +1,80 @@
+"""investment valuations
+
+Adds the investment_valuation history. Each existing investment gets a
+valuation of its amount invested at its purchase date and, when its current
+value differs, one of the current value at migration time, so returns over
+time start from what is known.
+
+Revision ID: a2c6e8f0d347
+Revises: 7d3f9b2e5a40
+Create Date: 2026-10-17 17:21:05.412870
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a2c6e8f0d347'
+down_revision = '7d3f9b2e5a40'
+branch_labels = None
+depends_on = None
+
+
+def has_table(name):
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def existing_indexes(table):
+    return {index['name'] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade():
+    if not has_table('investment_valuation'):
+        op.create_table('investment_valuation',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('investment_id', sa.Integer(), nullable=False),
+        sa.Column('valued_at', sa.DateTime(), nullable=False),
+        sa.Column('value', sa.BigInteger(), nullable=False),
+        sa.Column('note', sa.String(length=200), nullable=True),
+        sa.Column('recorded_by', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['investment_id'], ['investment.id'], ),
+        sa.ForeignKeyConstraint(['recorded_by'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+    if 'ix_investment_valuation_investment' not in existing_indexes('investment_valuation'):
+        op.create_index('ix_investment_valuation_investment', 'investment_valuation', ['investment_id', 'valued_at'], unique=False)
+    if 'ix_investment_status' not in existing_indexes('investment'):
+        op.create_index('ix_investment_status', 'investment', ['status', 'type'], unique=False)
+
+    # Investments without any valuation yet, including ones in a table db.create_all() just made
+    investment = sa.table('investment',
+        sa.column('id', sa.Integer), sa.column('purchase_date', sa.DateTime),
+        sa.column('amount_invested', sa.BigInteger), sa.column('current_value', sa.BigInteger)
+    )
+    valuation = sa.table('investment_valuation',
+        sa.column('investment_id', sa.Integer), sa.column('valued_at', sa.DateTime),
+        sa.column('value', sa.BigInteger), sa.column('note', sa.String)
+    )
+    connection = op.get_bind()
+    rows = connection.execute(sa.select(
+        investment.c.id, investment.c.purchase_date, investment.c.amount_invested, investment.c.current_value
+    ).where(~sa.exists().where(valuation.c.investment_id == investment.c.id))).all()
+    now = datetime.utcnow()
+    valuations = []
+    for investment_id, purchase_date, invested, current in rows:
+        purchase_date = purchase_date or now
+        valuations.append({'investment_id': investment_id, 'valued_at': purchase_date, 'value': invested or 0, 'note': 'Purchase'})
+        if current is not None and current != invested:
+            valuations.append({'investment_id': investment_id, 'valued_at': max(now, purchase_date), 'value': current, 'note': None})
+    if valuations:
+        connection.execute(valuation.insert(), valuations)
+
+def downgrade():
+    if 'ix_investment_status' in existing_indexes('investment'):
+        op.drop_index('ix_investment_status', table_name='investment')
+    if has_table('investment_valuation'):
+        op.drop_index('ix_investment_valuation_investment', table_name='investment_valuation')
+        op.drop_table('investment_valuation')
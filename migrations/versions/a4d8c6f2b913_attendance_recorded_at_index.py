@@ -0,0 +1,34 @@
+"""attendance recorded_at index
+
+Indexes meeting_attendance.recorded_at, so the attendance part of the member
+data version that cached default-risk scores and insights are keyed on is an
+index-only read.
+
+Revision ID: a4d8c6f2b913
+Revises: e6c2a8f4d107
+Create Date: 2026-10-17 22:20:31.904517
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4d8c6f2b913'
+down_revision = 'e6c2a8f4d107'
+branch_labels = None
+depends_on = None
+
+
+def existing_indexes(table):
+    return {index['name'] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade():
+    if 'ix_meeting_attendance_recorded_at' not in existing_indexes('meeting_attendance'):
+        op.create_index('ix_meeting_attendance_recorded_at', 'meeting_attendance', ['recorded_at'], unique=False)
+
+
+def downgrade():
+    if 'ix_meeting_attendance_recorded_at' in existing_indexes('meeting_attendance'):
+        op.drop_index('ix_meeting_attendance_recorded_at', table_name='meeting_attendance')
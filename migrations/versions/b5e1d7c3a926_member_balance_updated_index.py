@@ -0,0 +1,33 @@
+"""member balance updated index
+
+Lets the member data version read MAX(member_balance.updated_at) from an
+index instead of scanning every balance row.
+
+Revision ID: b5e1d7c3a926
+Revises: 6c2e8a4d1f93
+Create Date: 2026-10-17 15:02:44.180275
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5e1d7c3a926'
+down_revision = '6c2e8a4d1f93'
+branch_labels = None
+depends_on = None
+
+
+def existing_indexes(table):
+    return {index['name'] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade():
+    if 'ix_member_balance_updated_at' not in existing_indexes('member_balance'):
+        op.create_index('ix_member_balance_updated_at', 'member_balance', ['updated_at'], unique=False)
+
+
+def downgrade():
+    if 'ix_member_balance_updated_at' in existing_indexes('member_balance'):
+        op.drop_index('ix_member_balance_updated_at', table_name='member_balance')
@@ -0,0 +1,69 @@
+"""expense rollups
+
+Adds expense_rollup, the approved expense total and count per month and
+category that reports and the admin dashboard read instead of scanning
+expenses. It is filled from the approved expenses already recorded.
+
+Revision ID: b5e9d1c7f284
+Revises: f1b7d3a95c62
+Create Date: 2026-10-17 18:46:13.508921
+
+"""
+from datetime import date, datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5e9d1c7f284'
+down_revision = 'f1b7d3a95c62'
+branch_labels = None
+depends_on = None
+
+
+def has_table(name):
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def upgrade():
+    if not has_table('expense_rollup'):
+        op.create_table('expense_rollup',
+        sa.Column('month', sa.Date(), nullable=False),
+        sa.Column('category', sa.String(length=50), nullable=False),
+        sa.Column('total', sa.BigInteger(), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('month', 'category')
+        )
+
+    # Fill the rollups unless they are already populated, including when db.create_all() just made the table
+    rollup = sa.table('expense_rollup',
+        sa.column('month', sa.Date), sa.column('category', sa.String),
+        sa.column('total', sa.BigInteger), sa.column('count', sa.Integer), sa.column('updated_at', sa.DateTime)
+    )
+    expense = sa.table('expense',
+        sa.column('category', sa.String), sa.column('amount', sa.BigInteger),
+        sa.column('date', sa.DateTime), sa.column('status', sa.String)
+    )
+    connection = op.get_bind()
+    if connection.execute(sa.select(rollup.c.month).limit(1)).first():
+        return
+    totals = {}
+    for category, amount, expense_date in connection.execute(sa.select(
+        expense.c.category, expense.c.amount, expense.c.date
+    ).where(expense.c.status == 'Approved', expense.c.date.isnot(None))):
+        key = (date(expense_date.year, expense_date.month, 1), category)
+        total, count = totals.get(key, (0, 0))
+        totals[key] = (total + (amount or 0), count + 1)
+    now = datetime.utcnow()
+    if totals:
+        connection.execute(rollup.insert(), [
+            {'month': month, 'category': category, 'total': total, 'count': count, 'updated_at': now}
+            for (month, category), (total, count) in totals.items()
+        ])
+
+
+def downgrade():
+    if has_table('expense_rollup'):
+        op.drop_table('expense_rollup')
@@ -0,0 +1,36 @@
+"""drop user.is_online
+
+Presence lives in the presence store (utils/presence.py) and User.last_seen
+is flushed from it in batches, so the per-user is_online flag is no longer
+written or read.
+
+Revision ID: b7e1d3f5a928
+Revises: a4d8c6f2b913
+Create Date: 2026-10-17 23:05:14.220861
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e1d3f5a928'
+down_revision = 'a4d8c6f2b913'
+branch_labels = None
+depends_on = None
+
+
+def existing_columns(table):
+    return {column['name'] for column in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def upgrade():
+    if 'is_online' in existing_columns('user'):
+        with op.batch_alter_table('user', schema=None) as batch_op:
+            batch_op.drop_column('is_online')
+
+
+def downgrade():
+    if 'is_online' not in existing_columns('user'):
+        with op.batch_alter_table('user', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('is_online', sa.Boolean(), nullable=True))
@@ -0,0 +1,127 @@
+"""loan servicing
+
+Adds interest, term, schedule and servicing position columns to loan, the
+loan_installment schedule, loan_repayment, the loan_status_change history
+and daily loan_portfolio_snapshot rows. Existing loans get the default 10%
+rate; schedules for loans already approved are generated by the first
+`flask service-loans` run (or at startup), which needs NumPy.
+
+Revision ID: c3a7e5d9b816
+Revises: b5e9d1c7f284
+Create Date: 2026-10-17 19:37:52.104386
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3a7e5d9b816'
+down_revision = 'b5e9d1c7f284'
+branch_labels = None
+depends_on = None
+
+
+LOAN_COLUMNS = [
+    sa.Column('interest_rate', sa.Float(), nullable=True),
+    sa.Column('term_months', sa.Integer(), nullable=True),
+    sa.Column('status_changed_at', sa.DateTime(), nullable=True),
+    sa.Column('disbursed_at', sa.DateTime(), nullable=True),
+    sa.Column('total_payable', sa.BigInteger(), nullable=True),
+    sa.Column('amount_repaid', sa.BigInteger(), nullable=True),
+    sa.Column('outstanding_balance', sa.BigInteger(), nullable=True),
+    sa.Column('arrears', sa.BigInteger(), nullable=True),
+    sa.Column('days_past_due', sa.Integer(), nullable=True),
+    sa.Column('next_due_date', sa.Date(), nullable=True),
+    sa.Column('serviced_at', sa.DateTime(), nullable=True),
+]
+
+
+def has_table(name):
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def existing_columns(table):
+    return {column['name'] for column in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def existing_indexes(table):
+    return {index['name'] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade():
+    missing = [column for column in LOAN_COLUMNS if column.name not in existing_columns('loan')]
+    if missing:
+        with op.batch_alter_table('loan', schema=None) as batch_op:
+            for column in missing:
+                batch_op.add_column(column)
+    op.execute('UPDATE loan SET interest_rate = 10.0 WHERE interest_rate IS NULL')
+    op.execute('UPDATE loan SET amount_repaid = 0 WHERE amount_repaid IS NULL')
+    op.execute('UPDATE loan SET arrears = 0 WHERE arrears IS NULL')
+    op.execute('UPDATE loan SET days_past_due = 0 WHERE days_past_due IS NULL')
+    if 'ix_loan_status_days_past_due' not in existing_indexes('loan'):
+        op.create_index('ix_loan_status_days_past_due', 'loan', ['status', 'days_past_due'], unique=False)
+
+    if not has_table('loan_installment'):
+        op.create_table('loan_installment',
+        sa.Column('loan_id', sa.Integer(), nullable=False),
+        sa.Column('number', sa.Integer(), nullable=False),
+        sa.Column('due_date', sa.Date(), nullable=False),
+        sa.Column('principal', sa.BigInteger(), nullable=False),
+        sa.Column('interest', sa.BigInteger(), nullable=False),
+        sa.ForeignKeyConstraint(['loan_id'], ['loan.id'], ),
+        sa.PrimaryKeyConstraint('loan_id', 'number')
+        )
+    if not has_table('loan_repayment'):
+        op.create_table('loan_repayment',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('loan_id', sa.Integer(), nullable=False),
+        sa.Column('amount', sa.BigInteger(), nullable=False),
+        sa.Column('paid_at', sa.DateTime(), nullable=True),
+        sa.Column('reference', sa.String(length=50), nullable=True),
+        sa.Column('recorded_by', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['loan_id'], ['loan.id'], ),
+        sa.ForeignKeyConstraint(['recorded_by'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+    if 'ix_loan_repayment_loan' not in existing_indexes('loan_repayment'):
+        op.create_index('ix_loan_repayment_loan', 'loan_repayment', ['loan_id', 'paid_at'], unique=False)
+    if not has_table('loan_status_change'):
+        op.create_table('loan_status_change',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('loan_id', sa.Integer(), nullable=False),
+        sa.Column('from_status', sa.String(length=20), nullable=True),
+        sa.Column('to_status', sa.String(length=20), nullable=False),
+        sa.Column('changed_at', sa.DateTime(), nullable=True),
+        sa.Column('changed_by', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['changed_by'], ['user.id'], ),
+        sa.ForeignKeyConstraint(['loan_id'], ['loan.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+    status_change_indexes = existing_indexes('loan_status_change')
+    if 'ix_loan_status_change_loan' not in status_change_indexes:
+        op.create_index('ix_loan_status_change_loan', 'loan_status_change', ['loan_id', 'changed_at'], unique=False)
+    if 'ix_loan_status_change_status' not in status_change_indexes:
+        op.create_index('ix_loan_status_change_status', 'loan_status_change', ['to_status', 'changed_at'], unique=False)
+    if not has_table('loan_portfolio_snapshot'):
+        op.create_table('loan_portfolio_snapshot',
+        sa.Column('as_of', sa.Date(), nullable=False),
+        sa.Column('bucket', sa.String(length=20), nullable=False),
+        sa.Column('loans', sa.Integer(), nullable=False),
+        sa.Column('outstanding', sa.BigInteger(), nullable=False),
+        sa.Column('arrears', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('as_of', 'bucket')
+        )
+
+
+def downgrade():
+    for table in ('loan_portfolio_snapshot', 'loan_status_change', 'loan_repayment', 'loan_installment'):
+        if has_table(table):
+            op.drop_table(table)
+    if 'ix_loan_status_days_past_due' in existing_indexes('loan'):
+        op.drop_index('ix_loan_status_days_past_due', table_name='loan')
+    present = [column.name for column in LOAN_COLUMNS if column.name in existing_columns('loan')]
+    if present:
+        with op.batch_alter_table('loan', schema=None) as batch_op:
+            for name in reversed(present):
+                batch_op.drop_column(name)
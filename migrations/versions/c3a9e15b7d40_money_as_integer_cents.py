@@ -0,0 +1,77 @@
+"""money as integer cents
+
+Converts every money column from a binary FLOAT of currency units to a
+BIGINT of cents, rounding half away from zero. Columns that are already
+integers (tables created by db.create_all() from the current models) are
+left alone.
+
+Revision ID: c3a9e15b7d40
+Revises: 8e4c7a0f2d61
+Create Date: 2026-10-17 11:02:37.590381
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3a9e15b7d40'
+down_revision = '8e4c7a0f2d61'
+branch_labels = None
+depends_on = None
+
+
+CENTS_PER_UNIT = 100
+
+MONEY_COLUMNS = {
+    'blockchain': ['amount'],
+    'contribution': ['amount'],
+    'expense': ['amount'],
+    'financial_rollup': ['contributions_total', 'loans_total', 'expenses_total'],
+    'goal': ['target_amount', 'current_amount'],
+    'investment': ['amount_invested', 'current_value'],
+    'loan': ['amount'],
+    'member_balance': ['contribution_total', 'loan_total', 'outstanding_principal'],
+    'pending_payment': ['amount', 'paid_amount'],
+    'smart_contract': ['amount'],
+}
+
+
+def columns_to_convert(table, to_integer):
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table(table):
+        return []
+    types = {column['name']: column['type'] for column in inspector.get_columns(table)}
+    return [
+        name for name in MONEY_COLUMNS[table]
+        if name in types and isinstance(types[name], sa.Integer) != to_integer
+    ]
+
+
+def upgrade():
+    for table in MONEY_COLUMNS:
+        columns = columns_to_convert(table, to_integer=True)
+        if not columns:
+            continue
+        op.execute(
+            f'UPDATE {table} SET '
+            + ', '.join(f'{column} = ROUND({column} * {CENTS_PER_UNIT})' for column in columns)
+        )
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            for column in columns:
+                batch_op.alter_column(column, existing_type=sa.Float(), type_=sa.BigInteger(),
+                                      postgresql_using=f'{column}::bigint')
+
+
+def downgrade():
+    for table in reversed(list(MONEY_COLUMNS)):
+        columns = columns_to_convert(table, to_integer=False)
+        if not columns:
+            continue
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            for column in columns:
+                batch_op.alter_column(column, existing_type=sa.BigInteger(), type_=sa.Float())
+        op.execute(
+            f'UPDATE {table} SET '
+            + ', '.join(f'{column} = {column} / {CENTS_PER_UNIT}.0' for column in columns)
+        )
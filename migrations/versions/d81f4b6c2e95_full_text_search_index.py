@@ -0,0 +1,75 @@
+"""full-text search index
+
+Creates the search index for the database in use and fills it from the
+existing rows: an FTS5 table on SQLite, or a table with a stored weighted
+tsvector and a GIN index on Postgres. The kind codes packed into FTS5 rowids
+follow SEARCH_KINDS in fixed_app.py.
+
+Revision ID: d81f4b6c2e95
+Revises: 9a0c6e3f1b57
+Create Date: 2026-10-17 14:21:40.671093
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd81f4b6c2e95'
+down_revision = '9a0c6e3f1b57'
+branch_labels = None
+depends_on = None
+
+
+KIND_SHIFT = 40
+
+# kind, code, source table, title expression, body expression
+SOURCES = [
+    ('discussion', 1, 'discussion', "coalesce(title, '')", "coalesce(content, '')"),
+    ('message', 2, 'message', "''", "coalesce(content, '')"),
+    ('member', 3, 'member', "coalesce(name, '')", "trim(coalesce(phone, '') || ' ' || coalesce(email, ''))"),
+    ('activity', 4, 'activity', "coalesce(title, '')", "coalesce(description, '')"),
+]
+
+
+def has_table(name):
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        if has_table('search_document'):
+            return
+        op.execute(
+            "CREATE TABLE search_document ("
+            "kind VARCHAR(20) NOT NULL, "
+            "ref_id INTEGER NOT NULL, "
+            "title TEXT NOT NULL DEFAULT '', "
+            "body TEXT NOT NULL DEFAULT '', "
+            "document TSVECTOR GENERATED ALWAYS AS "
+            "(setweight(to_tsvector('simple', title), 'A') || setweight(to_tsvector('simple', body), 'B')) STORED, "
+            "PRIMARY KEY (kind, ref_id))"
+        )
+        op.execute('CREATE INDEX ix_search_document_document ON search_document USING gin (document)')
+        for kind, _, table, title, body in SOURCES:
+            op.execute(
+                f"INSERT INTO search_document (kind, ref_id, title, body) "
+                f"SELECT '{kind}', id, {title}, {body} FROM {table}"
+            )
+    else:
+        if has_table('search_index'):
+            return
+        op.execute("CREATE VIRTUAL TABLE search_index USING fts5(title, body, tokenize='unicode61 remove_diacritics 2')")
+        for _, code, table, title, body in SOURCES:
+            op.execute(
+                f"INSERT INTO search_index (rowid, title, body) "
+                f"SELECT {code << KIND_SHIFT} + id, {title}, {body} FROM {table}"
+            )
+        op.execute("INSERT INTO search_index (search_index) VALUES ('optimize')")
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('DROP TABLE IF EXISTS search_document')
+    else:
+        op.execute('DROP TABLE IF EXISTS search_index')
@@ -0,0 +1,47 @@
+"""insight run claim
+
+Adds a unique index over InsightRun rows with status 'Running', so only one
+process at a time can claim an AI insight refresh. Runs still marked Running
+when the upgrade happens never finished and are marked Failed first.
+
+Revision ID: d9f3b7a1c5e2
+Revises: c3a7e5d9b816
+Create Date: 2026-10-17 21:12:40.318254
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd9f3b7a1c5e2'
+down_revision = 'c3a7e5d9b816'
+branch_labels = None
+depends_on = None
+
+
+RUNNING = sa.text("status = 'Running'")
+
+
+def existing_indexes():
+    return {index['name'] for index in sa.inspect(op.get_bind()).get_indexes('insight_run')}
+
+
+def upgrade():
+    if 'uq_insight_run_running' in existing_indexes():
+        return
+    insight_run = sa.table('insight_run',
+        sa.column('status', sa.String), sa.column('error', sa.Text), sa.column('finished_at', sa.DateTime)
+    )
+    op.get_bind().execute(insight_run.update().where(insight_run.c.status == 'Running').values(
+        status='Failed', error='Abandoned: interrupted by an upgrade', finished_at=datetime.utcnow()
+    ))
+    op.create_index('uq_insight_run_running', 'insight_run', ['status'], unique=True,
+                    sqlite_where=RUNNING, postgresql_where=RUNNING)
+
+
+def downgrade():
+    if 'uq_insight_run_running' in existing_indexes():
+        op.drop_index('uq_insight_run_running', table_name='insight_run')
@@ -0,0 +1,140 @@
+"""attendance association tables
+
+Replaces the JSON id lists in meeting.attendees, virtual_reality.participants
+and smart_contract.parties with indexed association tables. Existing lists are
+copied across, keeping only ids of members that still exist, and the text
+columns are dropped. Downgrade rebuilds the JSON lists from the tables.
+
+Revision ID: e4a8c2f6b019
+Revises: b5e1d7c3a926
+Create Date: 2026-10-17 15:48:13.904561
+
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4a8c2f6b019'
+down_revision = 'b5e1d7c3a926'
+branch_labels = None
+depends_on = None
+
+
+# (source table, JSON column, association table, association key column)
+ASSOCIATIONS = [
+    ('meeting', 'attendees', 'meeting_attendance', 'meeting_id'),
+    ('virtual_reality', 'participants', 'virtual_reality_participant', 'session_id'),
+    ('smart_contract', 'parties', 'contract_party', 'contract_id'),
+]
+
+
+def has_table(name):
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def has_column(table, column):
+    return column in {c['name'] for c in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def parse_member_ids(value):
+    try:
+        ids = json.loads(value)
+    except (TypeError, ValueError):
+        return []
+    if not isinstance(ids, list):
+        ids = [ids]
+    member_ids = []
+    for member_id in ids:
+        try:
+            member_ids.append(int(member_id))
+        except (TypeError, ValueError):
+            continue
+    return member_ids
+
+
+def create_tables():
+    if not has_table('meeting_attendance'):
+        op.create_table('meeting_attendance',
+        sa.Column('meeting_id', sa.Integer(), nullable=False),
+        sa.Column('member_id', sa.Integer(), nullable=False),
+        sa.Column('recorded_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['meeting_id'], ['meeting.id'], ),
+        sa.ForeignKeyConstraint(['member_id'], ['member.id'], ),
+        sa.PrimaryKeyConstraint('meeting_id', 'member_id')
+        )
+        with op.batch_alter_table('meeting_attendance', schema=None) as batch_op:
+            batch_op.create_index('ix_meeting_attendance_member', ['member_id', 'meeting_id'], unique=False)
+    if not has_table('virtual_reality_participant'):
+        op.create_table('virtual_reality_participant',
+        sa.Column('session_id', sa.Integer(), nullable=False),
+        sa.Column('member_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['member_id'], ['member.id'], ),
+        sa.ForeignKeyConstraint(['session_id'], ['virtual_reality.id'], ),
+        sa.PrimaryKeyConstraint('session_id', 'member_id')
+        )
+        with op.batch_alter_table('virtual_reality_participant', schema=None) as batch_op:
+            batch_op.create_index('ix_virtual_reality_participant_member', ['member_id', 'session_id'], unique=False)
+    if not has_table('contract_party'):
+        op.create_table('contract_party',
+        sa.Column('contract_id', sa.Integer(), nullable=False),
+        sa.Column('member_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['contract_id'], ['smart_contract.id'], ),
+        sa.ForeignKeyConstraint(['member_id'], ['member.id'], ),
+        sa.PrimaryKeyConstraint('contract_id', 'member_id')
+        )
+        with op.batch_alter_table('contract_party', schema=None) as batch_op:
+            batch_op.create_index('ix_contract_party_member', ['member_id', 'contract_id'], unique=False)
+
+
+def upgrade():
+    create_tables()
+    if 'ix_member_join_date' not in {index['name'] for index in sa.inspect(op.get_bind()).get_indexes('member')}:
+        op.create_index('ix_member_join_date', 'member', ['join_date'], unique=False)
+
+    connection = op.get_bind()
+    member_ids = {member_id for member_id, in connection.execute(sa.text('SELECT id FROM member'))}
+    for table, column, association, key in ASSOCIATIONS:
+        if not has_column(table, column):
+            continue
+        existing = set(connection.execute(sa.text(f'SELECT {key}, member_id FROM {association}')))
+        rows = connection.execute(sa.text(f'SELECT id, {column} FROM {table} WHERE {column} IS NOT NULL'))
+        pairs = {
+            (row_id, member_id)
+            for row_id, value in rows
+            for member_id in parse_member_ids(value)
+            if member_id in member_ids
+        } - existing
+        if pairs:
+            connection.execute(
+                sa.text(f'INSERT INTO {association} ({key}, member_id) VALUES (:row_id, :member_id)'),
+                [{'row_id': row_id, 'member_id': member_id} for row_id, member_id in sorted(pairs)]
+            )
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_column(column)
+
+
+def downgrade():
+    connection = op.get_bind()
+    for table, column, association, key in ASSOCIATIONS:
+        if not has_column(table, column):
+            with op.batch_alter_table(table, schema=None) as batch_op:
+                batch_op.add_column(sa.Column(column, sa.Text(), nullable=True))
+        if not has_table(association):
+            continue
+        member_ids = {}
+        for row_id, member_id in connection.execute(
+            sa.text(f'SELECT {key}, member_id FROM {association} ORDER BY {key}, member_id')
+        ):
+            member_ids.setdefault(row_id, []).append(member_id)
+        if member_ids:
+            connection.execute(
+                sa.text(f'UPDATE {table} SET {column} = :value WHERE id = :row_id'),
+                [{'row_id': row_id, 'value': json.dumps(ids)} for row_id, ids in member_ids.items()]
+            )
+        op.drop_table(association)
+
+    if 'ix_member_join_date' in {index['name'] for index in sa.inspect(op.get_bind()).get_indexes('member')}:
+        op.drop_index('ix_member_join_date', table_name='member')
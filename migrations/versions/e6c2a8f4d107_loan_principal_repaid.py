@@ -0,0 +1,38 @@
+"""loan principal repaid
+
+Adds loan.principal_repaid, the part of a loan's repayments that went to
+principal. MemberBalance.outstanding_principal is reduced by it. Existing
+loans start at zero; the next `flask service-loans` run fills it in and
+moves the member balances with it.
+
+Revision ID: e6c2a8f4d107
+Revises: d9f3b7a1c5e2
+Create Date: 2026-10-17 21:48:05.662190
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6c2a8f4d107'
+down_revision = 'd9f3b7a1c5e2'
+branch_labels = None
+depends_on = None
+
+
+def existing_columns(table):
+    return {column['name'] for column in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def upgrade():
+    if 'principal_repaid' not in existing_columns('loan'):
+        with op.batch_alter_table('loan', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('principal_repaid', sa.BigInteger(), nullable=True))
+    op.execute('UPDATE loan SET principal_repaid = 0 WHERE principal_repaid IS NULL')
+
+
+def downgrade():
+    if 'principal_repaid' in existing_columns('loan'):
+        with op.batch_alter_table('loan', schema=None) as batch_op:
+            batch_op.drop_column('principal_repaid')
@@ -0,0 +1,64 @@
+"""goal contribution links
+
+Adds an optional category to contributions and pending payments, and lets
+a goal take its progress from the contributions in a category and date range
+(progress_source = 'contributions'). Existing goals stay manual, so no
+amounts change.
+
+Revision ID: f1b7d3a95c62
+Revises: a2c6e8f0d347
+Create Date: 2026-10-17 18:02:49.227316
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1b7d3a95c62'
+down_revision = 'a2c6e8f0d347'
+branch_labels = None
+depends_on = None
+
+
+NEW_COLUMNS = {
+    'contribution': [sa.Column('category', sa.String(length=50), nullable=True)],
+    'pending_payment': [sa.Column('category', sa.String(length=50), nullable=True)],
+    'goal': [
+        sa.Column('progress_source', sa.String(length=20), nullable=True),
+        sa.Column('contribution_category', sa.String(length=50), nullable=True),
+        sa.Column('contributions_from', sa.DateTime(), nullable=True),
+        sa.Column('contributions_until', sa.DateTime(), nullable=True),
+    ],
+}
+
+
+def existing_columns(table):
+    return {column['name'] for column in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def existing_indexes(table):
+    return {index['name'] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade():
+    for table, columns in NEW_COLUMNS.items():
+        missing = [column for column in columns if column.name not in existing_columns(table)]
+        if missing:
+            with op.batch_alter_table(table, schema=None) as batch_op:
+                for column in missing:
+                    batch_op.add_column(column)
+    op.execute("UPDATE goal SET progress_source = 'manual' WHERE progress_source IS NULL")
+    if 'ix_contribution_category_date' not in existing_indexes('contribution'):
+        op.create_index('ix_contribution_category_date', 'contribution', ['category', 'date'], unique=False)
+
+
+def downgrade():
+    if 'ix_contribution_category_date' in existing_indexes('contribution'):
+        op.drop_index('ix_contribution_category_date', table_name='contribution')
+    for table, columns in reversed(list(NEW_COLUMNS.items())):
+        present = [column.name for column in columns if column.name in existing_columns(table)]
+        if present:
+            with op.batch_alter_table(table, schema=None) as batch_op:
+                for name in reversed(present):
+                    batch_op.drop_column(name)
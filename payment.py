@@ -1,43 +1,29 @@
-import requests
 from flask import current_app
+from utils.mpesa import MpesaClient
 
 class MpesaGateway:
     def __init__(self):
-        self.api_key = current_app.config['MPESA_API_KEY']
-        self.api_secret = current_app.config['MPESA_API_SECRET']
-        self.base_url = 'https://api.safaricom.co.ke'
+        # Reuse the app's pooled client so the token and connections are shared
+        self.client = current_app.extensions.get('mpesa')
+        if self.client is None:
+            config = current_app.config
+            self.client = current_app.extensions['mpesa'] = MpesaClient(
+                consumer_key=config['MPESA_API_KEY'],
+                consumer_secret=config['MPESA_API_SECRET'],
+                shortcode=config['MPESA_SHORTCODE'],
+                passkey=config['MPESA_PASSKEY'],
+                callback_url=f"{config['BASE_URL']}/mpesa_callback",
+                base_url=config.get('MPESA_BASE_URL', 'https://api.safaricom.co.ke')
+            )
         
     def stk_push(self, phone, amount, account_ref):
-        endpoint = f"{self.base_url}/mpesa/stkpush/v1/processrequest"
-        headers = {
-            'Authorization': f'Bearer {self.get_token()}',
-            'Content-Type': 'application/json'
-        }
-        payload = {
-            "BusinessShortCode": current_app.config['MPESA_SHORTCODE'],
-            "Password": self.generate_password(),
-            "Timestamp": self.get_timestamp(),
-            "TransactionType": "CustomerPayBillOnline",
-            "Amount": amount,
-            "PartyA": phone,
-            "PartyB": current_app.config['MPESA_SHORTCODE'],
-            "PhoneNumber": phone,
-            "CallBackURL": f"{current_app.config['BASE_URL']}/mpesa_callback",
-            "AccountReference": account_ref,
-            "TransactionDesc": "Chama Contribution" 
-        }
-        
-        response = requests.post(endpoint, json=payload, headers=headers)
-        return response.json()
+        return self.client.stk_push(phone, amount, account_ref)
     
     def get_token(self):
-        # Implementation to get OAuth token
-        pass
+        return self.client.token()
     
     def generate_password(self):
-        # Generate MPesa API password
-        pass
+        return self.client.password(self.get_timestamp())
     
     def get_timestamp(self):
-        # Generate current timestamp
-        pass
\ No newline at end of file
+        return self.client.timestamp()
\ No newline at end of file
@@ -1,20 +1,72 @@
-from app import celery, mail
-from flask_mail import Message
-from datetime import datetime
-from utils.reporting import generate_member_statement
+from celery import Celery, Task, chord
+from celery.schedules import crontab
+from flask_mail import Mail, Message
+import os
+from fixed_app import app as flask_app, db, Member, refresh_ai_insights, service_loans
+from tasks.reports import REPORT_FORMAT, REPORT_SHARD_SIZE, build_report_shard, finalize_report_run, run_monthly_reports
+
+class FlaskTask(Task):
+    """Runs every task inside the Flask app context, so models and db.session work in workers."""
+    
+    def __call__(self, *args, **kwargs):
+        with flask_app.app_context():
+            return self.run(*args, **kwargs)
+
+celery = Celery(flask_app.import_name, task_cls=FlaskTask)
+celery.conf.update(
+    broker_url=os.getenv('CELERY_BROKER_URL', 'redis://localhost:6379/0'),
+    result_backend=os.getenv('CELERY_RESULT_BACKEND', 'redis://localhost:6379/0'),
+    beat_schedule={
+        'update-ai-insights': {
+            'task': 'tasks.celery_tasks.update_ai_insights',
+            'schedule': float(os.getenv('AI_INSIGHTS_SECONDS', 900))
+        },
+        'service-loans-nightly': {
+            'task': 'tasks.celery_tasks.service_loans_nightly',
+            'schedule': crontab(hour=0, minute=30)
+        },
+        'generate-monthly-reports': {
+            'task': 'tasks.celery_tasks.generate_monthly_reports',
+            'schedule': crontab(day_of_month=1, hour=2, minute=0)
+        }
+    }
+)
+mail = Mail(flask_app)
 
 @celery.task
 def send_contribution_reminder(member_id):
-    from models.members import Member
-    member = Member.query.get(member_id)
+    member = db.session.get(Member, member_id)
     msg = Message("Contribution Reminder",
                  recipients=[member.email],
                  body=f"Dear {member.name}, please remember to submit your contribution.")
     mail.send(msg)
 
 @celery.task
-def generate_monthly_reports():
-    members = Member.query.all()
-    for member in members:
-        report = generate_member_statement(member.id)
-        # Save or email report
\ No newline at end of file
+def generate_report_shard(run_id, shard_id, member_ids, fmt=REPORT_FORMAT):
+    return build_report_shard(run_id, shard_id, member_ids, fmt)
+
+@celery.task
+def finish_report_run(shard_results, run_id):
+    finalize_report_run(run_id)
+
+@celery.task
+def update_ai_insights(force=False):
+    """Scheduled entry point for the AI insight job; a no-op when nothing changed since the last run."""
+    run = refresh_ai_insights(force=force)
+    return run.id if run else None
+
+@celery.task
+def service_loans_nightly():
+    """Scheduled entry point for loan servicing; refreshes every active loan's position and the PAR snapshot."""
+    summary = service_loans()
+    db.session.commit()
+    return dict(summary, as_of=summary['as_of'].isoformat())
+
+def dispatch_report_chord(run_id, jobs):
+    chord(generate_report_shard.s(*job) for job in jobs)(finish_report_run.s(run_id))
+
+@celery.task
+def generate_monthly_reports(fmt=REPORT_FORMAT, shard_size=REPORT_SHARD_SIZE):
+    """Monthly statements; shards run as a Celery chord when a broker is configured, otherwise on a local process pool."""
+    dispatch = dispatch_report_chord if os.getenv('CELERY_BROKER_URL') else None
+    return run_monthly_reports(fmt, shard_size, dispatch).id
\ No newline at end of file
@@ -0,0 +1,127 @@
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import json
+import os
+import time
+from fixed_app import app as flask_app, db, Member, MemberBalance, Report, ReportRun, ReportShard
+from utils.money import json_default
+from utils.reporting import stream_member_statement
+
+REPORT_SHARD_SIZE = 500
+REPORT_FORMAT = 'xlsx'
+
+def members_needing_statements():
+    """Ids of members with contributions or loans recorded since their last statement."""
+    last_statement = db.session.query(
+        Report.member_id.label('member_id'),
+        db.func.max(Report.generated_date).label('generated_date')
+    ).filter(Report.type == 'member_statement').group_by(Report.member_id).subquery()
+    
+    rows = db.session.query(Member.id) \
+        .outerjoin(MemberBalance, MemberBalance.member_id == Member.id) \
+        .outerjoin(last_statement, last_statement.c.member_id == Member.id) \
+        .filter(db.or_(
+            last_statement.c.generated_date.is_(None),
+            MemberBalance.updated_at > last_statement.c.generated_date
+        )).order_by(Member.id)
+    return [member_id for member_id, in rows]
+
+def build_report_shard(run_id, shard_id, member_ids, fmt=REPORT_FORMAT):
+    """Write statements for one shard of members and record them as Report rows."""
+    shard = db.session.get(ReportShard, shard_id)
+    run = db.session.get(ReportRun, run_id)
+    started_at = datetime.utcnow()
+    shard.status = 'Running'
+    shard.started_at = started_at
+    db.session.commit()
+    
+    start = time.perf_counter()
+    reports_dir = flask_app.config.get('REPORTS_DIR', os.path.join(flask_app.instance_path, 'reports'))
+    output_dir = os.path.join(reports_dir, run.period_start.strftime('%Y-%m'))
+    os.makedirs(output_dir, exist_ok=True)
+    
+    try:
+        names = dict(db.session.query(Member.id, Member.name).filter(Member.id.in_(member_ids)))
+        reports = []
+        for member_id in member_ids:
+            # One file per run, so a rerun in the same month never rewrites an earlier Report's file
+            file_path = os.path.join(output_dir, f'member-{member_id}-run{run_id}.{fmt}')
+            summary = stream_member_statement(member_id, file_path, fmt=fmt)
+            reports.append(Report(
+                title=f'Statement - {names.get(member_id, member_id)}'[:100],
+                type='member_statement',
+                content=json.dumps(summary, default=json_default),
+                file_path=file_path,
+                # Activity after the shard started is picked up by the next run
+                generated_date=started_at,
+                period_start=run.period_start,
+                period_end=run.period_end,
+                member_id=member_id
+            ))
+        db.session.add_all(reports)
+        shard.status = 'Completed'
+        shard.reports_written = len(reports)
+    except Exception as e:
+        db.session.rollback()
+        shard = db.session.get(ReportShard, shard_id)
+        shard.status = 'Failed'
+        shard.error = str(e)
+    
+    shard.finished_at = datetime.utcnow()
+    shard.duration_seconds = time.perf_counter() - start
+    db.session.execute(
+        db.update(ReportRun).where(ReportRun.id == run_id).values(completed_shards=ReportRun.completed_shards + 1)
+    )
+    db.session.commit()
+    return shard.status
+
+def finalize_report_run(run_id):
+    run = db.session.get(ReportRun, run_id)
+    failed = ReportShard.query.filter_by(run_id=run_id, status='Failed').count()
+    run.status = 'Failed' if failed else 'Completed'
+    run.finished_at = datetime.utcnow()
+    db.session.commit()
+
+def _build_report_shard_in_process(job):
+    with flask_app.app_context():
+        # Never reuse database connections inherited from the parent process
+        db.engine.dispose(close=False)
+        return build_report_shard(*job)
+
+def run_monthly_reports(fmt=REPORT_FORMAT, shard_size=REPORT_SHARD_SIZE, dispatch=None):
+    """Fan member statements out in shards, skipping members with no new activity.
+    
+    `dispatch(run_id, jobs)` hands the shards to another executor (the Celery
+    chord); without it they run on a local process pool before this returns.
+    Progress is recorded on the returned ReportRun.
+    """
+    now = datetime.utcnow()
+    member_ids = members_needing_statements()
+    total_members = Member.query.count()
+    shards = [member_ids[i:i + shard_size] for i in range(0, len(member_ids), shard_size)]
+    
+    run = ReportRun(
+        period_start=now.replace(day=1, hour=0, minute=0, second=0, microsecond=0),
+        period_end=now,
+        total_members=total_members,
+        skipped_members=total_members - len(member_ids),
+        shard_count=len(shards)
+    )
+    db.session.add(run)
+    db.session.flush()
+    shard_rows = [ReportShard(run_id=run.id, shard_index=i, member_count=len(ids)) for i, ids in enumerate(shards)]
+    db.session.add_all(shard_rows)
+    db.session.commit()
+    
+    jobs = [(run.id, shard.id, ids, fmt) for shard, ids in zip(shard_rows, shards)]
+    if not jobs:
+        finalize_report_run(run.id)
+    elif dispatch is not None:
+        dispatch(run.id, jobs)
+    else:
+        with ProcessPoolExecutor() as pool:
+            list(pool.map(_build_report_shard_in_process, jobs))
+        finalize_report_run(run.id)
+    
+    db.session.refresh(run)
+    return run
\ No newline at end of file
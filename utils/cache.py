@@ -0,0 +1,36 @@
+import threading
+import time
+
+class TTLCache:
+    """Process-local cache whose entries expire a fixed number of seconds after being stored."""
+    
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+    
+    def get_or_set(self, key, ttl, loader):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                return entry[1]
+        
+        # Load outside the lock so a slow loader does not block other keys
+        value = loader()
+        with self._lock:
+            self._entries[key] = (now + ttl, value)
+        return value
+    
+    def invalidate(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+    
+    def invalidate_prefix(self, prefix):
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                del self._entries[key]
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
\ No newline at end of file
@@ -0,0 +1,48 @@
+import threading
+
+class PeriodicJob:
+    """Runs `fn` on a daemon thread every `interval` seconds once started.
+    
+    `trigger` asks for a run straight away. Runs never overlap in a process,
+    and triggers that arrive during a run are coalesced into one more run after
+    it. An `interval` of 0 or less disables the timer, so only triggers run it.
+    """
+    
+    def __init__(self, fn, interval, name='periodic-job', on_error=None):
+        self.fn = fn
+        self.interval = interval
+        self.name = name
+        self.on_error = on_error
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+    
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopped.clear()
+                self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+                self._thread.start()
+    
+    def trigger(self):
+        self.start()
+        self._wake.set()
+    
+    def _loop(self):
+        while True:
+            self._wake.wait(self.interval if self.interval > 0 else None)
+            self._wake.clear()
+            if self._stopped.is_set():
+                return
+            try:
+                self.fn()
+            except Exception as e:
+                if self.on_error:
+                    self.on_error(e)
+    
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
\ No newline at end of file
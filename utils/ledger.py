@@ -0,0 +1,51 @@
+import hashlib
+import json
+
+GENESIS_HASH = '0' * 64
+
+def compute_block_hash(transaction_data, previous_hash):
+    """Hash a block the way create_blockchain_transaction() always has.
+    
+    `transaction_data` is the stored JSON text or the dict it was built from.
+    """
+    if isinstance(transaction_data, str):
+        transaction_data = json.loads(transaction_data)
+    block_string = json.dumps(transaction_data, sort_keys=True) + previous_hash
+    return hashlib.sha256(block_string.encode()).hexdigest()
+
+def _hash_pair(left, right):
+    return hashlib.sha256(bytes.fromhex(left) + bytes.fromhex(right)).hexdigest()
+
+def _next_level(level):
+    if len(level) % 2:
+        level = level + [level[-1]]
+    return [_hash_pair(level[i], level[i + 1]) for i in range(0, len(level), 2)]
+
+def merkle_root(leaves):
+    """Merkle root of a list of hex digests; odd levels repeat their last node."""
+    if not leaves:
+        return GENESIS_HASH
+    level = list(leaves)
+    while len(level) > 1:
+        level = _next_level(level)
+    return level[0]
+
+def merkle_proof(leaves, index):
+    """Sibling path proving leaves[index]; each step is (sibling_hash, sibling_is_right)."""
+    proof = []
+    level = list(leaves)
+    while len(level) > 1:
+        if len(level) % 2:
+            level = level + [level[-1]]
+        sibling = index + 1 if index % 2 == 0 else index - 1
+        proof.append((level[sibling], sibling > index))
+        level = _next_level(level)
+        index //= 2
+    return proof
+
+def verify_merkle_proof(leaf, proof, root):
+    """True if folding `leaf` up a merkle_proof() path arrives at `root`."""
+    node = leaf
+    for sibling, sibling_is_right in proof:
+        node = _hash_pair(node, sibling) if sibling_is_right else _hash_pair(sibling, node)
+    return node == root
\ No newline at end of file
@@ -0,0 +1,87 @@
+import numpy as np
+
+def add_months(start_days, months):
+    """datetime64[D] dates `months` calendar months after start_days, clamped to the end of shorter months."""
+    start_days = np.asarray(start_days, dtype='datetime64[D]')
+    start_months = start_days.astype('datetime64[M]')
+    day_offset = (start_days - start_months.astype('datetime64[D]')).astype(np.int64)
+    target = start_months + np.asarray(months, dtype=np.int64)
+    month_length = ((target + 1).astype('datetime64[D]') - target.astype('datetime64[D]')).astype(np.int64)
+    return target.astype('datetime64[D]') + np.minimum(day_offset, month_length - 1)
+
+def amortization_schedules(principals, annual_rates, terms, start_days):
+    """Level monthly installments for many loans at once.
+    
+    principals are cents, annual_rates percentages, terms whole months and
+    start_days the disbursement dates. Returns (loan_index, number, due_day,
+    principal, interest) arrays ordered by loan then installment number.
+    Balances are rounded to the cent and the last installment clears what is
+    left, so each loan's principal sums exactly to its amount.
+    """
+    principals = np.asarray(principals, dtype=np.int64)
+    rates = np.asarray(annual_rates, dtype=np.float64) / 1200
+    terms = np.maximum(np.asarray(terms, dtype=np.int64), 1)
+    loan_index = np.repeat(np.arange(len(principals)), terms)
+    number = np.arange(len(loan_index)) - np.repeat(np.cumsum(terms) - terms, terms) + 1
+    
+    growth_term = (1 + rates) ** terms
+    with np.errstate(divide='ignore', invalid='ignore'):
+        payments = np.where(rates > 0, principals * rates * growth_term / (growth_term - 1), principals / terms)
+    
+    # Closed-form balance after installment k: P(1+r)^k - A((1+r)^k - 1)/r
+    rate, principal, payment = rates[loan_index], principals[loan_index], np.round(payments)[loan_index]
+    growth = (1 + rate) ** number
+    with np.errstate(divide='ignore', invalid='ignore'):
+        balance_after = np.where(rate > 0, principal * growth - payment * (growth - 1) / rate, principal - payment * number)
+    balance_after = np.clip(np.round(balance_after), 0, None).astype(np.int64)
+    balance_after[number == terms[loan_index]] = 0
+    balance_before = np.where(number == 1, principal, np.roll(balance_after, 1))
+    
+    principal_paid = balance_before - balance_after
+    interest = np.round(balance_before * rate).astype(np.int64)
+    due_days = add_months(np.asarray(start_days, dtype='datetime64[D]')[loan_index], number)
+    return loan_index, number, due_days, principal_paid, interest
+
+def loan_positions(loan_index, due_days, principals, interests, repaid, as_of_day):
+    """Arrears, days past due, outstanding balance and principal repaid for every loan in one pass.
+    
+    Installments are ordered by loan then number, with loan_index pointing
+    into `repaid` (cents repaid per loan). Repayments settle the oldest
+    installments first, interest before principal within each. Returns a
+    dict of per-loan arrays; next_due is NaT once a loan's installments are
+    all covered.
+    """
+    loan_index = np.asarray(loan_index, dtype=np.int64)
+    principals = np.asarray(principals, dtype=np.int64)
+    interests = np.asarray(interests, dtype=np.int64)
+    amounts = principals + interests
+    due_days = np.asarray(due_days, dtype='datetime64[D]')
+    repaid = np.asarray(repaid, dtype=np.int64)
+    as_of_day = np.datetime64(as_of_day, 'D')
+    loan_count = len(repaid)
+    
+    total = np.bincount(loan_index, weights=amounts, minlength=loan_count).astype(np.int64)
+    due = np.bincount(loan_index, weights=amounts * (due_days <= as_of_day), minlength=loan_count).astype(np.int64)
+    
+    # Running total within each loan decides which installments repayments cover
+    cumulative = np.cumsum(amounts)
+    first = np.searchsorted(loan_index, np.arange(loan_count))
+    before = np.concatenate(([0], cumulative))[first]
+    covered = np.clip(repaid[loan_index] - (cumulative - amounts - before[loan_index]), 0, amounts)
+    principal_repaid = np.bincount(loan_index, weights=np.maximum(covered - interests, 0), minlength=loan_count)
+    unpaid = np.flatnonzero(cumulative - before[loan_index] > repaid[loan_index])
+    unpaid_loans, first_unpaid = np.unique(loan_index[unpaid], return_index=True)
+    next_due = np.full(loan_count, np.datetime64('NaT'), dtype='datetime64[D]')
+    next_due[unpaid_loans] = due_days[unpaid[first_unpaid]]
+    
+    overdue = ~np.isnat(next_due) & (next_due < as_of_day)
+    days_past_due = np.zeros(loan_count, dtype=np.int64)
+    days_past_due[overdue] = (as_of_day - next_due[overdue]).astype(np.int64)
+    return {
+        'total': total,
+        'arrears': np.clip(due - repaid, 0, None),
+        'outstanding': np.clip(total - repaid, 0, None),
+        'principal_repaid': principal_repaid.astype(np.int64),
+        'days_past_due': days_past_due,
+        'next_due': next_due
+    }
\ No newline at end of file
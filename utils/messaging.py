@@ -0,0 +1,100 @@
+import json
+import queue
+import threading
+
+class MemorySubscription:
+    def __init__(self, broker, channel, maxsize):
+        self.broker = broker
+        self.channel = channel
+        self.queue = queue.Queue(maxsize)
+    
+    def get(self, timeout=None):
+        """Next published message, or None if nothing arrived within `timeout` seconds."""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+    
+    def close(self):
+        self.broker._unsubscribe(self)
+
+class MemoryMessageBroker:
+    """Fans messages out to subscribers in this process; use RedisMessageBroker when running several workers.
+    
+    A subscriber that falls `maxsize` messages behind misses the overflow and is
+    expected to catch up from the database when it reconnects.
+    """
+    
+    def __init__(self, maxsize=1000):
+        self.maxsize = maxsize
+        self._subscribers = {}
+        self._lock = threading.Lock()
+    
+    def publish(self, channel, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            try:
+                subscription.queue.put_nowait(message)
+            except queue.Full:
+                pass
+    
+    def subscribe(self, channel):
+        subscription = MemorySubscription(self, channel, self.maxsize)
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add(subscription)
+        return subscription
+    
+    def _unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel)
+            if subscribers:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.channel]
+
+class RedisSubscription:
+    def __init__(self, pubsub):
+        self.pubsub = pubsub
+    
+    def get(self, timeout=None):
+        message = self.pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout or 0)
+        if message is None:
+            return None
+        return json.loads(message['data'])
+    
+    def close(self):
+        self.pubsub.close()
+
+class RedisMessageBroker:
+    """Shares published messages between processes through Redis pub/sub channels."""
+    
+    def __init__(self, client, prefix='messages'):
+        self.client = client
+        self.prefix = prefix
+    
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        import redis
+        return cls(redis.Redis.from_url(url), **kwargs)
+    
+    def publish(self, channel, message):
+        self.client.publish(f'{self.prefix}:{channel}', json.dumps(message))
+    
+    def subscribe(self, channel):
+        pubsub = self.client.pubsub()
+        pubsub.subscribe(f'{self.prefix}:{channel}')
+        return RedisSubscription(pubsub)
+
+def format_sse(data=None, event_id=None, event=None, comment=None):
+    """One Server-Sent Events frame; `data` is sent as JSON."""
+    lines = []
+    if comment is not None:
+        lines.append(f': {comment}')
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    if event is not None:
+        lines.append(f'event: {event}')
+    if data is not None:
+        lines.extend(f'data: {line}' for line in json.dumps(data).splitlines())
+    return '\n'.join(lines) + '\n\n'
\ No newline at end of file
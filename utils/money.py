@@ -0,0 +1,171 @@
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from sqlalchemy.sql import operators
+from sqlalchemy.types import BigInteger, Float, Integer, TypeDecorator
+
+CENTS_PER_UNIT = 100
+SCALING_OPERATORS = (operators.mul, operators.truediv, operators.floordiv, operators.mod)
+
+def _round_cents(value):
+    return int(value.quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+class Money:
+    """An exact amount of money held as integer minor units (cents).
+    
+    Money adds, subtracts and compares with other Money and with plain numbers,
+    which are read as currency units. Multiplying or dividing by a number
+    rounds half up to the cent; dividing by Money gives a plain ratio.
+    """
+    
+    __slots__ = ('cents',)
+    
+    def __init__(self, cents=0):
+        if isinstance(cents, bool) or not isinstance(cents, int):
+            raise TypeError('Money is built from integer cents; use Money.parse for amounts')
+        self.cents = cents
+    
+    @classmethod
+    def parse(cls, value):
+        """Money from an amount in currency units: a string, int, float, Decimal or Money."""
+        if isinstance(value, Money):
+            return value
+        if value is None or isinstance(value, bool):
+            raise ValueError(f'Invalid amount: {value!r}')
+        try:
+            amount = value if isinstance(value, Decimal) else Decimal(str(value).strip())
+        except InvalidOperation:
+            raise ValueError(f'Invalid amount: {value!r}')
+        if not amount.is_finite():
+            raise ValueError(f'Invalid amount: {value!r}')
+        return cls(_round_cents(amount * CENTS_PER_UNIT))
+    
+    @property
+    def amount(self):
+        return Decimal(self.cents).scaleb(-2)
+    
+    @staticmethod
+    def _cents_of(other):
+        if isinstance(other, Money):
+            return other.cents
+        if isinstance(other, (int, float, Decimal)) and not isinstance(other, bool):
+            return Money.parse(other).cents
+        return None
+    
+    def __add__(self, other):
+        cents = self._cents_of(other)
+        return NotImplemented if cents is None else Money(self.cents + cents)
+    
+    __radd__ = __add__
+    
+    def __sub__(self, other):
+        cents = self._cents_of(other)
+        return NotImplemented if cents is None else Money(self.cents - cents)
+    
+    def __rsub__(self, other):
+        cents = self._cents_of(other)
+        return NotImplemented if cents is None else Money(cents - self.cents)
+    
+    def __mul__(self, factor):
+        if isinstance(factor, (Money, bool)) or not isinstance(factor, (int, float, Decimal)):
+            return NotImplemented
+        return Money(_round_cents(Decimal(self.cents) * Decimal(str(factor))))
+    
+    __rmul__ = __mul__
+    
+    def __truediv__(self, other):
+        if isinstance(other, Money):
+            return self.cents / other.cents
+        if isinstance(other, bool) or not isinstance(other, (int, float, Decimal)):
+            return NotImplemented
+        return Money(_round_cents(Decimal(self.cents) / Decimal(str(other))))
+    
+    def __neg__(self):
+        return Money(-self.cents)
+    
+    def __pos__(self):
+        return self
+    
+    def __abs__(self):
+        return Money(abs(self.cents))
+    
+    def _compare(self, other, op):
+        # Plain numbers are compared exactly rather than rounded to the cent first
+        if isinstance(other, Money):
+            return op(self.cents, other.cents)
+        if isinstance(other, (int, float, Decimal)) and not isinstance(other, bool):
+            return op(self.amount, other if isinstance(other, Decimal) else Decimal(str(other)))
+        return NotImplemented
+    
+    def __eq__(self, other):
+        return self._compare(other, lambda a, b: a == b)
+    
+    def __lt__(self, other):
+        return self._compare(other, lambda a, b: a < b)
+    
+    def __le__(self, other):
+        return self._compare(other, lambda a, b: a <= b)
+    
+    def __gt__(self, other):
+        return self._compare(other, lambda a, b: a > b)
+    
+    def __ge__(self, other):
+        return self._compare(other, lambda a, b: a >= b)
+    
+    def __hash__(self):
+        # Equal to the hash of the same amount as an int, float or Decimal
+        return hash(self.amount)
+    
+    def __bool__(self):
+        return self.cents != 0
+    
+    def __float__(self):
+        return self.cents / CENTS_PER_UNIT
+    
+    def __int__(self):
+        return int(self.amount)
+    
+    def __round__(self, ndigits=None):
+        return round(self.amount, ndigits)
+    
+    def __format__(self, spec):
+        return format(self.amount, spec)
+    
+    def __str__(self):
+        return str(self.amount)
+    
+    def __repr__(self):
+        return f"Money('{self}')"
+
+def json_default(value):
+    """`default=` hook for json.dumps; Money is written as a number in currency units."""
+    if isinstance(value, Money):
+        return float(value)
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+class MoneyType(TypeDecorator):
+    """Stores Money as a BIGINT of cents so SQL SUM/AVG over it stay exact.
+    
+    Binds accept anything Money.parse does. Results, including SUM() and
+    COALESCE() over a money column, come back as Money.
+    """
+    
+    impl = BigInteger
+    cache_ok = True
+    
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return Money.parse(value).cents
+    
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        if isinstance(value, int):
+            return Money(value)
+        # AVG() over cents comes back fractional
+        return Money(_round_cents(Decimal(str(value))))
+    
+    def coerce_compared_value(self, op, value):
+        # `amount * 2` scales the cents; only additive and comparison operands are money
+        if op in SCALING_OPERATORS:
+            return Integer() if isinstance(value, int) else Float()
+        return self
\ No newline at end of file
@@ -0,0 +1,304 @@
+import asyncio
+import base64
+import os
+import threading
+import time
+from datetime import datetime
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+from urllib3.util.retry import Retry
+
+SANDBOX_URL = 'https://sandbox.safaricom.co.ke'
+TRANSIENT_STATUSES = (429, 500, 502, 503, 504)
+
+class MpesaError(Exception):
+    pass
+
+class MpesaUnconfirmed(MpesaError):
+    """The STK push may have reached Daraja, but no usable reply came back.
+    
+    The customer may already have been prompted, so the payment must be left
+    for the callback instead of being failed or pushed again.
+    """
+
+def reached_daraja(error):
+    """False when a requests error shows the request was never sent."""
+    if isinstance(error, requests.ConnectTimeout):
+        return False
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return not isinstance(reason, NewConnectionError)
+
+class TokenCache:
+    """Holds one OAuth token for every thread (and the async client) of a process.
+    
+    The token is treated as expired `refresh_margin` seconds early so a request
+    never goes out with a token that lapses in flight.
+    """
+    
+    def __init__(self, refresh_margin=60):
+        self.refresh_margin = refresh_margin
+        self._token = None
+        self._expires_at = 0
+        self.lock = threading.Lock()
+    
+    def get(self):
+        if self._token and time.monotonic() < self._expires_at - self.refresh_margin:
+            return self._token
+        return None
+    
+    def set(self, token, expires_in):
+        self._token = token
+        self._expires_at = time.monotonic() + float(expires_in)
+    
+    def clear(self):
+        self._token = None
+        self._expires_at = 0
+
+def parse_token(payload):
+    try:
+        return payload['access_token'], payload.get('expires_in', 3599)
+    except (KeyError, TypeError):
+        raise MpesaError('M-Pesa OAuth response did not include an access token')
+
+class MpesaClient:
+    """Daraja STK push client sharing a connection pool and token across threads.
+    
+    GETs (the token fetch) are retried with backoff on connection errors and
+    transient statuses. The STK push POST is only retried when the connection
+    could not be made, so a customer is never prompted twice; any later failure
+    raises MpesaUnconfirmed.
+    """
+    
+    def __init__(self, consumer_key, consumer_secret, shortcode, passkey, callback_url,
+                 base_url=SANDBOX_URL, connect_timeout=3.05, read_timeout=10, retries=3,
+                 backoff=0.5, pool_size=10, refresh_margin=60):
+        self.consumer_key = consumer_key
+        self.consumer_secret = consumer_secret
+        self.shortcode = shortcode
+        self.passkey = passkey
+        self.callback_url = callback_url
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self.tokens = TokenCache(refresh_margin)
+        
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff,
+            status_forcelist=TRANSIENT_STATUSES,
+            allowed_methods=frozenset(['GET']),
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+    
+    @classmethod
+    def from_env(cls, **kwargs):
+        settings = dict(
+            consumer_key=os.getenv('MPESA_CONSUMER_KEY', 'bfb279f9aa9bdbcf158e97dd71a467cd2e0c893059b10f78e6b72ada1ed2c919'),
+            consumer_secret=os.getenv('MPESA_CONSUMER_SECRET', 'b051e7d22f7e0fe81e71b1d1a0e8b9c2d5c0b1f8e6a9c8d7f4e3b2a1c9d8e7f6'),
+            shortcode=os.getenv('MPESA_SHORTCODE', '174379'),
+            passkey=os.getenv('MPESA_PASSKEY', 'bfb279f9aa9bdbcf158e97dd71a467cd2e0c893059b10f78e6b72ada1ed2c919b051e7d22f7e0fe81e71b1d1a0e8b9c2d5c0b1f8e6a9c8d7f4e3b2a1c9d8e7f6'),
+            callback_url=os.getenv('MPESA_CALLBACK_URL', 'https://mydomain.com/path'),
+            base_url=os.getenv('MPESA_BASE_URL', SANDBOX_URL),
+            connect_timeout=float(os.getenv('MPESA_CONNECT_TIMEOUT', 3.05)),
+            read_timeout=float(os.getenv('MPESA_READ_TIMEOUT', 10)),
+            retries=int(os.getenv('MPESA_RETRIES', 3)),
+            pool_size=int(os.getenv('MPESA_POOL_SIZE', 10))
+        )
+        settings.update(kwargs)
+        return cls(**settings)
+    
+    def timestamp(self):
+        return datetime.now().strftime('%Y%m%d%H%M%S')
+    
+    def password(self, timestamp):
+        return base64.b64encode((self.shortcode + self.passkey + timestamp).encode()).decode('utf-8')
+    
+    def stk_payload(self, phone, amount, account_ref, description='Chama Contribution', callback_url=None):
+        timestamp = self.timestamp()
+        return {
+            'BusinessShortCode': self.shortcode,
+            'Password': self.password(timestamp),
+            'Timestamp': timestamp,
+            'TransactionType': 'CustomerPayBillOnline',
+            'Amount': int(float(amount)),
+            'PartyA': phone,
+            'PartyB': self.shortcode,
+            'PhoneNumber': phone,
+            'CallBackURL': callback_url or self.callback_url,
+            'AccountReference': account_ref,
+            'TransactionDesc': description
+        }
+    
+    def token(self):
+        token = self.tokens.get()
+        if token:
+            return token
+        with self.tokens.lock:
+            # Another thread may have refreshed it while we waited
+            token = self.tokens.get()
+            if token:
+                return token
+            response = self.session.get(
+                f'{self.base_url}/oauth/v1/generate?grant_type=client_credentials',
+                auth=(self.consumer_key, self.consumer_secret),
+                timeout=self.timeout
+            )
+            response.raise_for_status()
+            token, expires_in = parse_token(response.json())
+            self.tokens.set(token, expires_in)
+            return token
+    
+    def stk_push(self, phone, amount, account_ref, **kwargs):
+        payload = self.stk_payload(phone, amount, account_ref, **kwargs)
+        response = self._post_stk(payload, self.token())
+        if response.status_code == 401:
+            # The token was revoked before its expiry; fetch a new one once
+            self.tokens.clear()
+            response = self._post_stk(payload, self.token())
+        try:
+            return response.json()
+        except ValueError as e:
+            raise MpesaUnconfirmed(f'Unreadable STK push reply (HTTP {response.status_code})') from e
+    
+    def _post_stk(self, payload, token):
+        try:
+            return self.session.post(
+                f'{self.base_url}/mpesa/stkpush/v1/processrequest',
+                json=payload,
+                headers={'Authorization': f'Bearer {token}'},
+                timeout=self.timeout
+            )
+        except requests.RequestException as e:
+            if reached_daraja(e):
+                raise MpesaUnconfirmed(f'No reply to the STK push: {e}') from e
+            raise
+    
+    def stk_query(self, checkout_request_id):
+        """Ask Daraja for the outcome of an STK push; unlike the push it is safe to repeat."""
+        timestamp = self.timestamp()
+        payload = {
+            'BusinessShortCode': self.shortcode,
+            'Password': self.password(timestamp),
+            'Timestamp': timestamp,
+            'CheckoutRequestID': checkout_request_id
+        }
+        for attempt in range(2):
+            response = self.session.post(
+                f'{self.base_url}/mpesa/stkpushquery/v1/query',
+                json=payload,
+                headers={'Authorization': f'Bearer {self.token()}'},
+                timeout=self.timeout
+            )
+            if response.status_code != 401 or attempt:
+                return response.json()
+            self.tokens.clear()
+    
+    def async_client(self):
+        return AsyncMpesaClient(self)
+    
+    def close(self):
+        self.session.close()
+
+class AsyncMpesaClient:
+    """asyncio counterpart of MpesaClient built on aiohttp.
+    
+    It reuses the settings and token cache of the MpesaClient it wraps, so sync
+    and async callers in one process share a single token.
+    """
+    
+    def __init__(self, client):
+        self.client = client
+        self._session = None
+        self._token_lock = None
+    
+    async def _get_session(self):
+        import aiohttp
+        
+        if self._session is None or self._session.closed:
+            connect_timeout, read_timeout = self.client.timeout
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.client.pool_size),
+                timeout=aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+            )
+            self._token_lock = asyncio.Lock()
+        return self._session
+    
+    async def _request(self, method, url, idempotent, **kwargs):
+        import aiohttp
+        
+        session = await self._get_session()
+        for attempt in range(self.client.retries + 1):
+            last_attempt = attempt == self.client.retries
+            try:
+                response = await session.request(method, url, **kwargs)
+            except aiohttp.ClientConnectorError:
+                if last_attempt:
+                    raise
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                if not idempotent or last_attempt:
+                    raise
+            else:
+                if not idempotent or last_attempt or response.status not in TRANSIENT_STATUSES:
+                    return response
+                response.release()
+            await asyncio.sleep(self.client.backoff * (2 ** attempt))
+    
+    async def token(self):
+        token = self.client.tokens.get()
+        if token:
+            return token
+        await self._get_session()
+        async with self._token_lock:
+            token = self.client.tokens.get()
+            if token:
+                return token
+            import aiohttp
+            response = await self._request(
+                'GET',
+                f'{self.client.base_url}/oauth/v1/generate?grant_type=client_credentials',
+                idempotent=True,
+                auth=aiohttp.BasicAuth(self.client.consumer_key, self.client.consumer_secret)
+            )
+            async with response:
+                response.raise_for_status()
+                token, expires_in = parse_token(await response.json(content_type=None))
+            self.client.tokens.set(token, expires_in)
+            return token
+    
+    async def stk_push(self, phone, amount, account_ref, **kwargs):
+        import aiohttp
+        
+        payload = self.client.stk_payload(phone, amount, account_ref, **kwargs)
+        for attempt in range(2):
+            token = await self.token()
+            try:
+                response = await self._request(
+                    'POST',
+                    f'{self.client.base_url}/mpesa/stkpush/v1/processrequest',
+                    idempotent=False,
+                    json=payload,
+                    headers={'Authorization': f'Bearer {token}'}
+                )
+            except aiohttp.ClientConnectorError:
+                raise
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                raise MpesaUnconfirmed(f'No reply to the STK push: {e!r}') from e
+            async with response:
+                if response.status == 401 and attempt == 0:
+                    self.client.tokens.clear()
+                    continue
+                try:
+                    return await response.json(content_type=None)
+                except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                    raise MpesaUnconfirmed(f'Unreadable STK push reply (HTTP {response.status})') from e
+    
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
\ No newline at end of file
@@ -0,0 +1,87 @@
+import base64
+import json
+from datetime import date, datetime
+from flask import abort, request
+from sqlalchemy import and_, or_
+
+DEFAULT_PER_PAGE = 50
+MAX_PER_PAGE = 200
+
+class KeysetPage:
+    def __init__(self, items, per_page, cursor=None, next_cursor=None):
+        self.items = items
+        self.per_page = per_page
+        self.cursor = cursor
+        self.next_cursor = next_cursor
+    
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    if isinstance(value, date):
+        return {'d': value.isoformat()}
+    return value
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if 'dt' in value:
+            return datetime.fromisoformat(value['dt'])
+        if 'd' in value:
+            return date.fromisoformat(value['d'])
+        raise ValueError('Invalid cursor')
+    return value
+
+def encode_cursor(values):
+    payload = json.dumps([_encode_value(value) for value in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor, size):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError('Invalid cursor')
+    return [_decode_value(value) for value in values]
+
+def after_keyset(columns, values, descending):
+    # Expands (a, b) < (x, y) to a < x OR (a = x AND b < y), which every dialect can index
+    clauses = []
+    for i, column in enumerate(columns):
+        beyond = column < values[i] if descending else column > values[i]
+        clauses.append(and_(*[earlier == value for earlier, value in zip(columns[:i], values[:i])], beyond))
+    return or_(*clauses)
+
+def paginate(query, order_by, cursor=None, per_page=DEFAULT_PER_PAGE, descending=True, columns=None):
+    """Return one KeysetPage of `query` ordered by `order_by`.
+    
+    The last `order_by` column must be unique (normally the primary key) so the
+    order is stable. With `columns`, only those columns are selected and items
+    are rows; each `order_by` column must then be among them under its own name.
+    Pages after the first are found by seeking past the cursor, so every page
+    costs the same however deep it is.
+    """
+    if columns is not None:
+        query = query.with_entities(*columns)
+    if cursor:
+        query = query.filter(after_keyset(order_by, decode_cursor(cursor, len(order_by)), descending))
+    query = query.order_by(*[column.desc() if descending else column.asc() for column in order_by])
+    
+    rows = query.limit(per_page + 1).all()
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_cursor([getattr(rows[-1], column.key) for column in order_by])
+    return KeysetPage(rows, per_page, cursor, next_cursor)
+
+def paginate_request(query, order_by, descending=True, columns=None):
+    """paginate() with the cursor and per_page taken from the query string; a bad cursor is a 400."""
+    per_page = max(1, min(request.args.get('per_page', DEFAULT_PER_PAGE, type=int), MAX_PER_PAGE))
+    try:
+        return paginate(query, order_by, request.args.get('cursor'), per_page, descending, columns)
+    except ValueError:
+        abort(400)
\ No newline at end of file
@@ -0,0 +1,71 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+class PaymentWorkers:
+    """Submits STK pushes on a thread pool and batches callback reconciliation.
+    
+    `submit` is called with a payment id on a pool thread. `reconcile` runs at
+    most once per `batch_delay` seconds after a callback schedules it, so every
+    callback that lands in that window is reconciled in a single pass.
+    """
+    
+    def __init__(self, submit, reconcile, max_workers=8, batch_delay=2.0, on_error=None):
+        self.submit = submit
+        self.reconcile = reconcile
+        self.batch_delay = batch_delay
+        self.on_error = on_error
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='stk-push')
+        self._reconcile_timer = None
+        self._lock = threading.Lock()
+    
+    def _run(self, fn, *args):
+        try:
+            fn(*args)
+        except Exception as e:
+            if self.on_error:
+                self.on_error(e)
+    
+    def enqueue(self, payment_id):
+        return self.executor.submit(self._run, self.submit, payment_id)
+    
+    def schedule_reconcile(self):
+        with self._lock:
+            if self._reconcile_timer is not None:
+                return
+            self._reconcile_timer = threading.Timer(self.batch_delay, self._reconcile_now)
+            self._reconcile_timer.daemon = True
+            self._reconcile_timer.start()
+    
+    def _reconcile_now(self):
+        with self._lock:
+            self._reconcile_timer = None
+        self._run(self.reconcile)
+    
+    def shutdown(self, wait=True):
+        with self._lock:
+            if self._reconcile_timer is not None:
+                self._reconcile_timer.cancel()
+                self._reconcile_timer = None
+        self.executor.shutdown(wait=wait)
+
+def parse_stk_callback(payload):
+    """Flatten a Daraja STK callback body into a dict; raises ValueError if it is not one."""
+    try:
+        callback = payload['Body']['stkCallback']
+        result = {
+            'merchant_request_id': callback.get('MerchantRequestID'),
+            'checkout_request_id': callback['CheckoutRequestID'],
+            'result_code': int(callback['ResultCode']),
+            'result_desc': callback.get('ResultDesc')
+        }
+    except (KeyError, TypeError, ValueError):
+        raise ValueError('Not an STK push callback')
+    
+    items = {
+        item.get('Name'): item.get('Value')
+        for item in (callback.get('CallbackMetadata') or {}).get('Item', [])
+    }
+    result['amount'] = items.get('Amount')
+    result['receipt'] = items.get('MpesaReceiptNumber')
+    result['phone'] = str(items['PhoneNumber']) if items.get('PhoneNumber') else None
+    return result
\ No newline at end of file
@@ -0,0 +1,106 @@
+import threading
+import time
+from datetime import datetime
+
+class MemoryPresenceStore:
+    """Keeps heartbeats in this process; use RedisPresenceStore when running several workers."""
+    
+    def __init__(self):
+        self._last_seen = {}
+        self._dirty = {}
+        self._lock = threading.Lock()
+    
+    def heartbeat(self, user_id, timestamp):
+        with self._lock:
+            self._last_seen[user_id] = timestamp
+            self._dirty[user_id] = timestamp
+    
+    def remove(self, user_id):
+        with self._lock:
+            self._last_seen.pop(user_id, None)
+    
+    def seen_since(self, timestamp):
+        with self._lock:
+            return {user_id for user_id, seen in self._last_seen.items() if seen >= timestamp}
+    
+    def drain(self):
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+        return dirty
+
+class RedisPresenceStore:
+    """Shares heartbeats between processes through a Redis sorted set scored by timestamp."""
+    
+    def __init__(self, client, prefix='presence'):
+        self.client = client
+        self.seen_key = f'{prefix}:last_seen'
+        self.dirty_key = f'{prefix}:dirty'
+    
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        import redis
+        return cls(redis.Redis.from_url(url), **kwargs)
+    
+    def heartbeat(self, user_id, timestamp):
+        pipe = self.client.pipeline()
+        pipe.zadd(self.seen_key, {user_id: timestamp})
+        pipe.hset(self.dirty_key, user_id, timestamp)
+        pipe.execute()
+    
+    def remove(self, user_id):
+        self.client.zrem(self.seen_key, user_id)
+    
+    def seen_since(self, timestamp):
+        # Trim entries that have fallen out of every window so the set stays small
+        self.client.zremrangebyscore(self.seen_key, '-inf', timestamp - 86400)
+        return {int(user_id) for user_id in self.client.zrangebyscore(self.seen_key, timestamp, '+inf')}
+    
+    def drain(self):
+        pipe = self.client.pipeline()
+        pipe.hgetall(self.dirty_key)
+        pipe.delete(self.dirty_key)
+        dirty, _ = pipe.execute()
+        return {int(user_id): float(timestamp) for user_id, timestamp in dirty.items()}
+
+class PresenceTracker:
+    """Records heartbeats in a store and writes last_seen back to the database in batches.
+    
+    A user counts as online while their latest heartbeat is inside the sliding
+    `window` (seconds). `flush` is handed {user_id: datetime} at most once per
+    `flush_interval` seconds.
+    """
+    
+    def __init__(self, store, window=300, flush_interval=60):
+        self.store = store
+        self.window = window
+        self.flush_interval = flush_interval
+        self._last_flush = time.monotonic()
+        self._flush_lock = threading.Lock()
+    
+    def heartbeat(self, user_id):
+        self.store.heartbeat(user_id, time.time())
+    
+    def remove(self, user_id):
+        self.store.remove(user_id)
+    
+    def online_user_ids(self):
+        return self.store.seen_since(time.time() - self.window)
+    
+    def is_online(self, user_id):
+        return user_id in self.online_user_ids()
+    
+    def flush_due(self):
+        return time.monotonic() - self._last_flush >= self.flush_interval
+    
+    def flush(self, writer):
+        # Only one thread per process drains the store at a time
+        if not self._flush_lock.acquire(blocking=False):
+            return 0
+        try:
+            self._last_flush = time.monotonic()
+            dirty = self.store.drain()
+            if dirty:
+                writer({user_id: datetime.utcfromtimestamp(timestamp) for user_id, timestamp in dirty.items()})
+            return len(dirty)
+        finally:
+            self._flush_lock.release()
\ No newline at end of file
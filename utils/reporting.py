@@ -1,6 +1,9 @@
+import csv
+import io
 import pandas as pd
-from io import BytesIO
-from models.financial import Contribution, Loan
+from fixed_app import Contribution, Loan
+
+STATEMENT_COLUMNS = ['Date', 'Amount', 'Type']
 
 def generate_member_statement(member_id):
     # Get data
@@ -10,13 +13,13 @@ def generate_member_statement(member_id):
     # Create DataFrames
     contrib_df = pd.DataFrame([{
         'Date': c.date,
-        'Amount': c.amount,
+        'Amount': float(c.amount),
         'Type': 'Contribution'
     } for c in contributions])
     
     loans_df = pd.DataFrame([{
-        'Date': l.date_issued,
-        'Amount': l.amount,
+        'Date': l.date_applied,
+        'Amount': float(l.amount),
         'Type': 'Loan'
     } for l in loans])
     
@@ -25,9 +28,114 @@ def generate_member_statement(member_id):
     summary = combined.groupby('Type').agg({'Amount': ['count', 'sum']})
     
     # Generate Excel
-    output = BytesIO()
+    output = io.BytesIO()
     with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
         combined.to_excel(writer, sheet_name='Transactions')
         summary.to_excel(writer, sheet_name='Summary')
     
-    return output.getvalue()
\ No newline at end of file
+    return output.getvalue()
+
+def iter_statement_chunks(member_id, chunk_size=5000):
+    """Yield a member's transactions as lists of (date, amount, type) tuples.
+    
+    Rows are read with column-only queries, keyset-paginated on the primary key,
+    so only one chunk is held in memory at a time.
+    """
+    sources = [
+        (Contribution, Contribution.date, 'Contribution'),
+        (Loan, Loan.date_applied, 'Loan')
+    ]
+    for model, date_column, row_type in sources:
+        last_id = 0
+        while True:
+            rows = model.query.with_entities(model.id, date_column, model.amount) \
+                .filter(model.member_id == member_id, model.id > last_id) \
+                .order_by(model.id).limit(chunk_size).all()
+            if not rows:
+                break
+            
+            last_id = rows[-1][0]
+            yield [(date, amount, row_type) for _, date, amount in rows]
+            
+            if len(rows) < chunk_size:
+                break
+
+def _summarize_chunk(summary, chunk):
+    for _, amount, row_type in chunk:
+        totals = summary.setdefault(row_type, {'count': 0, 'sum': 0})
+        totals['count'] += 1
+        totals['sum'] += amount or 0
+
+def _write_csv(chunks, output, summary):
+    text = io.TextIOWrapper(output, encoding='utf-8', newline='')
+    writer = csv.writer(text)
+    writer.writerow(STATEMENT_COLUMNS)
+    for chunk in chunks:
+        writer.writerows((date.isoformat() if date else '', amount, row_type) for date, amount, row_type in chunk)
+        _summarize_chunk(summary, chunk)
+    text.flush()
+    text.detach()
+
+def _write_xlsx(chunks, output, summary):
+    import xlsxwriter
+    
+    # constant_memory flushes each row to a temp file as soon as it is written
+    workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
+    date_format = workbook.add_format({'num_format': 'yyyy-mm-dd hh:mm'})
+    
+    transactions = workbook.add_worksheet('Transactions')
+    transactions.write_row(0, 0, STATEMENT_COLUMNS)
+    row = 1
+    for chunk in chunks:
+        for date, amount, row_type in chunk:
+            if date:
+                transactions.write_datetime(row, 0, date, date_format)
+            transactions.write_number(row, 1, float(amount or 0))
+            transactions.write_string(row, 2, row_type)
+            row += 1
+        _summarize_chunk(summary, chunk)
+    
+    summary_sheet = workbook.add_worksheet('Summary')
+    summary_sheet.write_row(0, 0, ['Type', 'Count', 'Sum'])
+    for row, (row_type, totals) in enumerate(sorted(summary.items()), start=1):
+        summary_sheet.write_row(row, 0, [row_type, totals['count'], float(totals['sum'])])
+    
+    workbook.close()
+
+def _write_parquet(chunks, output, summary):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    
+    schema = pa.schema([('Date', pa.timestamp('us')), ('Amount', pa.float64()), ('Type', pa.string())])
+    with pq.ParquetWriter(output, schema) as writer:
+        # Each chunk becomes its own row group
+        for chunk in chunks:
+            dates, amounts, types = zip(*chunk)
+            amounts = [float(amount) if amount is not None else None for amount in amounts]
+            writer.write_table(pa.table([list(dates), amounts, list(types)], schema=schema))
+            _summarize_chunk(summary, chunk)
+        if not summary:
+            writer.write_table(schema.empty_table())
+
+STATEMENT_WRITERS = {
+    'csv': _write_csv,
+    'xlsx': _write_xlsx,
+    'parquet': _write_parquet
+}
+
+def stream_member_statement(member_id, output, fmt='xlsx', chunk_size=5000):
+    """Write a member statement to `output` (a path or binary file object) chunk by chunk.
+    
+    Returns the per-type count/sum summary accumulated while writing.
+    """
+    if fmt not in STATEMENT_WRITERS:
+        raise ValueError(f'Unsupported statement format: {fmt}')
+    
+    summary = {}
+    chunks = iter_statement_chunks(member_id, chunk_size)
+    if isinstance(output, str):
+        with open(output, 'wb') as fh:
+            STATEMENT_WRITERS[fmt](chunks, fh, summary)
+    else:
+        STATEMENT_WRITERS[fmt](chunks, output, summary)
+    return summary
@@ -0,0 +1,178 @@
+import re
+from markupsafe import Markup, escape
+import sqlalchemy as sa
+
+MAX_QUERY_TERMS = 8
+SNIPPET_START = '\x02'
+SNIPPET_STOP = '\x03'
+TERM_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+def query_terms(text):
+    """Plain word tokens of a user query; operators and quotes are dropped so input can never be query syntax."""
+    return TERM_PATTERN.findall((text or '').lower())[:MAX_QUERY_TERMS]
+
+def render_snippet(snippet):
+    """Escape a result snippet and turn the backend's match markers into <mark> tags."""
+    return Markup(str(escape(snippet or '')).replace(SNIPPET_START, '<mark>').replace(SNIPPET_STOP, '</mark>'))
+
+class SqliteSearchBackend:
+    """Full-text index in an FTS5 virtual table, ranked with bm25.
+    
+    Each document's rowid packs its kind into the high bits and the source row
+    id into the low 40, so a document can be replaced or deleted by rowid and a
+    search can be limited to some kinds with rowid ranges.
+    """
+    
+    KIND_SHIFT = 40
+    
+    def __init__(self, kinds, table_name='search_index', title_weight=4.0):
+        self.codes = {kind: code for code, kind in enumerate(kinds, start=1)}
+        self.kinds = {code: kind for kind, code in self.codes.items()}
+        self.table_name = table_name
+        self.title_weight = title_weight
+        self.table = sa.Table(
+            table_name, sa.MetaData(),
+            sa.Column('rowid', sa.Integer, primary_key=True),
+            sa.Column('title', sa.Text),
+            sa.Column('body', sa.Text)
+        )
+    
+    def exists(self, connection):
+        return sa.inspect(connection).has_table(self.table_name)
+    
+    def create(self, connection):
+        connection.exec_driver_sql(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table_name} "
+            f"USING fts5(title, body, tokenize='unicode61 remove_diacritics 2')"
+        )
+    
+    def drop(self, connection):
+        connection.exec_driver_sql(f'DROP TABLE IF EXISTS {self.table_name}')
+    
+    def document_id(self, kind, ref_id):
+        return (self.codes[kind] << self.KIND_SHIFT) | ref_id
+    
+    def upsert(self, connection, kind, ref_id, title, body):
+        rowid = self.document_id(kind, ref_id)
+        connection.execute(self.table.delete().where(self.table.c.rowid == rowid))
+        connection.execute(self.table.insert().values(rowid=rowid, title=title or '', body=body or ''))
+    
+    def delete(self, connection, kind, ref_id):
+        connection.execute(self.table.delete().where(self.table.c.rowid == self.document_id(kind, ref_id)))
+    
+    def rebuild(self, connection, sources):
+        """Replace the index with the (id, title, body) rows of each kind's select, all in SQL."""
+        connection.execute(self.table.delete())
+        for kind, select in sources.items():
+            rows = select.subquery()
+            id_column, title_column, body_column = rows.c
+            connection.execute(self.table.insert().from_select(['rowid', 'title', 'body'], sa.select(
+                id_column + (self.codes[kind] << self.KIND_SHIFT),
+                sa.func.coalesce(title_column, ''),
+                sa.func.coalesce(body_column, '')
+            )))
+        # Merge the index b-trees written by the bulk insert
+        connection.exec_driver_sql(f"INSERT INTO {self.table_name}({self.table_name}) VALUES ('optimize')")
+    
+    def search(self, connection, text, kinds, limit, offset=0):
+        """[(kind, ref_id, title, snippet, rank)] best match first; snippets mark matches with SNIPPET_START/STOP."""
+        terms = query_terms(text)
+        if not terms or not kinds:
+            return []
+        kind_ranges = ' OR '.join(
+            f'(rowid BETWEEN {self.codes[kind] << self.KIND_SHIFT} AND {((self.codes[kind] + 1) << self.KIND_SHIFT) - 1})'
+            for kind in kinds
+        )
+        rows = connection.execute(sa.text(
+            f'SELECT rowid, title, snippet({self.table_name}, -1, :start, :stop, :ellipsis, 16) AS snippet, '
+            f'bm25({self.table_name}, :title_weight, 1.0) AS rank '
+            f'FROM {self.table_name} WHERE {self.table_name} MATCH :query AND ({kind_ranges}) '
+            f'ORDER BY rank LIMIT :limit OFFSET :offset'
+        ), {
+            'start': SNIPPET_START, 'stop': SNIPPET_STOP, 'ellipsis': '…',
+            'title_weight': self.title_weight,
+            # Every term must match, each as a prefix
+            'query': ' '.join(f'"{term}"*' for term in terms),
+            'limit': limit, 'offset': offset
+        })
+        mask = (1 << self.KIND_SHIFT) - 1
+        return [
+            (self.kinds[rowid >> self.KIND_SHIFT], rowid & mask, title, snippet, -rank)
+            for rowid, title, snippet, rank in rows
+        ]
+
+class PostgresSearchBackend:
+    """Full-text index in a table with a stored, weighted tsvector and a GIN index, ranked with ts_rank_cd."""
+    
+    def __init__(self, kinds, table_name='search_document', config='simple'):
+        from sqlalchemy.dialects.postgresql import TSVECTOR
+        
+        self.kinds = list(kinds)
+        self.table_name = table_name
+        self.config = config
+        self.table = sa.Table(
+            table_name, sa.MetaData(),
+            sa.Column('kind', sa.String(20), primary_key=True),
+            sa.Column('ref_id', sa.Integer, primary_key=True),
+            sa.Column('title', sa.Text, nullable=False, server_default=''),
+            sa.Column('body', sa.Text, nullable=False, server_default=''),
+            sa.Column('document', TSVECTOR, sa.Computed(
+                f"setweight(to_tsvector('{config}', title), 'A') || setweight(to_tsvector('{config}', body), 'B')",
+                persisted=True
+            )),
+            sa.Index(f'ix_{table_name}_document', 'document', postgresql_using='gin')
+        )
+    
+    def exists(self, connection):
+        return sa.inspect(connection).has_table(self.table_name)
+    
+    def create(self, connection):
+        self.table.create(connection, checkfirst=True)
+    
+    def drop(self, connection):
+        self.table.drop(connection, checkfirst=True)
+    
+    def upsert(self, connection, kind, ref_id, title, body):
+        from sqlalchemy.dialects.postgresql import insert
+        
+        statement = insert(self.table).values(kind=kind, ref_id=ref_id, title=title or '', body=body or '')
+        connection.execute(statement.on_conflict_do_update(
+            index_elements=['kind', 'ref_id'],
+            set_={'title': statement.excluded.title, 'body': statement.excluded.body}
+        ))
+    
+    def delete(self, connection, kind, ref_id):
+        connection.execute(self.table.delete().where(self.table.c.kind == kind, self.table.c.ref_id == ref_id))
+    
+    def rebuild(self, connection, sources):
+        connection.execute(self.table.delete())
+        for kind, select in sources.items():
+            rows = select.subquery()
+            id_column, title_column, body_column = rows.c
+            connection.execute(self.table.insert().from_select(['kind', 'ref_id', 'title', 'body'], sa.select(
+                sa.literal(kind), id_column, sa.func.coalesce(title_column, ''), sa.func.coalesce(body_column, '')
+            )))
+    
+    def search(self, connection, text, kinds, limit, offset=0):
+        terms = query_terms(text)
+        if not terms or not kinds:
+            return []
+        query = sa.func.to_tsquery(self.config, ' & '.join(f'{term}:*' for term in terms))
+        rank = sa.func.ts_rank_cd(self.table.c.document, query).label('rank')
+        rows = connection.execute(
+            sa.select(
+                self.table.c.kind, self.table.c.ref_id, self.table.c.title,
+                sa.func.ts_headline(
+                    self.config, self.table.c.body, query,
+                    f'StartSel={SNIPPET_START}, StopSel={SNIPPET_STOP}, MaxWords=24, MinWords=8'
+                ),
+                rank
+            ).where(self.table.c.document.op('@@')(query), self.table.c.kind.in_(kinds))
+            .order_by(rank.desc(), self.table.c.kind, self.table.c.ref_id).limit(limit).offset(offset)
+        )
+        return [tuple(row) for row in rows]
+
+def search_backend_for(url, kinds):
+    if sa.engine.make_url(url).get_backend_name() == 'postgresql':
+        return PostgresSearchBackend(kinds)
+    return SqliteSearchBackend(kinds)
\ No newline at end of file
@@ -0,0 +1,91 @@
+import math
+from datetime import datetime, timedelta, timezone
+
+EPOCH = datetime(1970, 1, 1)
+MINUTE = 60
+HOUR = 3600
+ROLLUP_RESOLUTIONS = (MINUTE, HOUR)
+MAX_METRIC_LENGTH = 50
+
+def parse_timestamp(value):
+    """Naive UTC datetime from an ISO 8601 string or epoch seconds; raises ValueError otherwise."""
+    if isinstance(value, bool):
+        raise ValueError(f'Invalid timestamp: {value!r}')
+    if isinstance(value, (int, float)):
+        if not math.isfinite(value):
+            raise ValueError(f'Invalid timestamp: {value!r}')
+        return EPOCH + timedelta(seconds=value)
+    if isinstance(value, str):
+        try:
+            parsed = datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+        except ValueError:
+            raise ValueError(f'Invalid timestamp: {value!r}')
+        if parsed.tzinfo is not None:
+            parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+        return parsed
+    raise ValueError(f'Invalid timestamp: {value!r}')
+
+def day_number(timestamp):
+    """Days since the epoch, the partition key of a reading."""
+    return (timestamp - EPOCH).days
+
+def bucket_start(timestamp, seconds):
+    elapsed = (timestamp - EPOCH) // timedelta(seconds=seconds)
+    return EPOCH + timedelta(seconds=elapsed * seconds)
+
+def parse_readings(payload, max_readings, now, max_skew=300):
+    """Flatten a batch payload into (device_id, timestamp, metric, value) tuples.
+    
+    The payload is {"readings": [{"device_id", "timestamp", "values": {metric: number}}]}.
+    Raises ValueError describing the first bad entry.
+    """
+    readings = payload.get('readings') if isinstance(payload, dict) else None
+    if not isinstance(readings, list) or not readings:
+        raise ValueError('Expected a non-empty "readings" list')
+    if len(readings) > max_readings:
+        raise ValueError(f'At most {max_readings} readings per batch')
+    
+    latest_allowed = now + timedelta(seconds=max_skew)
+    rows = []
+    for i, reading in enumerate(readings):
+        if not isinstance(reading, dict):
+            raise ValueError(f'Reading {i} is not an object')
+        device_id = reading.get('device_id')
+        values = reading.get('values')
+        if not isinstance(device_id, str) or not device_id:
+            raise ValueError(f'Reading {i} has no device_id')
+        if not isinstance(values, dict) or not values:
+            raise ValueError(f'Reading {i} has no values')
+        timestamp = parse_timestamp(reading.get('timestamp'))
+        if timestamp > latest_allowed:
+            raise ValueError(f'Reading {i} is timestamped in the future')
+        for metric, value in values.items():
+            if not metric or len(metric) > MAX_METRIC_LENGTH:
+                raise ValueError(f'Reading {i} has an invalid metric name')
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+                raise ValueError(f'Reading {i} has a non-numeric value for {metric}')
+            rows.append((device_id, timestamp, metric, float(value)))
+    return rows
+
+def rollup_deltas(readings, resolutions=ROLLUP_RESOLUTIONS):
+    """{(device, metric, resolution, bucket start): [count, total, minimum, maximum]} for (device, timestamp, metric, value) rows."""
+    deltas = {}
+    for device, timestamp, metric, value in readings:
+        for seconds in resolutions:
+            key = (device, metric, seconds, bucket_start(timestamp, seconds))
+            bucket = deltas.get(key)
+            if bucket is None:
+                deltas[key] = [1, value, value, value]
+            else:
+                bucket[0] += 1
+                bucket[1] += value
+                bucket[2] = min(bucket[2], value)
+                bucket[3] = max(bucket[3], value)
+    return deltas
+
+def history_resolution(window_seconds, max_points=1500):
+    """The finest rollup resolution that keeps a window of history under `max_points` buckets."""
+    for seconds in ROLLUP_RESOLUTIONS:
+        if window_seconds / seconds <= max_points:
+            return seconds
+    return ROLLUP_RESOLUTIONS[-1]
\ No newline at end of file